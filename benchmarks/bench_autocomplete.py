@@ -0,0 +1,85 @@
+"""
+Автодополнение по индексу в памяти: время построения, задержки поиска (p50/p99)
+и занятая память на синтетическом каталоге. База не нужна.
+
+    python -m benchmarks.bench_autocomplete --titles 100000 --lookups 20000
+"""
+import argparse
+import random
+import statistics
+import time
+import tracemalloc
+
+from src.api.autocomplete import TitleIndex
+
+
+WORDS = [
+    "one", "piece", "naruto", "bleach", "attack", "titan", "sword", "art", "online", "death",
+    "note", "hunter", "steins", "gate", "fullmetal", "alchemist", "spirited", "away", "tokyo", "ghoul",
+]
+
+
+def make_rows(count: int, rng: random.Random):
+    for i in range(count):
+        name = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))) + f" {i}"
+        yield f"title-{i:06d}", name.title(), f"タイトル {i}"
+
+
+def percentile(samples, q: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def main() -> None:
+    
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--titles", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=20_000)
+    args = parser.parse_args()
+    
+    rng = random.Random(42)
+    rows = list(make_rows(args.titles, rng))
+    
+    index = TitleIndex()
+    index.build(rows)
+    build_ms = index.build_seconds * 1000
+    
+    # Отдельное построение под tracemalloc: он сильно замедляет само построение
+    tracemalloc.start()
+    traced_index = TitleIndex()
+    traced_index.build(rows)
+    traced, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del traced_index
+    
+    prefixes = [rng.choice(WORDS)[:rng.randint(1, 5)] for _ in range(args.lookups)]
+    timings = []
+    
+    for prefix in prefixes:
+        started = time.perf_counter()
+        index.lookup(prefix, limit=10)
+        timings.append((time.perf_counter() - started) * 1e6)
+        
+    started = time.perf_counter()
+    
+    for i in range(1000):
+        index.upsert(f"title-{i:06d}", f"Renamed Title {i}", f"タイトル {i}")
+        
+    upsert_us = (time.perf_counter() - started) * 1e3
+    
+    started = time.perf_counter()
+    index.upsert_many([(f"title-{i:06d}", f"Bulk Title {i}", f"タイトル {i}") for i in range(10_000)])
+    bulk_ms = (time.perf_counter() - started) * 1e3
+    
+    stats = index.stats()
+    print(f"titles={stats['titles']} keys={stats['keys']} build={build_ms:.0f} ms")
+    print(f"memory: tracemalloc={traced / 2**20:.1f} MiB, stats approx={stats['approx_bytes'] / 2**20:.1f} MiB")
+    print(
+        f"lookup: p50={percentile(timings, 0.5):.1f} us p99={percentile(timings, 0.99):.1f} us "
+        f"mean={statistics.mean(timings):.1f} us"
+    )
+    print(f"upsert: {upsert_us:.2f} us per title, bulk of 10000: {bulk_ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
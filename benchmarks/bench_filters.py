@@ -0,0 +1,163 @@
+"""
+Фильтры и фасеты каталога на засеянной БД: планы запросов и задержки
+для жанров (any/all) через title_genres против поиска по тексту JSON-колонки genres.
+
+    python -m benchmarks.bench_filters --rows 100000 --iterations 50
+
+Работает на тестовой БД из TEST_DB_*: таблицы создаются, засеиваются и удаляются.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from sqlalchemy import cast, select, text, String
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.config import TEST_DB_HOST, TEST_DB_PORT, TEST_DB_NAME, TEST_DB_USER, TEST_DB_PASS
+from src.database import Base
+from src.cache import catalog_cache
+from src.api import schemas
+from src.api.dao import TitleDAO, TitleGenreDAO
+from src.api.models import Title
+from src.api.service import TitleCRUD, genre_rows, title_filter_conditions
+from src.auth import models as auth_models  # noqa: F401  регистрирует таблицы пользователей
+from src.chat import models as chat_models  # noqa: F401
+
+
+DATABASE_URL = f"postgresql+asyncpg://{TEST_DB_USER}:{TEST_DB_PASS}@{TEST_DB_HOST}:{TEST_DB_PORT}/{TEST_DB_NAME}"
+
+GENRES = [f"genre{i}" for i in range(30)]
+STUDIOS = [f"studio{i}" for i in range(300)]
+STATUSES = ["ongoing", "released", "announced"]
+TYPES = ["TV", "Movie", "OVA", "ONA", "Special"]
+MPAA = ["G", "PG", "PG-13", "R", "R+"]
+
+
+async def seed(session: AsyncSession, rows: int) -> None:
+    
+    rng = random.Random(42)
+    
+    for start in range(0, rows, 10_000):
+        titles = []
+        
+        for i in range(start, min(start + 10_000, rows)):
+            titles.append({
+                "id": f"title-{i:06d}",
+                "name": f"Title {i}",
+                "japanese_title": f"タイトル {i}",
+                "trailer_link": f"https://example.com/trailer/{i}",
+                "num_episodes": rng.randint(1, 50),
+                "synopsis": "",
+                "country": "JP",
+                "year": rng.randint(1980, 2024),
+                "genres": {"items": rng.sample(GENRES, rng.randint(1, 4))},
+                "rating": str(rng.randint(1, 10)),
+                "type": rng.choice(TYPES),
+                "status": rng.choice(STATUSES),
+                "studio": rng.choice(STUDIOS),
+                "MPAA": rng.choice(MPAA),
+                "duration": "24",
+                "big_img": f"https://example.com/big/{i}",
+                "small_img": f"https://example.com/small/{i}",
+                "screens": {"id": i},
+            })
+            
+        await TitleDAO.add_many(session, titles, use_copy=True)
+        await TitleGenreDAO.add_many(
+            session,
+            [row for title in titles for row in genre_rows(title["id"], title["genres"])],
+            use_copy=True,
+        )
+        
+    await session.commit()
+    await session.execute(text("ANALYZE titles"))
+    await session.execute(text("ANALYZE title_genres"))
+
+
+async def explain(session: AsyncSession, stmt) -> str:
+    
+    sql = stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+    result = await session.execute(text(f"EXPLAIN ANALYZE {sql}"))
+    
+    return "\n".join(row[0] for row in result)
+
+
+async def measure(name: str, iterations: int, call) -> None:
+    
+    timings = []
+    
+    for _ in range(iterations):
+        # Меряем запросы к БД, а не кеш каталога
+        await catalog_cache.clear()
+        started = time.perf_counter()
+        await call()
+        timings.append((time.perf_counter() - started) * 1000)
+        
+    timings.sort()
+    
+    print(
+        f"{name:<34} mean {statistics.mean(timings):8.3f} ms   "
+        f"p50 {timings[len(timings) // 2]:8.3f} ms   "
+        f"p99 {timings[int(len(timings) * 0.99) - 1]:8.3f} ms"
+    )
+
+
+async def main(rows: int, iterations: int) -> None:
+    
+    engine = create_async_engine(DATABASE_URL)
+    session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    
+    try:
+        async with session_maker() as session:
+            started = time.perf_counter()
+            await seed(session, rows)
+            print(f"seeded {rows} titles in {time.perf_counter() - started:.1f} s\n")
+            
+            crud = TitleCRUD(session)
+            filters = {
+                "genre any (1)": schemas.TitleFilter(genres=["genre3"]),
+                "genre all (2)": schemas.TitleFilter(genres=["genre3", "genre7"], genre_match="all"),
+                "genre + year + studio": schemas.TitleFilter(genres=["genre3"], year_from=2010, studio="studio42"),
+                "status + type + MPAA": schemas.TitleFilter(status="ongoing", type="TV", MPAA="PG-13"),
+            }
+            
+            # Прежний вариант: подстрока в тексте JSON, без индекса
+            json_scan = select(Title).where(cast(Title.genres, String).like('%"genre3"%')).order_by(Title.id).limit(21)
+            print(f"--- JSON text scan\n{await explain(session, json_scan)}\n")
+            
+            for name, title_filter in filters.items():
+                stmt = select(Title).where(*title_filter_conditions(title_filter)).order_by(Title.id).limit(21)
+                print(f"--- {name}\n{await explain(session, stmt)}\n")
+            
+            await measure("JSON text scan (genre3)", iterations, lambda: session.execute(json_scan))
+            
+            for name, title_filter in filters.items():
+                await measure(
+                    f"page: {name}", iterations,
+                    lambda title_filter=title_filter: crud.get_titles_page(limit=20, title_filter=title_filter),
+                )
+                await measure(
+                    f"facets: {name}", iterations,
+                    lambda title_filter=title_filter: crud.get_facets(title_filter),
+                )
+            
+    finally:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+    
+    asyncio.run(main(args.rows, args.iterations))
@@ -0,0 +1,135 @@
+"""
+Планы и задержки поиска пользователя: прежний OR по email/username/id
+против BaseDAO.find_by_keys (точечный поиск или UNION ALL поисков по индексам с целыми строками).
+
+    python -m benchmarks.bench_lookups --rows 100000 --iterations 500
+
+Работает на тестовой БД из TEST_DB_*: таблицы создаются, засеиваются и удаляются.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import insert, or_, select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.config import TEST_DB_HOST, TEST_DB_PORT, TEST_DB_NAME, TEST_DB_USER, TEST_DB_PASS
+from src.database import Base
+from src.api import models as api_models  # noqa: F401  регистрирует таблицы каталога
+from src.chat import models as chat_models  # noqa: F401
+from src.auth.dao import UserDAO
+from src.auth.models import Role, User
+
+
+DATABASE_URL = f"postgresql+asyncpg://{TEST_DB_USER}:{TEST_DB_PASS}@{TEST_DB_HOST}:{TEST_DB_PORT}/{TEST_DB_NAME}"
+
+
+async def seed(session: AsyncSession, rows: int) -> None:
+    
+    await session.execute(insert(Role).values(id=1, name="user", permissions={}))
+    
+    for start in range(0, rows, 10_000):
+        await session.execute(insert(User), [
+            {
+                "id": f"id-{i}",
+                "email": f"user{i}@example.com",
+                "username": f"user{i}",
+                "hashed_password": "salt$hash",
+            }
+            for i in range(start, min(start + 10_000, rows))
+        ])
+        
+    await session.commit()
+    await session.execute(text("ANALYZE users"))
+
+
+async def explain(session: AsyncSession, stmt) -> str:
+    
+    sql = stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+    result = await session.execute(text(f"EXPLAIN ANALYZE {sql}"))
+    
+    return "\n".join(row[0] for row in result)
+
+
+async def measure(name: str, iterations: int, rows: int, lookup) -> None:
+    
+    timings = []
+    
+    for n in range(iterations):
+        i = (n * 7919) % rows
+        started = time.perf_counter()
+        await lookup(i)
+        timings.append((time.perf_counter() - started) * 1000)
+        
+    timings.sort()
+    
+    print(
+        f"{name:<28} mean {statistics.mean(timings):7.3f} ms   "
+        f"p50 {timings[len(timings) // 2]:7.3f} ms   "
+        f"p99 {timings[int(len(timings) * 0.99) - 1]:7.3f} ms"
+    )
+
+
+async def main(rows: int, iterations: int) -> None:
+    
+    engine = create_async_engine(DATABASE_URL)
+    session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    
+    try:
+        async with session_maker() as session:
+            await seed(session, rows)
+            
+            i = rows // 2
+            statements = {
+                "OR (email, username, id)": select(User).where(or_(
+                    User.email == f"user{i}@example.com",
+                    User.username == f"user{i}",
+                    User.id == None,
+                )),
+                "find_by_keys(username)": UserDAO.keys_statement(username=f"user{i}"),
+                # find_one_by_keys добавляет LIMIT 1
+                "find_by_keys(email, username)": UserDAO.keys_statement(
+                    email=f"user{i}@example.com",
+                    username=f"user{i}",
+                ).limit(1),
+            }
+            
+            for name, stmt in statements.items():
+                print(f"--- {name}\n{await explain(session, stmt)}\n")
+            
+            async def old_lookup(i):
+                await UserDAO.find_one_or_none(session, or_(
+                    User.email == f"user{i}@example.com",
+                    User.username == f"user{i}",
+                    User.id == None,
+                ))
+            
+            async def single_key(i):
+                await UserDAO.find_one_by_keys(session, username=f"user{i}")
+            
+            async def several_keys(i):
+                await UserDAO.find_one_by_keys(session, email=f"user{i}@example.com", username=f"user{i}")
+            
+            await measure("OR (email, username, id)", iterations, rows, old_lookup)
+            await measure("find_by_keys(username)", iterations, rows, single_key)
+            await measure("find_by_keys(email, username)", iterations, rows, several_keys)
+            
+    finally:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+    
+    asyncio.run(main(args.rows, args.iterations))
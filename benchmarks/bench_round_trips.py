@@ -0,0 +1,116 @@
+"""
+Число обращений к БД на запрос: SQL-выражения плюс BEGIN/COMMIT/ROLLBACK.
+Прогоняет типичный сценарий (регистрация, вход, создание и изменение тайтла и эпизода)
+через приложение и печатает счетчики по каждому эндпоинту.
+
+    python -m benchmarks.bench_round_trips
+
+Работает на тестовой БД из TEST_DB_*: таблицы создаются и удаляются.
+"""
+import asyncio
+
+from collections import Counter
+from typing import AsyncGenerator
+
+from httpx import AsyncClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from src.config import TEST_DB_HOST, TEST_DB_PORT, TEST_DB_NAME, TEST_DB_USER, TEST_DB_PASS
+from src.database import Base, get_async_session, get_read_session, get_read_session_maker
+from src.main import app
+
+
+DATABASE_URL = f"postgresql+asyncpg://{TEST_DB_USER}:{TEST_DB_PASS}@{TEST_DB_HOST}:{TEST_DB_PORT}/{TEST_DB_NAME}"
+
+TITLE = {
+    "name": "Bench title",
+    "trailer_link": "https://example.com/trailer",
+    "num_episodes": 12,
+    "synopsis": "",
+    "japanese_title": "bench",
+    "country": "JP",
+    "year": 2020,
+    "genres": {"items": ["drama"]},
+    "rating": "8",
+    "status": "ongoing",
+    "studio": "studio",
+    "MPAA": "PG-13",
+    "duration": "24",
+    "type": "TV",
+    "small_img": "https://example.com/s.png",
+    "big_img": "https://example.com/b.png",
+    "screens": {},
+}
+
+
+def count_round_trips(engine, counter: Counter) -> None:
+    
+    sync_engine = engine.sync_engine
+    
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def on_execute(*args):
+        counter["statements"] += 1
+        
+    for name in ("begin", "commit", "rollback"):
+        event.listen(sync_engine, name, lambda conn, name=name: counter.update([name]))
+
+
+async def main() -> None:
+    
+    engine = create_async_engine(DATABASE_URL, poolclass=NullPool)
+    session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    
+    async def override_session() -> AsyncGenerator[AsyncSession, None]:
+        async with session_maker() as session:
+            yield session
+            
+    app.dependency_overrides[get_async_session] = override_session
+    app.dependency_overrides[get_read_session] = override_session
+    # Одиночные get_title идут через title_loader со своей фабрикой сессий
+    app.dependency_overrides[get_read_session_maker] = lambda: session_maker
+    
+    counter = Counter()
+    count_round_trips(engine, counter)
+    
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            async def step(name: str, method: str, url: str, **kwargs):
+                counter.clear()
+                response = await client.request(method, url, **kwargs)
+                trips = sum(counter.values())
+                details = ", ".join(f"{key} {value}" for key, value in sorted(counter.items()))
+                print(f"{name:<16} {response.status_code}   {trips:3d} round trips   ({details})")
+                return response
+            
+            await step("create_role", "POST", "/create_role/", json={"name": "user", "permissions": {}})
+            await step("registration", "POST", "/registration/", json={
+                "email": "bench@example.com", "username": "bench", "password": "Bench_1234",
+            })
+            await step("login", "POST", "/login/", data={"username": "bench", "password": "Bench_1234"})
+            
+            response = await step("create_title", "POST", "/create_title/", json=TITLE)
+            title_id = response.json().get("id")
+            
+            # update_title перезаписывает все поля, поэтому отправляем тайтл целиком
+            await step("update_title", "PUT", "/update_title", params={"title_id": title_id}, json={**TITLE, "year": 2021})
+            await step("create_episode", "POST", "/create_episode", json={
+                "title_id": title_id, "episode_number": 1, "episode_title": "Episode 1",
+                "episode_link": "https://example.com/1", "translations": {},
+            })
+            await step("get_title", "GET", "/get_title", params={"title_id": title_id})
+            
+    finally:
+        app.dependency_overrides.clear()
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
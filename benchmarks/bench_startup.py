@@ -0,0 +1,64 @@
+"""
+Время холодного старта воркера: импорт src.main и первый запрос к "/"
+(маршрут без БД). Каждый прогон - отдельный процесс, чтобы не мешал кеш модулей.
+
+    python -m benchmarks.bench_startup --runs 20
+
+Нужны переменные окружения из .env, как для самого приложения; подключение к БД не требуется.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+
+PROBE = """
+import json, time
+started = time.perf_counter()
+import src.main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+client = TestClient(src.main.app)
+ready = time.perf_counter()
+response = client.get("/")
+done = time.perf_counter()
+assert response.status_code == 200
+import sys
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "first_request_ms": (done - ready) * 1000,
+    "sync_engine": "engine" in vars(sys.modules["src.database"]),
+}))
+"""
+
+
+def run_once() -> dict:
+    
+    result = subprocess.run([sys.executable, "-c", PROBE], capture_output=True, text=True, check=True)
+    
+    # Последняя строка - результат, до нее может быть отладочный вывод приложения
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(runs: int) -> None:
+    
+    samples = [run_once() for _ in range(runs)]
+    
+    for key in ("import_ms", "first_request_ms"):
+        timings = sorted(sample[key] for sample in samples)
+        print(
+            f"{key:<18} mean {statistics.mean(timings):8.1f} ms   "
+            f"p50 {timings[len(timings) // 2]:8.1f} ms   "
+            f"min {timings[0]:8.1f} ms"
+        )
+        
+    print(f"sync engine created at import: {samples[0]['sync_engine']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+    
+    main(args.runs)
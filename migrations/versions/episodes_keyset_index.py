@@ -0,0 +1,28 @@
+"""Composite index for keyset pagination of episodes
+
+Revision ID: 3c1d7e52a9f0
+Revises: a8b0a4984903
+Create Date: 2026-10-18 10:12:41.208311
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c1d7e52a9f0'
+down_revision = 'a8b0a4984903'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_episodes_title_id_episode_number',
+        'episodes',
+        ['title_id', 'episode_number', 'episode_link'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_episodes_title_id_episode_number', table_name='episodes')
@@ -0,0 +1,51 @@
+"""Redesign messages: surrogate id, created_at, (room, id) index
+
+Revision ID: e2a7f5c90b61
+Revises: 4ad6c8e2f713
+Create Date: 2026-10-18 14:05:38.112470
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a7f5c90b61'
+down_revision = '4ad6c8e2f713'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.drop_constraint('messages_pkey', 'messages', type_='primary')
+    op.alter_column('messages', 'user_id', existing_type=sa.String(), nullable=True)
+    op.drop_column('messages', 'chat_id')
+    
+    # BIGSERIAL нумерует и уже существующие строки
+    op.execute("ALTER TABLE messages ADD COLUMN id BIGSERIAL PRIMARY KEY")
+    op.add_column(
+        'messages',
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    
+    op.drop_index('ix_messages_room', table_name='messages')
+    op.create_index('ix_messages_room_id', 'messages', ['room', 'id'])
+    op.create_index('ix_messages_user_id', 'messages', ['user_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_messages_user_id', table_name='messages')
+    op.drop_index('ix_messages_room_id', table_name='messages')
+    op.create_index('ix_messages_room', 'messages', ['room'])
+    
+    op.drop_column('messages', 'created_at')
+    op.drop_column('messages', 'id')
+    op.add_column('messages', sa.Column('chat_id', sa.Integer(), unique=True))
+    
+    # Старая схема допускает одно сообщение на пользователя: остальные строки не помещаются
+    op.execute(
+        "DELETE FROM messages m USING messages d "
+        "WHERE m.user_id IS NULL OR (m.user_id = d.user_id AND m.ctid < d.ctid)"
+    )
+    op.alter_column('messages', 'user_id', existing_type=sa.String(), nullable=False)
+    op.create_primary_key('messages_pkey', 'messages', ['user_id'])
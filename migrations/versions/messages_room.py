@@ -0,0 +1,29 @@
+"""Add messages.room for room-scoped chat
+
+Revision ID: 4ad6c8e2f713
+Revises: b95e0d3f18a4
+Create Date: 2026-10-18 13:21:54.870216
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4ad6c8e2f713'
+down_revision = 'b95e0d3f18a4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'messages',
+        sa.Column('room', sa.String(), server_default='general', nullable=False),
+    )
+    op.create_index('ix_messages_room', 'messages', ['room'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_messages_room', table_name='messages')
+    op.drop_column('messages', 'room')
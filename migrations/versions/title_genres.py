@@ -0,0 +1,49 @@
+"""Normalized title genres and filter indexes on titles
+
+Revision ID: 9b6c2f1e7d38
+Revises: 5d0e8b3f4a27
+Create Date: 2026-10-18 15:41:09.518820
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b6c2f1e7d38'
+down_revision = '5d0e8b3f4a27'
+branch_labels = None
+depends_on = None
+
+
+FILTER_COLUMNS = ('year', 'status', 'type', 'studio', 'MPAA')
+
+
+def upgrade() -> None:
+    op.create_table(
+        'title_genres',
+        sa.Column('title_id', sa.String(), sa.ForeignKey('titles.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('genre', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('title_id', 'genre'),
+    )
+    
+    # Те же правила, что и у extract_genres: все строковые значения genres, в нижнем регистре
+    op.execute(
+        "INSERT INTO title_genres (title_id, genre) "
+        "SELECT DISTINCT t.id, lower(btrim(v #>> '{}')) "
+        "FROM titles t, jsonb_path_query(t.genres::jsonb, 'strict $.**') AS v "
+        "WHERE jsonb_typeof(v) = 'string' AND btrim(v #>> '{}') <> ''"
+    )
+    
+    op.create_index('ix_title_genres_genre_title_id', 'title_genres', ['genre', 'title_id'])
+    
+    for column in FILTER_COLUMNS:
+        op.create_index(f'ix_titles_{column}', 'titles', [column])
+
+
+def downgrade() -> None:
+    for column in FILTER_COLUMNS:
+        op.drop_index(f'ix_titles_{column}', table_name='titles')
+        
+    op.drop_index('ix_title_genres_genre_title_id', table_name='title_genres')
+    op.drop_table('title_genres')
@@ -0,0 +1,47 @@
+"""Full-text and trigram search over titles
+
+Revision ID: 5d0e8b3f4a27
+Revises: e2a7f5c90b61
+Create Date: 2026-10-18 15:02:17.640193
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d0e8b3f4a27'
+down_revision = 'e2a7f5c90b61'
+branch_labels = None
+depends_on = None
+
+
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(japanese_title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(synopsis, '')), 'C')"
+)
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    
+    # Генерируемая колонка: Postgres сам пересчитывает вектор при INSERT и UPDATE
+    op.execute(f"ALTER TABLE titles ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ({SEARCH_VECTOR_SQL}) STORED")
+    
+    op.create_index('ix_titles_search_vector', 'titles', ['search_vector'], postgresql_using='gin')
+    op.create_index(
+        'ix_titles_name_trgm', 'titles', ['name'],
+        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'},
+    )
+    op.create_index(
+        'ix_titles_japanese_title_trgm', 'titles', ['japanese_title'],
+        postgresql_using='gin', postgresql_ops={'japanese_title': 'gin_trgm_ops'},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_titles_japanese_title_trgm', table_name='titles')
+    op.drop_index('ix_titles_name_trgm', table_name='titles')
+    op.drop_index('ix_titles_search_vector', table_name='titles')
+    op.drop_column('titles', 'search_vector')
@@ -0,0 +1,27 @@
+"""Add titles.updated_at for conditional GET
+
+Revision ID: 7f4b2a91c6de
+Revises: 3c1d7e52a9f0
+Create Date: 2026-10-18 11:03:27.514902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7f4b2a91c6de'
+down_revision = '3c1d7e52a9f0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'titles',
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('titles', 'updated_at')
@@ -0,0 +1,27 @@
+"""Add users.token_version for stateless access tokens
+
+Revision ID: b95e0d3f18a4
+Revises: 7f4b2a91c6de
+Create Date: 2026-10-18 11:47:09.630155
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b95e0d3f18a4'
+down_revision = '7f4b2a91c6de'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'users',
+        sa.Column('token_version', sa.Integer(), server_default='0', nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'token_version')
@@ -0,0 +1,271 @@
+import asyncio
+import bisect
+import json
+import logging
+import sys
+import time
+import unicodedata
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import AUTOCOMPLETE_RELOAD_INTERVAL
+from ..database import async_session_maker
+from ..pubsub import WORKER_ID, broker
+from .models import Title
+
+
+logger = logging.getLogger(__name__)
+
+AUTOCOMPLETE_CHANNEL = "asqi:titles:autocomplete"
+# С какого размера пачки изменений индекс пересобирается целиком
+BULK_REBUILD_THRESHOLD = 256
+# Сколько ждать подписки на шину перед первой загрузкой индекса
+SUBSCRIBE_TIMEOUT = 5.0
+
+
+def normalize(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", text or "").casefold().split())
+
+
+class TitleIndex:
+    
+    """ Префиксный индекс названий в памяти процесса: отсортированный массив пар (ключ, id)
+    и бинарный поиск. Ключи - нормализованные name и japanese_title с каждого слова,
+    так что "piece" находит "One Piece" """
+    
+    def __init__(self):
+        self._entries: List[Tuple[str, str]] = []
+        self._titles: Dict[str, Tuple[str, str]] = {}
+        self.loaded = False
+        self.build_seconds = 0.0
+        # Изменения, пришедшие во время load(): накатываются поверх загруженного снимка
+        self._buffer: Optional[List[Dict[str, Any]]] = None
+        
+        
+    @staticmethod
+    def keys(name: str, japanese_title: str) -> Set[str]:
+        
+        keys = set()
+        
+        for text in (name, japanese_title):
+            words = normalize(text).split(" ")
+            keys.update(" ".join(words[i:]) for i in range(len(words)) if words[i])
+            
+        return keys
+    
+    
+    def build(self, rows: Iterable[Sequence[str]]) -> None:
+        
+        started = time.perf_counter()
+        
+        titles = {title_id: (name, japanese_title) for title_id, name, japanese_title in rows}
+        entries = [(key, title_id) for title_id, names in titles.items() for key in self.keys(*names)]
+        entries.sort()
+        
+        # Подмена целиком: поиск не видит полупостроенный индекс
+        self._titles, self._entries = titles, entries
+        self.loaded = True
+        self.build_seconds = time.perf_counter() - started
+        
+        
+    async def load(self, db: AsyncSession) -> None:
+        
+        """ Пересобирает индекс из базы. build() подменяет индекс целиком, поэтому изменения,
+        примененные во время чтения, повторяются поверх снимка, а не теряются """
+        
+        self._buffer = []
+        
+        try:
+            rows = (await db.execute(select(Title.id, Title.name, Title.japanese_title))).all()
+        finally:
+            buffered, self._buffer = self._buffer, None
+            
+        self.build(rows)
+        
+        for message in buffered:
+            self.apply(message)
+            
+            
+    def apply(self, message: Dict[str, Any]) -> None:
+        
+        if self._buffer is not None:
+            self._buffer.append(message)
+        
+        for title_id in message.get("deletes", ()):
+            self.remove(title_id)
+            
+        self.upsert_many(message.get("upserts", ()))
+        
+        
+    def upsert(self, title_id: str, name: str, japanese_title: str) -> None:
+        
+        self.remove(title_id)
+        self._titles[title_id] = (name, japanese_title)
+        
+        for key in self.keys(name, japanese_title):
+            bisect.insort(self._entries, (key, title_id))
+            
+            
+    def upsert_many(self, rows: Sequence[Sequence[str]]) -> None:
+        
+        # Вставка в середину массива - O(n) на ключ: большую пачку дешевле влить пересборкой
+        if len(rows) < BULK_REBUILD_THRESHOLD:
+            for title_id, name, japanese_title in rows:
+                self.upsert(title_id, name, japanese_title)
+            return
+        
+        titles = dict(self._titles)
+        titles.update((title_id, (name, japanese_title)) for title_id, name, japanese_title in rows)
+        self.build((title_id, *names) for title_id, names in titles.items())
+        
+        
+    def remove(self, title_id: str) -> None:
+        
+        names = self._titles.pop(title_id, None)
+        
+        if names is None:
+            return
+        
+        for key in self.keys(*names):
+            i = bisect.bisect_left(self._entries, (key, title_id))
+            
+            if i < len(self._entries) and self._entries[i] == (key, title_id):
+                del self._entries[i]
+                
+                
+    def lookup(self, prefix: str, limit: int = 10) -> List[Dict[str, str]]:
+        
+        prefix = normalize(prefix)
+        
+        if not prefix:
+            return []
+        
+        found = []
+        seen = set()
+        i = bisect.bisect_left(self._entries, (prefix,))
+        
+        while i < len(self._entries) and len(found) < limit:
+            key, title_id = self._entries[i]
+            
+            if not key.startswith(prefix):
+                break
+            
+            # Один тайтл может совпасть по нескольким словам
+            if title_id not in seen:
+                seen.add(title_id)
+                name, japanese_title = self._titles[title_id]
+                found.append({"id": title_id, "name": name, "japanese_title": japanese_title})
+                
+            i += 1
+            
+        return found
+    
+    
+    def stats(self) -> Dict[str, Any]:
+        
+        # Приблизительно: списки, кортежи и строки без учета общих (интернированных) объектов
+        size = sys.getsizeof(self._entries) + sys.getsizeof(self._titles)
+        size += sum(sys.getsizeof(entry) + sys.getsizeof(entry[0]) for entry in self._entries)
+        size += sum(
+            sys.getsizeof(title_id) + sys.getsizeof(names) + sys.getsizeof(names[0]) + sys.getsizeof(names[1])
+            for title_id, names in self._titles.items()
+        )
+        
+        return {
+            "loaded": self.loaded,
+            "titles": len(self._titles),
+            "keys": len(self._entries),
+            "approx_bytes": size,
+            "build_ms": round(self.build_seconds * 1000, 3),
+        }
+
+
+title_index = TitleIndex()
+
+
+async def publish_title_changes(upserts: Sequence[Tuple[str, str, str]] = (), deletes: Sequence[str] = ()) -> None:
+    
+    """ Применяет изменения к своему индексу и рассылает их остальным воркерам """
+    
+    message = {"origin": WORKER_ID, "upserts": [list(row) for row in upserts], "deletes": list(deletes)}
+    title_index.apply(message)
+    
+    # Без шины остальные воркеры догонят при периодической перезагрузке
+    try:
+        await broker.publish(AUTOCOMPLETE_CHANNEL, json.dumps(message).encode())
+    except Exception as e:
+        logger.warning("Autocomplete update was not published: %s", e)
+        
+        
+async def listen_for_title_changes(index: TitleIndex = None, ready: asyncio.Event = None) -> None:
+    
+    index = index or title_index
+    
+    while True:
+        try:
+            async for raw in broker.subscribe(AUTOCOMPLETE_CHANNEL, ready=ready):
+                
+                try:
+                    message = json.loads(raw)
+                except ValueError:
+                    continue
+                
+                if message.get("origin") != WORKER_ID:
+                    index.apply(message)
+                    
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception("Autocomplete listener failed: %s", e)
+            await asyncio.sleep(1)
+            
+            
+async def reload_index(index: TitleIndex = None) -> None:
+    
+    index = index or title_index
+    
+    try:
+        async with async_session_maker() as session:
+            await index.load(session)
+    except Exception as e:
+        logger.warning("Autocomplete index was not loaded: %s", e)
+        
+        
+async def _reload_loop(interval: float) -> None:
+    
+    while True:
+        await asyncio.sleep(interval)
+        await reload_index()
+
+
+_tasks: List[asyncio.Task] = []
+
+
+async def start_autocomplete() -> None:
+    
+    if _tasks:
+        return
+    
+    # Загрузка начинается после подписки: изменения, закоммиченные позже снимка, придут по шине.
+    # Недоступная шина не держит запуск - такие изменения подтянет периодическая перезагрузка
+    subscribed = asyncio.Event()
+    _tasks.append(asyncio.create_task(listen_for_title_changes(ready=subscribed)))
+    
+    try:
+        await asyncio.wait_for(subscribed.wait(), SUBSCRIBE_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning("Autocomplete started without a bus subscription")
+        
+    await reload_index()
+    _tasks.append(asyncio.create_task(_reload_loop(AUTOCOMPLETE_RELOAD_INTERVAL)))
+    
+    
+async def stop_autocomplete() -> None:
+    
+    for task in _tasks:
+        task.cancel()
+        
+    _tasks.clear()
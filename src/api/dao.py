@@ -1,10 +1,79 @@
-from ..dao import BaseDAO
-from .models import Title, Episode
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Float, String, cast, func, literal, literal_column, or_, select, tuple_
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from ..dao import BaseDAO, decode_cursor, encode_cursor
+from .models import Title, TitleGenre, Episode
 from .schemas import TitleCreate, EpisodeCreate, TitleUpdate, EpisodeUpdate
 
 
+# Тот же словарь, что и в выражении search_vector
+SEARCH_CONFIG = literal_column("'simple'::regconfig")
+
+
 class TitleDAO(BaseDAO[Title, TitleCreate, TitleUpdate]):
     model = Title
+    
+    
+    @classmethod
+    async def search(
+        cls,
+        db: AsyncSession,
+        query: str,
+        cursor: Optional[str] = None,
+        limit: int = 20,
+    ) -> Tuple[List[Title], Optional[str]]:
+        
+        """ Полнотекстовый поиск по search_vector плюс триграммное сходство названий для опечаток.
+        Страницы идут по убыванию (релевантность, id); курсор хранит оба значения """
+        
+        ts_query = func.websearch_to_tsquery(SEARCH_CONFIG, query)
+        similarity = func.greatest(func.similarity(Title.name, query), func.similarity(Title.japanese_title, query))
+        score = cast(func.ts_rank_cd(Title.search_vector, ts_query) + similarity, Float)
+        
+        # Каждое условие обслуживается своим GIN-индексом
+        stmt = select(Title, score.label("score")).where(or_(
+            Title.search_vector.bool_op("@@")(ts_query),
+            Title.name.bool_op("%")(query),
+            Title.japanese_title.bool_op("%")(query),
+        ))
+        
+        if cursor:
+            values = decode_cursor(cursor, (float, str))
+            bound = tuple_(literal(values[0], Float), literal(values[1], String))
+            stmt = stmt.where(tuple_(score, Title.id) < bound)
+            
+        stmt = stmt.order_by(score.desc(), Title.id.desc()).limit(limit + 1)
+        rows = (await db.execute(stmt)).all()
+        
+        if len(rows) <= limit:
+            return [row.Title for row in rows], None
+        
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1].score, rows[-1].Title.id])
+        
+        return [row.Title for row in rows], next_cursor
+    
+    
+    @classmethod
+    async def find_with_episodes(cls, db: AsyncSession, title_id: str = None, name: str = None) -> Optional[Title]:
+        
+        """ Тайтл вместе с сериями за два запроса при любом числе серий:
+        сам тайтл и один SELECT ... WHERE title_id IN (...) по серии """
+        
+        where = Title.id == title_id if title_id else Title.name == name
+        stmt = select(Title).options(selectinload(Title.episodes)).where(where)
+        result = await db.execute(stmt)
+        
+        return result.scalars().one_or_none()
+    
+
+class TitleGenreDAO(BaseDAO[TitleGenre, BaseModel, BaseModel]):
+    model = TitleGenre
+    
 
 class EpisodeDAO(BaseDAO[Episode, EpisodeCreate, EpisodeUpdate]):
-    model = Episode
\ No newline at end of file
+    model = Episode
@@ -0,0 +1,30 @@
+from typing import List, Literal
+
+from fastapi import Query
+
+from . import schemas
+
+
+async def get_title_filter(
+    genres: List[str] = Query([]),
+    genre_match: Literal["any", "all"] = "any",
+    year_from: int = None,
+    year_to: int = None,
+    status: str = None,
+    type: str = None,
+    studio: str = None,
+    MPAA: str = None,
+) -> schemas.TitleFilter:
+    
+    """ Фильтр каталога из query-параметров: ?genres=drama&genres=comedy&genre_match=all&year_from=2010 """
+    
+    return schemas.TitleFilter(
+        genres=genres,
+        genre_match=genre_match,
+        year_from=year_from,
+        year_to=year_to,
+        status=status,
+        type=type,
+        studio=studio,
+        MPAA=MPAA,
+    )
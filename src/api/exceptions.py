@@ -27,4 +27,16 @@ class NoTitleData(HTTPException):
         
 class NoEpisodeData(HTTPException):
     def __init__(self):
-        super().__init__(status_code=404, detail="No episode data found")
\ No newline at end of file
+        super().__init__(status_code=404, detail="No episode data found")
+        
+class InvalidCursor(HTTPException):
+    def __init__(self):
+        super().__init__(status_code=400, detail="Invalid pagination cursor")
+        
+class EmptySearchQuery(HTTPException):
+    def __init__(self):
+        super().__init__(status_code=400, detail="Search query is empty")
+        
+class TooManyIds(HTTPException):
+    def __init__(self):
+        super().__init__(status_code=400, detail="Too many ids in batch request")
@@ -1,11 +1,21 @@
-from sqlalchemy import Column, Integer, String, JSON, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import DDL, Column, Computed, DateTime, Index, Integer, String, JSON, ForeignKey, event
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred, relationship
+from sqlalchemy.sql import func
 from ..database import Base
 from sqlalchemy import MetaData
 
 metadata = MetaData()
 
 
+# Словарь 'simple' без стемминга: названия и японские названия не на одном языке
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(japanese_title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(synopsis, '')), 'C')"
+)
+
+
 class Title(Base):
     __tablename__ = "titles"
 
@@ -16,20 +26,53 @@ class Title(Base):
     num_episodes = Column(Integer, nullable=False)
     synopsis = Column(String, nullable=False)
     country = Column(String, nullable=False)
-    year = Column(Integer, nullable=False)
+    year = Column(Integer, nullable=False, index=True)
     genres = Column(JSON, nullable=False)
     rating = Column(String, nullable=False)
-    type = Column(String, nullable=False)
-    status = Column(String, nullable=False)
-    studio = Column(String, nullable=False)
-    MPAA = Column(String, nullable=False)
+    type = Column(String, nullable=False, index=True)
+    status = Column(String, nullable=False, index=True)
+    studio = Column(String, nullable=False, index=True)
+    MPAA = Column(String, nullable=False, index=True)
     duration = Column(String, nullable=False)
     big_img = Column(String, nullable=False, unique=True)
     small_img = Column(String, nullable=False, unique=True)
-    screens = Column(JSON, nullable=False, unique=True)
+    screens = Column(JSON, nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+    # Поисковый вектор поддерживает сама БД; в обычных выборках не загружается
+    search_vector = deferred(Column(TSVECTOR, Computed(SEARCH_VECTOR_SQL, persisted=True)))
+    
+    
+    episodes = relationship("Episode", back_populates="title", order_by="Episode.episode_number")
+    
+    __table_args__ = (
+        Index("ix_titles_search_vector", "search_vector", postgresql_using="gin"),
+        # Триграммы для поиска с опечатками
+        Index("ix_titles_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+        Index(
+            "ix_titles_japanese_title_trgm",
+            "japanese_title",
+            postgresql_using="gin",
+            postgresql_ops={"japanese_title": "gin_trgm_ops"},
+        ),
+    )
+
+
+event.listen(Title.__table__, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+
+class TitleGenre(Base):
     
+    """ Жанры тайтла построчно: индексируемая копия строковых значений Title.genres """
     
-    episodes = relationship("Episode", back_populates="title")
+    __tablename__ = "title_genres"
+    
+    title_id = Column(String, ForeignKey("titles.id", ondelete="CASCADE"), primary_key=True)
+    genre = Column(String, primary_key=True)
+    
+    # Фильтр по жанру: по индексу сразу получаем id тайтлов
+    __table_args__ = (
+        Index("ix_title_genres_genre_title_id", "genre", "title_id"),
+    )
 
 
 class Episode(Base):
@@ -43,3 +86,7 @@ class Episode(Base):
 
     title = relationship("Title", back_populates="episodes")
     
+    __table_args__ = (
+        Index("ix_episodes_title_id_episode_number", "title_id", "episode_number", "episode_link"),
+    )
+    
@@ -1,13 +1,19 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
 from typing import List
 
 from .models import Title
 
-from . import schemas, exceptions
-from ..database import get_async_session
+from . import schemas, exceptions, utils
+from .autocomplete import title_index
+from ..cache import catalog_cache
+from ..config import PAGE_MAX_LIMIT, TITLE_CACHE_CONTROL, TITLES_CACHE_CONTROL
+from ..database import get_async_session, get_read_session, get_read_session_maker
 
-from .service import DatabaseManager
+from .dependencies import get_title_filter
+from .service import DatabaseManager, filter_key
 
 router = APIRouter()
 
@@ -18,10 +24,10 @@ async def create_title(
     db: AsyncSession = Depends(get_async_session),
 ):
     
-    db_manager = DatabaseManager(db)
-    title_crud = db_manager.title_crud
-    
-    return await title_crud.create_title(title=title_data)
+    async with DatabaseManager(db) as db_manager:
+        title_crud = db_manager.title_crud
+        
+        return await title_crud.create_title(title=title_data)
 
 
 @router.post("/create_episode", response_model=schemas.EpisodeCreate)
@@ -30,59 +36,208 @@ async def create_episode(
     db: AsyncSession = Depends(get_async_session),
 ):
     
-    db_manager = DatabaseManager(db)
-    episode_crud = db_manager.episode_crud
+    async with DatabaseManager(db) as db_manager:
+        episode_crud = db_manager.episode_crud
+        
+        return await episode_crud.create_episode(episode=episode_data)
+
+
+@router.post("/create_titles/", response_model=schemas.BulkResult)
+async def create_titles(
+    titles_data: List[schemas.TitleCreate],
+    db: AsyncSession = Depends(get_async_session),
+):
     
-    return await episode_crud.create_episode(episode=episode_data)
+    async with DatabaseManager(db) as db_manager:
+        title_crud = db_manager.title_crud
+        
+        return await title_crud.create_titles(titles=titles_data)
+
+
+@router.post("/create_episodes", response_model=schemas.BulkResult)
+async def create_episodes(
+    episodes_data: List[schemas.EpisodeCreate],
+    db: AsyncSession = Depends(get_async_session),
+):
+    
+    async with DatabaseManager(db) as db_manager:
+        episode_crud = db_manager.episode_crud
+        
+        return await episode_crud.create_episodes(episodes=episodes_data)
 
 
 @router.get("/get_title", response_model=None)
 async def get_title(
-    db: AsyncSession = Depends(get_async_session),
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_session),
+    session_maker: sessionmaker = Depends(get_read_session_maker),
     title_name: str = None,
     title_id: str = None):
     
     db_manager = DatabaseManager(db)
     title_crud = db_manager.title_crud
     
-    title = await title_crud.get_existing_title(title_id=title_id, name=title_name)
+    title = await title_crud.get_existing_title(title_id=title_id, name=title_name, session_maker=session_maker)
+    
+    if not title:
+        return {"Message": "No Title Found"}
     
-    return title or {"Message": "No Title Found"}
+    etag = utils.make_etag(title.id, title.updated_at)
+    headers = utils.cache_headers(etag, title.updated_at, TITLE_CACHE_CONTROL)
+    
+    if utils.is_not_modified(request, etag, title.updated_at):
+        return Response(status_code=304, headers=headers)
+    
+    response.headers.update(headers)
+    
+    return title
     
 
+@router.get("/get_title_with_episodes", response_model=schemas.TitleWithEpisodes)
+async def get_title_with_episodes(
+    db: AsyncSession = Depends(get_read_session),
+    title_name: str = None,
+    title_id: str = None):
+    
+    db_manager = DatabaseManager(db)
+    title_crud = db_manager.title_crud
+    
+    return await title_crud.get_title_with_episodes(title_id=title_id, name=title_name)
+    
+
+@router.get("/titles/batch", response_model=schemas.TitleBatch)
+async def get_titles_batch(
+    ids: List[str] = Query([]),
+    db: AsyncSession = Depends(get_read_session)):
+    
+    db_manager = DatabaseManager(db)
+    title_crud = db_manager.title_crud
+    
+    return await title_crud.get_titles_batch(ids=ids)
+
+
 @router.get("/titles/")
 async def get_all_titles(
-    db: AsyncSession = Depends(get_async_session),
-    offset: int = 0,
-    limit: int = 10):
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_session),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=PAGE_MAX_LIMIT),
+    cursor: str = None,
+    keyset: bool = False,
+    title_filter: schemas.TitleFilter = Depends(get_title_filter)):
+    
+    db_manager = DatabaseManager(db)
+    title_crud = db_manager.title_crud
+    
+    # Курсорный режим: стоимость страницы не зависит от ее глубины
+    if keyset or cursor:
+        page = await title_crud.get_titles_page(cursor=cursor, limit=limit, title_filter=title_filter)
+        titles = page.items
+        result = page
+        page_key = ("cursor", cursor, limit, page.next_cursor, filter_key(title_filter))
+    else:
+        titles = await title_crud.get_all_titles(offset=offset, limit=limit, title_filter=title_filter)
+        result = titles or {"Message": "No Titles Found"}
+        page_key = ("offset", offset, limit, filter_key(title_filter))
+    
+    # ETag страницы зависит от ее параметров и версий всех строк в ней. Last-Modified у страницы нет:
+    # максимум updated_at не растет при удалении строки или сдвиге страницы, и If-Modified-Since
+    # отдавал бы 304 на изменившуюся страницу - валидация только по ETag
+    etag = utils.make_etag(*page_key, *(f"{title.id}@{title.updated_at}" for title in titles))
+    headers = utils.cache_headers(etag, None, TITLES_CACHE_CONTROL)
+    
+    if utils.is_not_modified(request, etag, None):
+        return Response(status_code=304, headers=headers)
+    
+    response.headers.update(headers)
+    
+    return result
+
+
+@router.get("/titles/facets", response_model=schemas.TitleFacets)
+async def get_title_facets(
+    db: AsyncSession = Depends(get_read_session),
+    title_filter: schemas.TitleFilter = Depends(get_title_filter)):
     
     db_manager = DatabaseManager(db)
     title_crud = db_manager.title_crud
     
-    titles = await title_crud.get_all_titles(offset=offset, limit=limit)
+    return await title_crud.get_facets(title_filter=title_filter)
+
+
+@router.get("/titles/search", response_model=schemas.TitlePage)
+async def search_titles(
+    q: str,
+    cursor: str = None,
+    limit: int = Query(20, ge=1, le=PAGE_MAX_LIMIT),
+    db: AsyncSession = Depends(get_read_session)):
+    
+    db_manager = DatabaseManager(db)
+    title_crud = db_manager.title_crud
+    
+    return await title_crud.search_titles(query=q, cursor=cursor, limit=limit)
+
+
+@router.get("/titles/autocomplete", response_model=List[schemas.TitleSuggestion])
+async def autocomplete_titles(q: str, limit: int = 10):
     
-    return titles or {"Message": "No Titles Found"}
+    # Без базы: индекс названий живет в памяти воркера
+    return title_index.lookup(q, limit=min(max(limit, 1), 50))
+
+
+@router.get("/export_titles")
+async def export_titles(
+    include_episodes: bool = False,
+    db: AsyncSession = Depends(get_read_session)):
+    
+    db_manager = DatabaseManager(db)
+    title_crud = db_manager.title_crud
+    
+    return StreamingResponse(
+        title_crud.export_titles(include_episodes=include_episodes),
+        media_type="application/x-ndjson",
+        )
 
 
 @router.get("/get_all_episodes")
 async def get_all_episodes(
     title_id: str,
-    offset: int = 0,
-    limit: int = 10,
-    db: AsyncSession = Depends(get_async_session)):
+    offset: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=PAGE_MAX_LIMIT),
+    cursor: str = None,
+    keyset: bool = False,
+    db: AsyncSession = Depends(get_read_session)):
     
     db_manager = DatabaseManager(db)
     episode_crud = db_manager.episode_crud
     
+    if keyset or cursor:
+        episodes, next_cursor = await episode_crud.get_episodes_page(title_id=title_id, cursor=cursor, limit=limit)
+        
+        return schemas.EpisodePage(items=episodes, next_cursor=next_cursor)
+    
     episodes = await episode_crud.get_all_episodes(offset=offset, limit=limit, title_id=title_id) 
     
     return episodes or {"Message": "No Episodes Found"}
 
 
+@router.get("/episodes/batch", response_model=schemas.EpisodeBatch)
+async def get_episodes_batch(
+    episode_links: List[str] = Query([]),
+    db: AsyncSession = Depends(get_read_session)):
+    
+    db_manager = DatabaseManager(db)
+    episode_crud = db_manager.episode_crud
+    
+    return await episode_crud.get_episodes_batch(episode_links=episode_links)
+
+
 @router.get("/get_episode", response_model=None)
 async def get_episode(
     episode_number: int,
-    db: AsyncSession = Depends(get_async_session),
+    db: AsyncSession = Depends(get_read_session),
     title_id: str = None,
 ):
     
@@ -104,10 +259,10 @@ async def delete_title(
     title_name: str = None,
 ):
     
-    db_manager = DatabaseManager(db)
-    title_crud = db_manager.title_crud
-    
-    return await title_crud.delete_title(title_id=title_id, title_name=title_name)
+    async with DatabaseManager(db) as db_manager:
+        title_crud = db_manager.title_crud
+        
+        return await title_crud.delete_title(title_id=title_id, title_name=title_name)
 
 
 @router.delete("/delete_episode", response_model=None)
@@ -119,15 +274,15 @@ async def delete_episode(
     episode_title: str = None,
 ):
     
-    db_manager = DatabaseManager(db)
-    episode_crud = db_manager.episode_crud
-    
-    return await episode_crud.delete_episode(
-        title_id=title_id,
-        title_name=title_name,
-        episode_number=episode_number,
-        episode_title=episode_title
-        )
+    async with DatabaseManager(db) as db_manager:
+        episode_crud = db_manager.episode_crud
+        
+        return await episode_crud.delete_episode(
+            title_id=title_id,
+            title_name=title_name,
+            episode_number=episode_number,
+            episode_title=episode_title
+            )
     
     
 @router.put("/update_title", response_model=schemas.Title)
@@ -137,10 +292,10 @@ async def update_title(
     db: AsyncSession = Depends(get_async_session),
 ):
     
-    db_manager = DatabaseManager(db)
-    title_crud = db_manager.title_crud
-    
-    return await title_crud.update_title(title_id=title_id, title_in=title_data)
+    async with DatabaseManager(db) as db_manager:
+        title_crud = db_manager.title_crud
+        
+        return await title_crud.update_title(title_id=title_id, title_in=title_data)
 
 
 @router.put("/update_episode", response_model=schemas.Episode)
@@ -149,10 +304,17 @@ async def update_episode(
     db: AsyncSession = Depends(get_async_session),
 ):
     
-    db_manager = DatabaseManager(db)
-    episode_crud = db_manager.episode_crud
+    async with DatabaseManager(db) as db_manager:
+        episode_crud = db_manager.episode_crud
+        
+        return await episode_crud.update_episode(
+            episode_number=episode_data.episode_number,
+            title_id=episode_data.title_id,
+            episode_in=episode_data)
+
+
+
+@router.get("/cache_stats")
+async def get_cache_stats():
     
-    return await episode_crud.update_episode(
-        episode_number=episode_data.episode_number,
-        title_id=episode_data.title_id,
-        episode_in=episode_data)
+    return {**await catalog_cache.stats(), "autocomplete": title_index.stats()}
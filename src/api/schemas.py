@@ -1,5 +1,7 @@
+from datetime import datetime
+
 from pydantic import BaseModel
-from typing import Dict, Optional
+from typing import Dict, List, Literal, Optional
     
 
 class TitleBase(BaseModel):
@@ -48,6 +50,7 @@ class TitleUpdate(BaseModel):
 
 class Title(TitleBase):
     id: str
+    updated_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
@@ -64,6 +67,9 @@ class EpisodeBase(BaseModel):
     
 class Episode(EpisodeBase):
     episode_number: int
+
+    class Config:
+        from_attributes = True
         
         
 class EpisodeCreate(EpisodeBase):
@@ -75,4 +81,68 @@ class EpisodeUpdate(BaseModel):
     episode_link: Optional[str] = None
     translations: Optional[Dict] = None
     title_id: Optional[str] = None
-    episode_number: Optional[int] = None
\ No newline at end of file
+    episode_number: Optional[int] = None
+
+
+class TitleWithEpisodes(Title):
+    episodes: List[Episode] = []
+
+
+class TitleBatch(BaseModel):
+    items: List[Title]
+    missing: List[str] = []
+
+
+class EpisodeBatch(BaseModel):
+    items: List[Episode]
+    missing: List[str] = []
+
+
+class TitlePage(BaseModel):
+    items: List[Title]
+    next_cursor: Optional[str] = None
+
+
+class TitleFilter(BaseModel):
+    genres: List[str] = []
+    # "any" - хотя бы один из жанров, "all" - все сразу
+    genre_match: Literal["any", "all"] = "any"
+    year_from: Optional[int] = None
+    year_to: Optional[int] = None
+    status: Optional[str] = None
+    type: Optional[str] = None
+    studio: Optional[str] = None
+    MPAA: Optional[str] = None
+
+
+class TitleFacets(BaseModel):
+    total: int
+    genres: Dict[str, int]
+    year: Dict[int, int]
+    status: Dict[str, int]
+    type: Dict[str, int]
+    studio: Dict[str, int]
+    MPAA: Dict[str, int]
+
+
+class TitleSuggestion(BaseModel):
+    id: str
+    name: str
+    japanese_title: str
+
+
+class EpisodePage(BaseModel):
+    items: List[Episode]
+    next_cursor: Optional[str] = None
+
+
+
+class BulkConflict(BaseModel):
+    index: int
+    reason: str
+
+
+class BulkResult(BaseModel):
+    created: int
+    ids: List[str] = []
+    conflicts: List[BulkConflict] = []
@@ -1,12 +1,136 @@
-from typing import List
+import orjson
+
+from collections import defaultdict
+from functools import partial
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
 from uuid import uuid4
+from pydantic import TypeAdapter
+from sqlalchemy import func, or_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import and_, or_
+from sqlalchemy.orm import sessionmaker
 from sqlalchemy.future import select
 
-from .models import Title, Episode
-from .dao import TitleDAO, EpisodeDAO
+from .autocomplete import publish_title_changes
+from .models import Title, TitleGenre, Episode
+from .dao import TitleDAO, TitleGenreDAO, EpisodeDAO
 from . import schemas, exceptions
+from ..cache import catalog_cache, invalidate, invalidated_within
+from ..config import BATCH_MAX_IDS, BULK_COPY_THRESHOLD, DB_REPLICA_MAX_LAG
+from ..database import UnitOfWork, after_commit, reads_from_replica
+from ..loader import BatchLoader
+
+
+TITLE_KEY = "title:"
+TITLES_PAGE_KEY = "titles:"
+EPISODE_KEY = "episode:"
+TITLE_EPISODES_KEY = "title_episodes:"
+
+# Уникальные строковые поля тайтла, по которым ищутся конфликты при массовой загрузке
+TITLE_UNIQUE_FIELDS = ("name", "japanese_title", "trailer_link", "big_img", "small_img")
+
+# SQLSTATE нарушения внешнего ключа
+FOREIGN_KEY_VIOLATION = "23503"
+
+# Поля тайтла с точным совпадением в фильтре и фасетах
+TITLE_FILTER_FIELDS = ("status", "type", "studio", "MPAA")
+# Сколько самых частых значений отдавать в каждом фасете
+FACET_LIMIT = 50
+
+title_list_adapter = TypeAdapter(List[schemas.Title])
+
+
+async def invalidate_titles() -> None:
+    await invalidate(TITLE_KEY, TITLES_PAGE_KEY, TITLE_EPISODES_KEY)
+
+
+async def invalidate_episodes() -> None:
+    await invalidate(EPISODE_KEY, TITLE_EPISODES_KEY)
+
+
+async def invalidate_catalog() -> None:
+    await invalidate(TITLE_KEY, TITLES_PAGE_KEY, EPISODE_KEY, TITLE_EPISODES_KEY)
+    
+    
+async def cache_result(db: AsyncSession, key: str, value: bytes) -> None:
+    
+    """ Кладет прочитанное в кеш. Реплика может еще не догнать недавнюю запись:
+    пока ее отставание укладывается в DB_REPLICA_MAX_LAG, результат чтения с реплики
+    не кешируем, иначе старая строка вернулась бы в кеш после инвалидации на весь TTL """
+    
+    if reads_from_replica(db) and invalidated_within(DB_REPLICA_MAX_LAG):
+        return
+    
+    await catalog_cache.set(key, value)
+    
+    
+def extract_genres(genres: Any) -> Set[str]:
+    
+    """ Строковые значения Title.genres любой вложенности - в нормализованном виде """
+    
+    if isinstance(genres, str):
+        genre = genres.strip().lower()
+        return {genre} if genre else set()
+    
+    if isinstance(genres, dict):
+        genres = genres.values()
+    elif not isinstance(genres, (list, tuple)):
+        return set()
+    
+    return set().union(*(extract_genres(value) for value in genres))
+
+
+def genre_rows(title_id: str, genres: Any) -> List[Dict[str, str]]:
+    return [{"title_id": title_id, "genre": genre} for genre in sorted(extract_genres(genres))]
+
+
+def filter_key(title_filter: Optional[schemas.TitleFilter]) -> str:
+    return title_filter.model_dump_json(exclude_defaults=True) if title_filter else "{}"
+
+
+def title_filter_conditions(title_filter: Optional[schemas.TitleFilter], exclude: str = None) -> list:
+    
+    """ Условия WHERE для фильтра каталога; exclude пропускает одно измерение (для его фасета) """
+    
+    if title_filter is None:
+        return []
+    
+    conditions = []
+    genres = extract_genres(title_filter.genres)
+    
+    if genres and exclude != "genres":
+        matching = select(TitleGenre.title_id).where(TitleGenre.genre.in_(sorted(genres)))
+        
+        # Первичный ключ (title_id, genre): число строк тайтла - число совпавших жанров
+        if title_filter.genre_match == "all":
+            matching = matching.group_by(TitleGenre.title_id).having(func.count() == len(genres))
+            
+        conditions.append(Title.id.in_(matching))
+        
+    if exclude != "year":
+        if title_filter.year_from is not None:
+            conditions.append(Title.year >= title_filter.year_from)
+        if title_filter.year_to is not None:
+            conditions.append(Title.year <= title_filter.year_to)
+            
+    for field in TITLE_FILTER_FIELDS:
+        value = getattr(title_filter, field)
+        
+        if value is not None and exclude != field:
+            conditions.append(getattr(Title, field) == value)
+            
+    return conditions
+
+
+async def load_titles(db: AsyncSession, ids: List[str]) -> Dict[str, schemas.Title]:
+    
+    titles, _ = await TitleDAO.find_many_by_ids(db, ids)
+    
+    return {title.id: schemas.Title.model_validate(title) for title in titles}
+
+
+# Одиночные GET /get_title?title_id= одного тика уходят в базу одним запросом
+title_loader = BatchLoader(load_titles, max_batch=BATCH_MAX_IDS)
 
 
 class TitleCRUD:
@@ -30,36 +154,321 @@ class TitleCRUD:
             id = id,
             )
         )
-
-        self.db.add(db_title)
-        await self.db.commit()
-        await self.db.refresh(db_title)
+        await TitleGenreDAO.add_many(self.db, genre_rows(id, title.genres))
+        
+        after_commit(self.db, invalidate_titles)
+        after_commit(self.db, partial(publish_title_changes, upserts=[(id, title.name, title.japanese_title)]))
         
         return db_title
     
 
-    async def get_existing_title(self, title_id: str = None, name: str = None, trailer_link: str = None) -> Title:
+    async def create_titles(self, titles: List[schemas.TitleCreate]) -> schemas.BulkResult:
+        
+        # Уже существующие значения уникальных полей - одним запросом
+        stmt = select(*(getattr(Title, field) for field in TITLE_UNIQUE_FIELDS)).where(or_(
+            *(getattr(Title, field).in_({getattr(title, field) for title in titles}) for field in TITLE_UNIQUE_FIELDS)
+            ))
+        result = await self.db.execute(stmt)
+        
+        existing = {field: set() for field in TITLE_UNIQUE_FIELDS}
+        in_batch = {field: set() for field in TITLE_UNIQUE_FIELDS}
+        
+        for row in result:
+            for field, value in zip(TITLE_UNIQUE_FIELDS, row):
+                existing[field].add(value)
+        
+        accepted = []
+        conflicts = []
+        
+        for index, title in enumerate(titles):
+            reason = None
+            
+            for field in TITLE_UNIQUE_FIELDS:
+                value = getattr(title, field)
+                
+                if value in existing[field]:
+                    reason = f"{field} already exists"
+                elif value in in_batch[field]:
+                    reason = f"duplicate {field} in batch"
+                    
+                if reason:
+                    break
+            
+            if reason:
+                conflicts.append(schemas.BulkConflict(index=index, reason=reason))
+                continue
+            
+            for field in TITLE_UNIQUE_FIELDS:
+                in_batch[field].add(getattr(title, field))
+                
+            accepted.append(schemas.TitleCreateDB(**title.model_dump(), id=str(uuid4())))
+        
+        # Проверка выше не защищает от параллельной вставки того же значения до записи
+        try:
+            created = await TitleDAO.add_many(self.db, accepted, use_copy=len(accepted) >= BULK_COPY_THRESHOLD)
+        except IntegrityError:
+            raise exceptions.TitleAlreadyExists
+        
+        genres = [row for title in accepted for row in genre_rows(title.id, title.genres)]
+        await TitleGenreDAO.add_many(self.db, genres, use_copy=len(genres) >= BULK_COPY_THRESHOLD)
+        
+        if created:
+            after_commit(self.db, invalidate_titles)
+            after_commit(self.db, partial(
+                publish_title_changes,
+                upserts=[(title.id, title.name, title.japanese_title) for title in accepted],
+                ))
+        
+        return schemas.BulkResult(created=created, ids=[title.id for title in accepted], conflicts=conflicts)
+    
+
+    async def get_existing_title(
+        self,
+        title_id: str = None,
+        name: str = None,
+        trailer_link: str = None,
+        session_maker: sessionmaker = None,
+    ) -> Optional[schemas.Title]:
+        
+        """ С session_maker поиск только по id идет через title_loader
+        и склеивается с параллельными запросами в один """
         
         if not name and not trailer_link and not title_id:
             
             raise exceptions.NoTitleData
         
-        title = await TitleDAO.find_one_or_none(self.db, or_(
-            Title.id == title_id,
-            Title.name == name,
-            Title.trailer_link == trailer_link,
-            ))
+        key = f"{TITLE_KEY}{title_id}:{name}:{trailer_link}"
+        cached = await catalog_cache.get(key)
+        
+        if cached is not None:
+            return schemas.Title.model_validate_json(cached)
+        
+        if session_maker is not None and title_id and not name and not trailer_link:
+            title = await title_loader.load(session_maker, title_id)
+        else:
+            title = await TitleDAO.find_one_by_keys(self.db, id=title_id, name=name, trailer_link=trailer_link)
+        
+        if not title:
+            return None
+        
+        title = schemas.Title.model_validate(title)
+        await cache_result(self.db, key, title.model_dump_json().encode())
         
         return title
     
     
-    async def get_all_titles(self, offset: int = 0, limit: int = 10, *filter, **filter_by) -> List[Title]:
+    async def get_titles_batch(self, ids: List[str]) -> schemas.TitleBatch:
+        
+        if len(set(ids)) > BATCH_MAX_IDS:
+            raise exceptions.TooManyIds
+        
+        titles, missing = await TitleDAO.find_many_by_ids(self.db, ids)
+        
+        return schemas.TitleBatch(items=titles, missing=missing)
+    
+    
+    async def get_title_with_episodes(self, title_id: str = None, name: str = None) -> schemas.TitleWithEpisodes:
+        
+        if not title_id and not name:
+            raise exceptions.NoTitleData
+        
+        key = f"{TITLE_EPISODES_KEY}{title_id}:{name}"
+        cached = await catalog_cache.get(key)
+        
+        if cached is not None:
+            return schemas.TitleWithEpisodes.model_validate_json(cached)
+        
+        title = await TitleDAO.find_with_episodes(self.db, title_id=title_id, name=name)
+        
+        if not title:
+            raise exceptions.TitleWasNotFound
         
-        titles = await TitleDAO.find_all(self.db, *filter, offset=offset, limit=limit, **filter_by)
+        title = schemas.TitleWithEpisodes.model_validate(title)
+        await cache_result(self.db, key, title.model_dump_json().encode())
+        
+        return title
+    
+    
+    async def get_all_titles(
+        self,
+        offset: int = 0,
+        limit: int = 10,
+        *filter,
+        title_filter: schemas.TitleFilter = None,
+        **filter_by,
+    ) -> List[schemas.Title]:
+        
+        # Кешируем только страницы без произвольных условий; фильтр каталога входит в ключ
+        if filter or filter_by:
+            titles = await TitleDAO.find_all(self.db, *filter, offset=offset, limit=limit, **filter_by)
+            return title_list_adapter.validate_python(titles, from_attributes=True)
+        
+        key = f"{TITLES_PAGE_KEY}offset:{offset}:{limit}:{filter_key(title_filter)}"
+        cached = await catalog_cache.get(key)
+        
+        if cached is not None:
+            return title_list_adapter.validate_json(cached)
+        
+        titles = await TitleDAO.find_all(self.db, *title_filter_conditions(title_filter), offset=offset, limit=limit)
+        titles = title_list_adapter.validate_python(titles, from_attributes=True)
+        await cache_result(self.db, key, title_list_adapter.dump_json(titles))
         
         return titles
     
     
+    async def get_titles_page(
+        self,
+        cursor: str = None,
+        limit: int = 10,
+        title_filter: schemas.TitleFilter = None,
+    ) -> schemas.TitlePage:
+        
+        key = f"{TITLES_PAGE_KEY}cursor:{cursor}:{limit}:{filter_key(title_filter)}"
+        cached = await catalog_cache.get(key)
+        
+        if cached is not None:
+            return schemas.TitlePage.model_validate_json(cached)
+        
+        try:
+            titles, next_cursor = await TitleDAO.find_page(
+                self.db,
+                *title_filter_conditions(title_filter),
+                order_by=(Title.id,),
+                cursor=cursor,
+                limit=limit,
+            )
+        except ValueError:
+            raise exceptions.InvalidCursor
+        
+        page = schemas.TitlePage(items=titles, next_cursor=next_cursor)
+        await cache_result(self.db, key, page.model_dump_json().encode())
+        
+        return page
+    
+    
+    async def search_titles(self, query: str, cursor: str = None, limit: int = 20) -> schemas.TitlePage:
+        
+        query = " ".join(query.split())
+        
+        if not query:
+            raise exceptions.EmptySearchQuery
+        
+        # Под префиксом страниц каталога: сбрасывается вместе с ними при записи
+        key = f"{TITLES_PAGE_KEY}search:{query.lower()}:{cursor}:{limit}"
+        cached = await catalog_cache.get(key)
+        
+        if cached is not None:
+            return schemas.TitlePage.model_validate_json(cached)
+        
+        try:
+            titles, next_cursor = await TitleDAO.search(self.db, query, cursor=cursor, limit=limit)
+        except ValueError:
+            raise exceptions.InvalidCursor
+        
+        page = schemas.TitlePage(items=titles, next_cursor=next_cursor)
+        await cache_result(self.db, key, page.model_dump_json().encode())
+        
+        return page
+    
+    
+    async def get_facets(self, title_filter: schemas.TitleFilter = None) -> schemas.TitleFacets:
+        
+        """ Число тайтлов по значениям каждого измерения. Для измерения учитываются все условия
+        фильтра, кроме его собственного, - так видно, сколько даст выбор другого значения """
+        
+        key = f"{TITLES_PAGE_KEY}facets:{filter_key(title_filter)}"
+        cached = await catalog_cache.get(key)
+        
+        if cached is not None:
+            return schemas.TitleFacets.model_validate_json(cached)
+        
+        total = await self.db.scalar(
+            select(func.count()).select_from(Title).where(*title_filter_conditions(title_filter))
+            )
+        
+        genre_count = func.count().label("count")
+        genres_stmt = (
+            select(TitleGenre.genre, genre_count)
+            .where(TitleGenre.title_id.in_(
+                select(Title.id).where(*title_filter_conditions(title_filter, exclude="genres"))
+                ))
+            .group_by(TitleGenre.genre)
+            .order_by(genre_count.desc())
+            .limit(FACET_LIMIT)
+        )
+        facets = {"total": total, "genres": dict((await self.db.execute(genres_stmt)).all())}
+        
+        for field in ("year", *TITLE_FILTER_FIELDS):
+            column = getattr(Title, field)
+            count = func.count().label("count")
+            stmt = (
+                select(column, count)
+                .where(*title_filter_conditions(title_filter, exclude=field))
+                .group_by(column)
+                .order_by(count.desc())
+                .limit(FACET_LIMIT)
+            )
+            facets[field] = dict((await self.db.execute(stmt)).all())
+            
+        result = schemas.TitleFacets(**facets)
+        await cache_result(self.db, key, result.model_dump_json().encode())
+        
+        return result
+    
+    
+    async def export_titles(self, include_episodes: bool = False, batch_size: int = 500) -> AsyncIterator[bytes]:
+        
+        """ Выгружает каталог в NDJSON пачками по ключу, без удержания курсора между запросами.
+        Вся выгрузка идет в одной транзакции REPEATABLE READ READ ONLY: все пачки и их серии
+        видят один снимок базы, даже если каталог меняется во время выгрузки """
+        
+        # Уровень изоляции задается до начала транзакции сессии
+        await self.db.connection(execution_options={"isolation_level": "REPEATABLE READ", "postgresql_readonly": True})
+        
+        # Вычисляемый поисковый вектор в выгрузку не попадает
+        columns = [column for column in Title.__table__.columns if column.computed is None]
+        last_id = None
+        
+        while True:
+            # Keyset-пачки вместо серверного курсора: запрос эпизодов не чередуется
+            # с открытым курсором на том же соединении
+            stmt = select(*columns).order_by(Title.id).limit(batch_size)
+            
+            if last_id is not None:
+                stmt = stmt.where(Title.id > last_id)
+                
+            partition = (await self.db.execute(stmt)).mappings().all()
+            
+            if not partition:
+                break
+            
+            last_id = partition[-1]["id"]
+            episodes = defaultdict(list)
+            
+            # Эпизоды пачки - одним запросом, без N+1
+            if include_episodes:
+                episodes_stmt = (
+                    select(Episode.__table__)
+                    .where(Episode.title_id.in_([row["id"] for row in partition]))
+                    .order_by(Episode.title_id, Episode.episode_number)
+                )
+                
+                for episode in (await self.db.execute(episodes_stmt)).mappings():
+                    episodes[episode["title_id"]].append(dict(episode))
+            
+            lines = []
+            
+            for row in partition:
+                record = dict(row)
+                
+                if include_episodes:
+                    record["episodes"] = episodes.get(row["id"], [])
+                    
+                lines.append(orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE))
+            
+            yield b"".join(lines)
+    
+    
     async def update_title(self, title_id: str, title_in: schemas.TitleUpdate):
         
         title = await self.get_existing_title(title_id=title_id)
@@ -75,7 +484,18 @@ class TitleCRUD:
                 Title.id == title_id,
                 obj_in=obj_in)
         
-        await self.db.commit()
+        # Индекс жанров пересобирается только при их изменении
+        if title_in.genres is not None:
+            await TitleGenreDAO.delete(self.db, TitleGenre.title_id == title_id)
+            await TitleGenreDAO.add_many(self.db, genre_rows(title_id, title_in.genres))
+        
+        after_commit(self.db, invalidate_titles)
+        
+        if title_update and (title_update.name, title_update.japanese_title) != (title.name, title.japanese_title):
+            after_commit(self.db, partial(
+                publish_title_changes,
+                upserts=[(title_id, title_update.name, title_update.japanese_title)],
+                ))
         
         return title_update
     
@@ -90,11 +510,10 @@ class TitleCRUD:
         if not title:
             raise exceptions.TitleWasNotFound
         
-        await TitleDAO.delete(self.db, or_(
-            title_id == Title.id,
-            title_name == Title.name))
+        await TitleDAO.delete(self.db, Title.id == title.id)
         
-        await self.db.commit()
+        after_commit(self.db, invalidate_catalog)
+        after_commit(self.db, partial(publish_title_changes, deletes=[title.id]))
         
         return {"Message": "Deleting successful"}
 
@@ -117,34 +536,98 @@ class EpisodeCRUD:
             **episode.model_dump(),
             )
         )
-
-        self.db.add(db_episode)
-        await self.db.commit()
-        await self.db.refresh(db_episode)
+        
+        after_commit(self.db, invalidate_episodes)
         
         return db_episode
         
     
+    async def create_episodes(self, episodes: List[schemas.EpisodeCreate]) -> schemas.BulkResult:
+        
+        title_ids = {episode.title_id for episode in episodes}
+        links = {episode.episode_link for episode in episodes}
+        
+        known_titles = set((await self.db.execute(
+            select(Title.id).where(Title.id.in_(title_ids))
+            )).scalars())
+        existing_links = set((await self.db.execute(
+            select(Episode.episode_link).where(Episode.episode_link.in_(links))
+            )).scalars())
+        
+        accepted = []
+        conflicts = []
+        
+        for index, episode in enumerate(episodes):
+            
+            if episode.title_id not in known_titles:
+                conflicts.append(schemas.BulkConflict(index=index, reason="title does not exist"))
+            elif episode.episode_link in existing_links:
+                conflicts.append(schemas.BulkConflict(index=index, reason="episode_link already exists"))
+            else:
+                existing_links.add(episode.episode_link)
+                accepted.append(episode)
+        
+        try:
+            created = await EpisodeDAO.add_many(self.db, accepted, use_copy=len(accepted) >= BULK_COPY_THRESHOLD)
+        except IntegrityError as e:
+            # Тайтл удалили или серию вставили параллельно между проверкой и записью
+            if getattr(e.orig, "sqlstate", None) == FOREIGN_KEY_VIOLATION:
+                raise exceptions.TitleWasNotFound
+            raise exceptions.EpisodeAlreadyExists
+        
+        if created:
+            after_commit(self.db, invalidate_episodes)
+        
+        return schemas.BulkResult(created=created, conflicts=conflicts)
+        
+    
     async def get_existing_episode(self,
         title_id: str = None,
         episode_link: str = None,
         episode_number: str = None,
-        ) -> Episode:
+        ) -> Optional[schemas.Episode]:
         
         if not episode_link and not (episode_number and title_id):
             raise exceptions.NoEpisodeData
         
-        episode = await EpisodeDAO.find_one_or_none(
-        self.db,
-        or_(Episode.episode_link == episode_link,
-        and_(Episode.episode_number == episode_number,
-             Episode.title_id == title_id))
-        )
+        key = f"{EPISODE_KEY}{title_id}:{episode_number}:{episode_link}"
+        cached = await catalog_cache.get(key)
+        
+        if cached is not None:
+            return schemas.Episode.model_validate_json(cached)
         
+        episode = None
+        
+        # Два точечных поиска по индексам вместо одного OR
+        if episode_link:
+            episode = await EpisodeDAO.find_one_or_none(self.db, Episode.episode_link == episode_link)
+        
+        if not episode and episode_number and title_id:
+            episode = await EpisodeDAO.find_one_or_none(
+                self.db,
+                Episode.title_id == title_id,
+                Episode.episode_number == episode_number,
+                )
+        
+        if not episode:
+            return None
+        
+        episode = schemas.Episode.model_validate(episode)
+        await cache_result(self.db, key, episode.model_dump_json().encode())
 
         return episode
 
 
+    async def get_episodes_batch(self, episode_links: List[str]) -> schemas.EpisodeBatch:
+        
+        if len(set(episode_links)) > BATCH_MAX_IDS:
+            raise exceptions.TooManyIds
+        
+        episodes, missing = await EpisodeDAO.find_many_by_ids(self.db, episode_links)
+        
+        return schemas.EpisodeBatch(items=episodes, missing=missing)
+    
+    
     async def get_all_episodes(self, offset: int, limit: int, title_id: str):
 
         episodes = await EpisodeDAO.find_all(self.db, offset=offset, limit=limit, title_id=title_id)
@@ -152,6 +635,20 @@ class EpisodeCRUD:
         return episodes
     
     
+    async def get_episodes_page(self, title_id: str, cursor: str = None, limit: int = 10) -> Tuple[List[Episode], Optional[str]]:
+        
+        try:
+            return await EpisodeDAO.find_page(
+                self.db,
+                order_by=(Episode.title_id, Episode.episode_number, Episode.episode_link),
+                cursor=cursor,
+                limit=limit,
+                title_id=title_id,
+                )
+        except ValueError:
+            raise exceptions.InvalidCursor
+    
+    
     async def update_episode(self, title_id: str, episode_number: int, episode_in: schemas.EpisodeUpdate):
         
         title = await TitleCRUD.get_existing_title(self, title_id=title_id)
@@ -168,11 +665,11 @@ class EpisodeCRUD:
         
         episode_update = await EpisodeDAO.update(
                 self.db,
-                Title.id == title_id,
+                Episode.title_id == title_id,
                 Episode.episode_number == episode_number,
                 obj_in=obj_in)
         
-        await self.db.commit()
+        after_commit(self.db, invalidate_episodes)
         
         return episode_update
     
@@ -196,28 +693,22 @@ class EpisodeCRUD:
         if not title:
             raise exceptions.TitleWasNotFound
         
-        episode = await self.get_existing_episode(title_id=title_id, episode_number=episode_number)
+        episode = await self.get_existing_episode(title_id=title.id, episode_number=episode_number)
         
         if not episode:
             raise exceptions.EpisodeDoesNotExist
         
-        await EpisodeDAO.delete(self.db, 
-        or_(title_id == Title.id, title_name == Title.name),
-        and_(or_(episode_number == Episode.episode_number, episode_title == Episode.episode_title )))
+        await EpisodeDAO.delete(self.db, Episode.episode_link == episode.episode_link)
         
-        await self.db.commit()
+        after_commit(self.db, invalidate_episodes)
         
         return {"Message": "Deleting successful"}
     
 
-class DatabaseManager:
+class DatabaseManager(UnitOfWork):
     
     def __init__(self, db: AsyncSession):
-        self.db = db
+        super().__init__(db)
         self.title_crud = TitleCRUD(db)
         self.episode_crud = EpisodeCRUD(db)
-
-    # Применение изменений к базе данных
-    async def commit(self):
-        await self.db.commit()
     
\ No newline at end of file
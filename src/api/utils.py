@@ -0,0 +1,58 @@
+import hashlib
+
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional
+
+from fastapi import Request
+
+
+# Слабый ETag: тело определяется версией строк, а не побайтовым представлением
+def make_etag(*parts) -> str:
+    
+    digest = hashlib.blake2b("|".join(map(str, parts)).encode(), digest_size=16).hexdigest()
+    
+    return f'W/"{digest}"'
+
+
+def cache_headers(etag: str, last_modified: Optional[datetime], cache_control: str) -> Dict[str, str]:
+    
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+        
+    return headers
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    
+    """ Проверяет условные заголовки запроса по правилам RFC 9110 """
+    
+    if_none_match = request.headers.get("if-none-match")
+    
+    # If-None-Match приоритетнее If-Modified-Since
+    if if_none_match is not None:
+        
+        if if_none_match.strip() == "*":
+            return True
+        
+        opaque = etag.removeprefix("W/")
+        
+        return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+    
+    if_modified_since = request.headers.get("if-modified-since")
+    
+    if if_modified_since is None or last_modified is None:
+        return False
+    
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    
+    # HTTP-дата хранит только секунды
+    return last_modified.replace(microsecond=0) <= since
@@ -17,4 +17,19 @@ MIN_USERNAME_LENGTH = os.environ.get("MIN_USERNAME_LENGTH")
 MAX_USERNAME_LENGTH = os.environ.get("MAX_USERNAME_LENGTH")
 
 MIN_PASSWORD_LENGTH = os.environ.get("MIN_PASSWORD_LENGTH")
-MAX_PASSWORD_LENGTH = os.environ.get("MAX_PASSWORD_LENGTH")
\ No newline at end of file
+MAX_PASSWORD_LENGTH = os.environ.get("MAX_PASSWORD_LENGTH")
+
+
+# Размер пула потоков для хеширования паролей (PBKDF2 отпускает GIL)
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+
+# Допустимая очередь на хеширование и время ожидания в ней, после чего - 503
+PASSWORD_HASH_QUEUE_SIZE = int(os.environ.get("PASSWORD_HASH_QUEUE_SIZE", 32))
+PASSWORD_HASH_QUEUE_TIMEOUT = float(os.environ.get("PASSWORD_HASH_QUEUE_TIMEOUT", 2))
+
+# Лимит неудачных попыток входа на имя пользователя и на IP за окно, после чего - 429
+LOGIN_ATTEMPTS_LIMIT = int(os.environ.get("LOGIN_ATTEMPTS_LIMIT", 10))
+LOGIN_ATTEMPTS_WINDOW = int(os.environ.get("LOGIN_ATTEMPTS_WINDOW", 300))
+
+# Время жизни кеша строк пользователей для эндпоинтов, которым нужна полная запись
+USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", 30))
\ No newline at end of file
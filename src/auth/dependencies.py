@@ -4,46 +4,64 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from .utils import OAuth2PasswordBearerWithCookie
 
-from . import exceptions
-from .models import User
+from . import exceptions, schemas
+from .config import USER_CACHE_TTL
+from ..cache import TTLCache
 from ..database import get_async_session
-from .service import DatabaseManager
+from .service import DatabaseManager, TokenCrud
 
 
 oauth2_scheme = OAuth2PasswordBearerWithCookie(tokenUrl="/api/auth/login")
 
+# Короткоживущий кеш полных записей пользователей; версия токена входит в ключ
+user_cache = TTLCache(ttl=USER_CACHE_TTL, max_entries=10_000, max_bytes=16 * 1024 * 1024)
+
 
 async def get_current_user(
         request: Request,
-        db: AsyncSession = Depends(get_async_session),
         token: str = Depends(oauth2_scheme),
-):
+) -> schemas.CurrentUser:
     
-    db_manager = DatabaseManager(db)
-    user_crud = db_manager.user_crud
-    token_crud = db_manager.token_crud
+    """ Достает пользователя из claims access-токена, не обращаясь к БД """
     
-    try:
-        user_id = await token_crud.get_access_token_payload(token)
-
-    except KeyError:
-        raise exceptions.InvalidCredentials
-    
-    user = await user_crud.get_existing_user(user_id=user_id)
-    return user
+    return await TokenCrud.get_access_token_payload(token)
 
 
-async def get_current_superuser(current_user: User = Depends(get_current_user)) -> User:
+async def get_current_superuser(current_user: schemas.CurrentUser = Depends(get_current_user)) -> schemas.CurrentUser:
     if not current_user.is_superuser:
         raise exceptions.NotEnoughPermissions
     return current_user
 
 
-async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
+async def get_current_active_user(current_user: schemas.CurrentUser = Depends(get_current_user)) -> schemas.CurrentUser:
     if not current_user.is_active:
         raise exceptions.InactiveUser
     return current_user
+
+
+async def get_current_user_row(
+        db: AsyncSession = Depends(get_async_session),
+        current_user: schemas.CurrentUser = Depends(get_current_active_user),
+) -> schemas.User:
+    
+    """ Полная запись пользователя для эндпоинтов, которым мало claims токена """
+    
+    key = f"{current_user.id}:{current_user.token_version}"
+    cached = await user_cache.get(key)
     
+    if cached is not None:
+        return schemas.User.model_validate_json(cached)
     
-        
+    db_manager = DatabaseManager(db)
+    user_crud = db_manager.user_crud
     
+    user = await user_crud.get_existing_user(user_id=current_user.id)
+    
+    # Сессии отозваны после выдачи токена
+    if not user or user.token_version != current_user.token_version:
+        raise exceptions.InvalidToken
+    
+    user = schemas.User.model_validate(user)
+    await user_cache.set(key, user.model_dump_json().encode())
+    
+    return user
@@ -59,3 +59,12 @@ class RoleAlreadyExists(HTTPException):
 class UserAlreadyActive(HTTPException):
     def __init__(self):
         super().__init__(status_code=409, detail="User is already active")
+
+
+class TooManyLoginAttempts(HTTPException):
+    def __init__(self, retry_after: int):
+        super().__init__(status_code=429, detail="Too many login attempts", headers={"Retry-After": str(retry_after)})
+
+class AuthServiceOverloaded(HTTPException):
+    def __init__(self, retry_after: int):
+        super().__init__(status_code=503, detail="Authentication service is overloaded", headers={"Retry-After": str(retry_after)})
\ No newline at end of file
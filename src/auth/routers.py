@@ -8,12 +8,12 @@ from typing import Optional
 
 from .config import ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_DAYS
 
-from . import schemas, exceptions
+from . import schemas, exceptions, utils
 
-from .dependencies import get_current_active_user, get_current_superuser
+from .dependencies import get_current_active_user, get_current_superuser, get_current_user_row
 from .models import User, Role
 from .service import DatabaseManager
-from ..database import get_async_session
+from ..database import get_async_session, get_read_session
 
 
 router = APIRouter()
@@ -25,10 +25,10 @@ async def create_user(
     user_data: schemas.UserCreate,
     db: AsyncSession = Depends(get_async_session),
 ) -> User:
-    db_manager = DatabaseManager(db)
-    user_crud = db_manager.user_crud
-    
-    return await user_crud.create_user(user=user_data)
+    async with DatabaseManager(db) as db_manager:
+        user_crud = db_manager.user_crud
+        
+        return await user_crud.create_user(user=user_data)
  
 
 # Создание новой роли
@@ -38,10 +38,10 @@ async def create_role(
     db: AsyncSession = Depends(get_async_session),
 ) -> Role:
     
-    db_manager = DatabaseManager(db)
-    role_crud = db_manager.role_crud
-    
-    return await role_crud.create_role(role=role_data)
+    async with DatabaseManager(db) as db_manager:
+        role_crud = db_manager.role_crud
+        
+        return await role_crud.create_role(role=role_data)
 
 
 # Точка входа пользователя
@@ -53,16 +53,20 @@ async def login(
     db: AsyncSession = Depends(get_async_session),
 ):
     
-    db_manager = DatabaseManager(db)
-    user_crud = db_manager.user_crud
-    token_crud = db_manager.token_crud
+    async with DatabaseManager(db) as db_manager:
+        user_crud = db_manager.user_crud
+        token_crud = db_manager.token_crud
 
-    user = await user_crud.authenticate_user(username=credentials.username, password=credentials.password)
-    
-    await user_crud.get_user_statement(username = user.username, request=request)
-    
-    token = await token_crud.create_tokens(user_id = user.id)
-    
+        user = await user_crud.authenticate_user(
+            username=credentials.username,
+            password=credentials.password,
+            client_ip=request.client.host if request.client else None,
+            )
+        
+        await user_crud.get_user_statement(username = user.username, request=request)
+        
+        token = await token_crud.create_tokens(user=user)
+        
     response.set_cookie(
         'access_token',
         token.access_token,
@@ -89,11 +93,11 @@ async def logout(
     active_user = Depends(get_current_active_user)
 ):
    
-    db_manager = DatabaseManager(db)
-    user_crud = db_manager.user_crud
-    
-    await user_crud.logout(refresh_token=request.cookies.get('refresh_token'))
-    
+    async with DatabaseManager(db) as db_manager:
+        user_crud = db_manager.user_crud
+        
+        await user_crud.logout(refresh_token=request.cookies.get('refresh_token'))
+        
     response = JSONResponse(content={
         "message": "logout successful",
     })
@@ -106,16 +110,10 @@ async def logout(
 
 @router.get("/me", response_model=schemas.User)
 async def get_current_user(
-    db: AsyncSession = Depends(get_async_session),
-    current_user: User = Depends(get_current_active_user)
-) -> Optional[User]:
+    current_user: schemas.User = Depends(get_current_user_row)
+) -> Optional[schemas.User]:
     
-    db_manager = DatabaseManager(db)
-    user_crud = db_manager.user_crud
-    
-    user = await user_crud.get_existing_user(username = current_user.username)
-    
-    return user
+    return current_user
 
 
 # Получение информации о пользователе по имени пользователя
@@ -124,8 +122,8 @@ async def get_user(
     username: str = None,
     email: str = None,
     user_id: str = None,
-    db: AsyncSession = Depends(get_async_session),
-    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_read_session),
+    current_user: schemas.CurrentUser = Depends(get_current_active_user),
 ) -> Optional[User]:
 
     db_manager = DatabaseManager(db)
@@ -141,8 +139,8 @@ async def get_user(
 async def get_all_users(
     offset: int = 0,
     limit: int = 10,
-    db: AsyncSession = Depends(get_async_session),
-    super_user: User = Depends(get_current_superuser)
+    db: AsyncSession = Depends(get_read_session),
+    super_user: schemas.CurrentUser = Depends(get_current_superuser)
 ):
     db_manager = DatabaseManager(db)
     user_crud = db_manager.user_crud
@@ -157,17 +155,16 @@ async def patch_user_role(
     db: AsyncSession = Depends(get_async_session),
     username: str = None,
     user_id: str = None,
-    super_user: User = Depends(get_current_superuser)
+    super_user: schemas.CurrentUser = Depends(get_current_superuser)
 ):
-    db_manager = DatabaseManager(db)
-    
-    user_crud = db_manager.user_crud
-    role_crud = db_manager.role_crud
-    
-    user = await user_crud.get_existing_user(username=username, user_id=user_id)
-    new_role = await role_crud.get_existing_role(role_id = new_role_id)
-    
-    return await role_crud.update_user_role(user_id=user.id, new_role_id=new_role.id)
+    async with DatabaseManager(db) as db_manager:
+        user_crud = db_manager.user_crud
+        role_crud = db_manager.role_crud
+        
+        user = await user_crud.get_existing_user(username=username, user_id=user_id)
+        new_role = await role_crud.get_existing_role(role_id = new_role_id)
+        
+        return await role_crud.update_user_role(user_id=user.id, new_role_id=new_role.id)
 
 
 @router.patch("/refresh_tokens")
@@ -177,10 +174,10 @@ async def refresh_token(
     db: AsyncSession = Depends(get_async_session),
 ):
     
-    db_manager = DatabaseManager(db)
-    token_crud = db_manager.token_crud
-    
-    new_token = await token_crud.refresh_token(request.cookies.get("refresh_token"))
+    async with DatabaseManager(db) as db_manager:
+        token_crud = db_manager.token_crud
+        
+        new_token = await token_crud.refresh_token(request.cookies.get("refresh_token"))
 
     response.set_cookie(
         'access_token',
@@ -205,14 +202,14 @@ async def delete_user_sessions(
     email: str = None,
     user_id: str = None,
     db: AsyncSession = Depends(get_async_session),
-    super_user: User = Depends(get_current_superuser)
+    super_user: schemas.CurrentUser = Depends(get_current_superuser)
 ):
     
-    db_manager = DatabaseManager(db)
-    user_crud = db_manager.user_crud
-    
-    await user_crud.abort_user_sessions(username=username, email=email, user_id=user_id)
-    
+    async with DatabaseManager(db) as db_manager:
+        user_crud = db_manager.user_crud
+        
+        await user_crud.abort_user_sessions(username=username, email=email, user_id=user_id)
+        
     response = JSONResponse(content={
         "message": "Delete successful",
     })
@@ -226,16 +223,22 @@ async def delete_user(
     email: str = None,
     user_id: str = None,
     db: AsyncSession = Depends(get_async_session),
-    super_user: User = Depends(get_current_superuser)
+    super_user: schemas.CurrentUser = Depends(get_current_superuser)
 ):
     
-    db_manager = DatabaseManager(db)
-    user_crud = db_manager.user_crud
-    
-    await user_crud.delete_user(username=username, email=email, user_id=user_id)
-    
+    async with DatabaseManager(db) as db_manager:
+        user_crud = db_manager.user_crud
+        
+        await user_crud.delete_user(username=username, email=email, user_id=user_id)
+        
     response = JSONResponse(content={
         "message": "Delete successful",
     })
     
-    return response
\ No newline at end of file
+    return response
+
+
+@router.get("/hashing_stats")
+async def get_hashing_stats(super_user: schemas.CurrentUser = Depends(get_current_superuser)):
+    
+    return utils.get_hashing_stats()
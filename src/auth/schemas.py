@@ -56,6 +56,10 @@ class UserUpdate(UserBase):
 class User(UserBase):
     id: str
     role_id: int
+    token_version: int = 0
+
+    class Config:
+        from_attributes = True
     
 class UserCreateDB(UserBase):
     id: str
@@ -94,3 +98,12 @@ class Token(BaseModel):
     access_token: str
     refresh_token: str
     token_type: str
+    
+
+class CurrentUser(BaseModel):
+    id: str
+    username: str
+    role_id: Optional[int] = None
+    is_active: bool
+    is_superuser: bool
+    token_version: int = 0
@@ -9,11 +9,11 @@ from datetime import datetime, timedelta, timezone
 from fastapi import Depends, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import or_, update
+from sqlalchemy import update
 
 from . import schemas, models, exceptions, utils
 
-from ..database import get_async_session
+from ..database import UnitOfWork, get_async_session
 from .config import(
     TOKEN_SECRET_KEY,
     ALGORITHM,
@@ -56,28 +56,37 @@ class UserCRUD:
             hashed_password=f"{salt}${hashed_password}"
             )
         )
-
-        self.db.add(db_user)
-        await self.db.commit()
-        await self.db.refresh(db_user)
-        
         
         return db_user
     
     
-    async def authenticate_user(self, username: str, password: str) -> Optional[User]:
+    async def authenticate_user(self, username: str, password: str, client_ip: str = None) -> Optional[User]:
+        
+        # Ключи счетчиков неудачных попыток: по имени пользователя и по IP
+        attempt_keys = [f"user:{username}"] + ([f"ip:{client_ip}"] if client_ip else [])
+        
+        for key in attempt_keys:
+            retry_after = utils.login_attempts.retry_after(key)
+            
+            if retry_after:
+                raise exceptions.TooManyLoginAttempts(retry_after=retry_after)
 
         user = await self.get_existing_user(username=username)       
         if not user:
+            utils.login_attempts.hit(*attempt_keys)
             raise exceptions.InvalidCredentials
          
          
-        if user and await utils.validate_password(password=password, hashed_password=user.hashed_password):   
+        if not await utils.validate_password(password=password, hashed_password=user.hashed_password):
+            utils.login_attempts.hit(*attempt_keys)
+            raise exceptions.InvalidCredentials
+        
+        utils.login_attempts.reset(f"user:{username}")
             
-            # Меняем состояние поля is_active пользователя
-            await self.update_user_statement(username=user.username, new_is_active = True)
+        # Меняем состояние поля is_active пользователя
+        await self.update_user_statement(username=user.username, new_is_active = True)
              
-            return user
+        return user
         
     
     async def logout(self, refresh_token: str = None) -> None:
@@ -94,8 +103,6 @@ class UserCRUD:
         
         await self.update_user_statement(user_id=user.id, new_is_active = False)
         
-        await self.db.commit()
-        
     
     # Проверка наличия пользователя с заданной электронной почтой, именем пользователя или ID
     async def get_existing_user(self, email: str = None, username: str = None, user_id: str = None) -> User:
@@ -103,10 +110,7 @@ class UserCRUD:
         if not email and not username and not user_id: 
             raise exceptions.NoUserData
         
-        user = await UserDAO.find_one_or_none(self.db, or_(
-            User.email == email,
-            User.username == username,
-            User.id == user_id))
+        user = await UserDAO.find_one_by_keys(self.db, email=email, username=username, id=user_id)
         
         return user
     
@@ -116,21 +120,26 @@ class UserCRUD:
         if not username and not user_id:
             raise exceptions.NoUserData
         
-        user = await UserDAO.find_one_or_none(self.db, or_(
-            User.username == username,
-            User.id == user_id))
+        user = await UserDAO.find_one_by_keys(self.db, username=username, id=user_id)
+        
+        if not user:
+            raise exceptions.UserDoesNotExist
+        
+        values = {"is_active": new_is_active}
+        
+        # Деактивация отзывает уже выданные access-токены
+        if not new_is_active:
+            values["token_version"] = User.token_version + 1
         
         # Меняем значение поля
         update_stmt = (
             update(User)
-            .where(or_(User.username == username, User.id == user_id))
-            .values(is_active=new_is_active)
+            .where(User.id == user.id)
+            .values(**values)
             .returning(User.is_active)
         )
         result = await self.db.execute(update_stmt)
         
-        await self.db.commit()
-        
         return {"message": new_is_active}
     
     
@@ -167,11 +176,9 @@ class UserCRUD:
         await UserDAO.update(
                 self.db,
                 User.id == user.id,
-                obj_in={'is_active': False},
+                obj_in={'is_active': False, 'token_version': User.token_version + 1},
             )
         
-        await self.db.commit()
-        
         
     async def delete_user(self, email: str = None, username: str = None, user_id: str = None) -> None:
         
@@ -189,12 +196,7 @@ class UserCRUD:
         if refresh_token:
                 await RefreshTokenDAO.delete(self.db, user_id = refresh_token.user_id)
         
-        await UserDAO.delete(self.db, or_(
-            user_id == User.id,
-            username == User.username,
-            email == User.email))
-        
-        await self.db.commit()
+        await UserDAO.delete(self.db, User.id == user.id)
         
     
     async def get_user_statement(self,
@@ -245,8 +247,6 @@ class RoleCRUD:
             )
         )
         
-        await self.db.commit()
-        
         return db_role
     
     # Проверка наличия роли с заданным именем или ID
@@ -255,9 +255,7 @@ class RoleCRUD:
         if not role_name and not role_id:
             raise exceptions.NoRoleData
         
-        role = await RoleDAO.find_one_or_none(self.db, or_(
-            Role.name == role_name,
-            Role.id == role_id))
+        role = await RoleDAO.find_one_by_keys(self.db, name=role_name, id=role_id)
         
         return role
     
@@ -270,10 +268,9 @@ class RoleCRUD:
         
         await UserDAO.update(self.db,
             User.id == user_id,
-            obj_in={"role_id": new_role_id}
+            obj_in={"role_id": new_role_id, "token_version": User.token_version + 1}
         )
         
-        await self.db.commit()          
         return new_user_role
     
     
@@ -284,17 +281,19 @@ class TokenCrud:
     
     
     # Функция для создания access токена с указанием срока действия
-    async def create_access_token(self, data: str):
+    async def create_access_token(self, user: User):
 
-        """ Создает access токен """
+        """ Создает access токен с данными, достаточными для авторизации без БД """
         
-        data_dict = {
-            "sub": data
+        to_encode = {
+            "sub": user.id,
+            "username": user.username,
+            "role_id": user.role_id,
+            "is_active": user.is_active,
+            "is_superuser": user.is_superuser,
+            "ver": user.token_version,
         }
 
-        # Создание словаря с данными для кодирования
-        to_encode = data_dict.copy()
-
         # Вычисление времени истечения срока действия токена
         expire = datetime.utcnow() + timedelta(minutes=int(ACCESS_TOKEN_EXPIRE_MINUTES))
         to_encode.update({"exp": expire})
@@ -311,16 +310,18 @@ class TokenCrud:
 
 
     # Создание access и refresh токенов для пользователя
-    async def create_tokens(self, user_id: str): 
+    async def create_tokens(self, user: User): 
+        
+        user_id = user.id
         
         # Создание access и refresh токенов на основе payload
-        access_token = await self.create_access_token(user_id)
+        access_token = await self.create_access_token(user)
         refresh_token = await self.create_refresh_token()
 
         refresh_token_expires = timedelta(
                 days=int(REFRESH_TOKEN_EXPIRE_DAYS))
 
-        db_token = await RefreshTokenDAO.add(
+        await RefreshTokenDAO.add(
                     self.db,
                     RefreshSessionCreate(
                         user_id=user_id,
@@ -328,20 +329,16 @@ class TokenCrud:
                         expires_at=refresh_token_expires.total_seconds()
                     )
                 )
-        await self.db.commit()
-        await self.db.refresh(db_token)
-
 
         return Token(access_token=access_token, refresh_token=refresh_token, token_type="bearer")
     
     
-    async def get_access_token_payload(db: AsyncSession, access_token: str):
+    @staticmethod
+    async def get_access_token_payload(access_token: str) -> schemas.CurrentUser:
         try:
             payload = jwt.decode(access_token,
                              TOKEN_SECRET_KEY,
                              algorithms=[ALGORITHM])
-            user_id = payload.get("sub")
-            return user_id
 
         except jwt.ExpiredSignatureError:
             raise exceptions.TokenExpired
@@ -349,6 +346,19 @@ class TokenCrud:
         except jwt.DecodeError:
             raise exceptions.InvalidToken
         
+        # Токены старого формата без нужных полей не принимаем
+        try:
+            return schemas.CurrentUser(
+                id=payload["sub"],
+                username=payload["username"],
+                role_id=payload.get("role_id"),
+                is_active=payload["is_active"],
+                is_superuser=payload["is_superuser"],
+                token_version=payload.get("ver", 0),
+            )
+        except (KeyError, ValueError):
+            raise exceptions.InvalidToken
+        
         
     
     async def refresh_token(self, token: str) -> Token:
@@ -361,7 +371,9 @@ class TokenCrud:
         
         if datetime.now(timezone.utc) >= refresh_token_session.created_at + timedelta(seconds=refresh_token_session.expires_at):
             
-            await RefreshTokenDAO.delete(id=refresh_token_session.id)
+            # Просроченную сессию удаляем сразу: исключение откатит остальную единицу работы
+            await RefreshTokenDAO.delete(self.db, id=refresh_token_session.id)
+            await self.db.commit()
             raise exceptions.TokenExpired
         
         user = await UserDAO.find_one_or_none(self.db, id=refresh_token_session.user_id)
@@ -369,7 +381,7 @@ class TokenCrud:
         if user is None:
             raise exceptions.InvalidToken
         
-        access_token = await self.create_access_token(data = user.id)
+        access_token = await self.create_access_token(user)
         refresh_token = await self.create_refresh_token()
         
         refresh_token_expires = timedelta(days=int(REFRESH_TOKEN_EXPIRE_DAYS))
@@ -383,19 +395,14 @@ class TokenCrud:
                 expires_at=refresh_token_expires.total_seconds()
             )
         )
-        await self.db.commit()
         
         return Token(access_token=access_token, refresh_token=refresh_token, token_type="bearer")
 
     
 # Определение класса для управления всеми crud-классами 
-class DatabaseManager:
+class DatabaseManager(UnitOfWork):
     def __init__(self, db: AsyncSession):
-        self.db = db
+        super().__init__(db)
         self.user_crud = UserCRUD(db)
         self.role_crud = RoleCRUD(db)
-        self.token_crud = TokenCrud(db)
-
-    # Применение изменений к базе данных
-    async def commit(self):
-        await self.db.commit()
\ No newline at end of file
+        self.token_crud = TokenCrud(db)
\ No newline at end of file
@@ -1,14 +1,28 @@
+import asyncio
 import hashlib
+import hmac
 import random
 import string
+import time
 
-from typing import Dict, Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
 
 from fastapi import HTTPException, Request, status
 from fastapi.openapi.models import OAuthFlows as OAuthFlowsModel
 from fastapi.security import OAuth2
 from fastapi.security.utils import get_authorization_scheme_param
 
+from . import exceptions
+from .config import (
+    PASSWORD_HASH_WORKERS,
+    PASSWORD_HASH_QUEUE_SIZE,
+    PASSWORD_HASH_QUEUE_TIMEOUT,
+    LOGIN_ATTEMPTS_LIMIT,
+    LOGIN_ATTEMPTS_WINDOW,
+    )
+
 
 class OAuth2PasswordBearerWithCookie(OAuth2):
     def __init__(
@@ -48,6 +62,52 @@ async def get_random_string(length=16):
 
     
 
+# Пул потоков, в котором считается PBKDF2, чтобы не блокировать event loop
+hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+hash_semaphore = asyncio.Semaphore(PASSWORD_HASH_WORKERS)
+
+hashing_stats = {"in_flight": 0, "waiting": 0, "completed": 0, "rejected": 0}
+
+
+def get_hashing_stats() -> Dict[str, int]:
+    return {**hashing_stats, "workers": PASSWORD_HASH_WORKERS, "queue_size": PASSWORD_HASH_QUEUE_SIZE}
+
+
+def _pbkdf2(password: str, salt: str) -> str:
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), salt.encode(), 100_000).hex()
+
+
+async def run_hashing(password: str, salt: str) -> str:
+    
+    """ Выполняет хеширование в пуле, не более PASSWORD_HASH_WORKERS одновременно
+    и не более PASSWORD_HASH_QUEUE_SIZE запросов в очереди """
+    
+    # Переполненная очередь - сразу отказ, а не ожидание до таймаута клиента
+    if hash_semaphore.locked() and hashing_stats["waiting"] >= PASSWORD_HASH_QUEUE_SIZE:
+        hashing_stats["rejected"] += 1
+        raise exceptions.AuthServiceOverloaded(retry_after=1)
+    
+    hashing_stats["waiting"] += 1
+    
+    try:
+        await asyncio.wait_for(hash_semaphore.acquire(), PASSWORD_HASH_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        hashing_stats["rejected"] += 1
+        raise exceptions.AuthServiceOverloaded(retry_after=1)
+    finally:
+        hashing_stats["waiting"] -= 1
+    
+    hashing_stats["in_flight"] += 1
+    
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(hash_executor, _pbkdf2, password, salt)
+    finally:
+        hashing_stats["in_flight"] -= 1
+        hashing_stats["completed"] += 1
+        hash_semaphore.release()
+
+
 # Проверка пароля на соответствие хешированному паролю
 async def validate_password(password: str, hashed_password: str):
     
@@ -56,8 +116,8 @@ async def validate_password(password: str, hashed_password: str):
     # Разделение хеша пароля на соль и хешированную часть
     salt, hashed = hashed_password.split("$")
     
-    # Сравнение хешированного пароля
-    return await hash_password(password, salt) == hashed
+    # Сравнение хешированного пароля за постоянное время
+    return hmac.compare_digest(await hash_password(password, salt), hashed)
 
 
 # Метод для хеширования пароля с учетом соли
@@ -69,7 +129,83 @@ async def hash_password(password: str, salt: str = None):
     if salt is None:
         salt = await get_random_string()
         
-    # Применение хэш-функции PBKDF2 к паролю и соли
-    enc = hashlib.pbkdf2_hmac("sha256", password.encode(), salt.encode(), 100_000)
+    # PBKDF2 считается в пуле потоков, event loop в это время свободен
+    return await run_hashing(password, salt)
+
+
+
+class AttemptCounter:
+    
+    """ Счетчики попыток в фиксированном окне: ключ -> (начало окна, число попыток).
+    Ключи упорядочены по началу окна, поэтому истекшие и самые старые окна
+    вытесняются с начала словаря за O(1) на ключ, без обхода всех счетчиков """
+    
+    def __init__(self, limit: int, window: int, max_keys: int = 100_000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._counters: "OrderedDict[str, Tuple[float, int]]" = OrderedDict()
+
+
+    def retry_after(self, key: str) -> Optional[int]:
+        
+        """ Возвращает, через сколько секунд ключ будет разблокирован, или None """
+        
+        counter = self._counters.get(key)
+        
+        if counter is None:
+            return None
+        
+        started_at, attempts = counter
+        remaining = started_at + self.window - time.monotonic()
+        
+        if remaining <= 0:
+            del self._counters[key]
+            return None
+        
+        if attempts < self.limit:
+            return None
+        
+        return int(remaining) + 1
+    
+    
+    def hit(self, *keys: str) -> None:
+        
+        now = time.monotonic()
+        
+        for key in keys:
+            started_at, attempts = self._counters.get(key, (now, 0))
+            
+            if started_at + self.window <= now:
+                started_at, attempts = now, 0
+                
+            self._counters[key] = (started_at, attempts + 1)
+            
+            # Новое окно - самое позднее: в конец, чтобы порядок оставался по началу окна
+            if attempts == 0:
+                self._counters.move_to_end(key)
+            
+        self._prune(now)
+            
+            
+    def reset(self, *keys: str) -> None:
+        for key in keys:
+            self._counters.pop(key, None)
+            
+            
+    def _prune(self, now: float) -> None:
+        
+        while self._counters:
+            started_at, _ = next(iter(self._counters.values()))
+            
+            if started_at + self.window > now:
+                break
+            
+            self._counters.popitem(last=False)
+        
+        # Если все окна еще открыты, жертвуем самыми старыми ключами
+        while len(self._counters) > self.max_keys:
+            self._counters.popitem(last=False)
+
 
-    return enc.hex()
\ No newline at end of file
+login_attempts = AttemptCounter(limit=LOGIN_ATTEMPTS_LIMIT, window=LOGIN_ATTEMPTS_WINDOW)
\ No newline at end of file
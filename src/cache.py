@@ -0,0 +1,303 @@
+import asyncio
+import json
+import logging
+import time
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from .config import (
+    CACHE_BACKEND,
+    CATALOG_CACHE_TTL,
+    CATALOG_CACHE_MAX_ENTRIES,
+    CATALOG_CACHE_MAX_BYTES,
+    REDIS_URL,
+    )
+from .pubsub import WORKER_ID, broker
+
+
+INVALIDATION_CHANNEL = "asqi:cache:invalidate"
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend(ABC):
+    
+    """ Интерфейс бэкенда кеша: значения хранятся как байты """
+    
+    # Общий для всех воркеров бэкенд не нуждается в межпроцессной инвалидации
+    shared = False
+    
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        ...
+    
+    
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: float = None) -> None:
+        ...
+    
+    
+    @abstractmethod
+    async def delete_prefix(self, *prefixes: str) -> None:
+        ...
+    
+    
+    @abstractmethod
+    async def clear(self) -> None:
+        ...
+    
+    
+    @abstractmethod
+    async def stats(self) -> Dict[str, Any]:
+        ...
+
+
+class TTLCache(CacheBackend):
+    
+    """ Ограниченный по числу записей и байтам LRU-кеш с временем жизни записей """
+    
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        
+        # key -> (момент истечения, значение); порядок словаря - порядок LRU
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._size = 0
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+
+    async def get(self, key: str) -> Optional[bytes]:
+        
+        entry = self._entries.get(key)
+        
+        if entry is None:
+            self.misses += 1
+            return None
+        
+        expires_at, value = entry
+        
+        if expires_at <= time.monotonic():
+            self._pop(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        
+        self._entries.move_to_end(key)
+        self.hits += 1
+        
+        return value
+    
+    
+    async def set(self, key: str, value: bytes, ttl: float = None) -> None:
+        
+        size = len(key) + len(value)
+        
+        # Запись, которая больше всего кеша, не кешируем
+        if size > self.max_bytes:
+            return
+        
+        if key in self._entries:
+            self._pop(key)
+        
+        self._entries[key] = (time.monotonic() + (ttl or self.ttl), value)
+        self._size += size
+        
+        while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._pop(oldest)
+            self.evictions += 1
+            
+            
+    async def delete_prefix(self, *prefixes: str) -> None:
+        
+        for key in [key for key in self._entries if key.startswith(prefixes)]:
+            self._pop(key)
+            
+            
+    async def clear(self) -> None:
+        self._entries.clear()
+        self._size = 0
+    
+    
+    async def stats(self) -> Dict[str, Any]:
+        
+        requests = self.hits + self.misses
+        
+        return {
+            "backend": "memory",
+            "entries": len(self._entries),
+            "bytes": self._size,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / requests, 4) if requests else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+        
+        
+    def _pop(self, key: str) -> None:
+        _, value = self._entries.pop(key)
+        self._size -= len(key) + len(value)
+
+
+class RedisCache(CacheBackend):
+    
+    """ Общий для всех воркеров кеш в Redis; вытеснение - политикой maxmemory сервера """
+    
+    shared = True
+    
+    def __init__(self, url: str = None, ttl: float = CATALOG_CACHE_TTL, namespace: str = "asqi:cache:", client=None):
+        if client is None:
+            from redis.asyncio import Redis
+            
+            client = Redis.from_url(url)
+            
+        self.client = client
+        self.ttl = ttl
+        self.namespace = namespace
+        
+        self.hits = 0
+        self.misses = 0
+
+
+    async def get(self, key: str) -> Optional[bytes]:
+        
+        value = await self.client.get(self.namespace + key)
+        
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            
+        return value
+    
+    
+    async def set(self, key: str, value: bytes, ttl: float = None) -> None:
+        await self.client.set(self.namespace + key, value, px=int((ttl or self.ttl) * 1000))
+        
+        
+    async def delete_prefix(self, *prefixes: str) -> None:
+        
+        for prefix in prefixes:
+            keys = [key async for key in self.client.scan_iter(match=f"{self.namespace}{prefix}*", count=500)]
+            
+            if keys:
+                await self.client.unlink(*keys)
+                
+                
+    async def clear(self) -> None:
+        await self.delete_prefix("")
+    
+    
+    async def stats(self) -> Dict[str, Any]:
+        
+        requests = self.hits + self.misses
+        
+        return {
+            "backend": "redis",
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / requests, 4) if requests else 0.0,
+        }
+
+
+def create_cache() -> CacheBackend:
+    
+    if CACHE_BACKEND == "redis":
+        return RedisCache(REDIS_URL)
+    
+    return TTLCache(
+        ttl=CATALOG_CACHE_TTL,
+        max_entries=CATALOG_CACHE_MAX_ENTRIES,
+        max_bytes=CATALOG_CACHE_MAX_BYTES,
+    )
+
+
+catalog_cache = create_cache()
+
+# Момент последней инвалидации, известной воркеру: своей или пришедшей по шине
+_last_invalidation = 0.0
+
+
+def invalidated_within(seconds: float) -> bool:
+    return time.monotonic() - _last_invalidation < seconds
+
+
+def _mark_invalidated() -> None:
+    global _last_invalidation
+    
+    _last_invalidation = time.monotonic()
+
+
+async def invalidate(*prefixes: str) -> None:
+    
+    """ Сбрасывает ключи в своем кеше и рассылает инвалидацию остальным воркерам """
+    
+    await catalog_cache.delete_prefix(*prefixes)
+    _mark_invalidated()
+    
+    message = json.dumps({"origin": WORKER_ID, "prefixes": prefixes})
+    
+    # Недоступная шина не должна ломать запись: остальные воркеры догонят по TTL
+    try:
+        await broker.publish(INVALIDATION_CHANNEL, message.encode())
+    except Exception as e:
+        logger.warning("Cache invalidation was not published: %s", e)
+
+
+async def listen_for_invalidations(cache: CacheBackend = None) -> None:
+    
+    cache = cache or catalog_cache
+    
+    while True:
+        try:
+            async for raw in broker.subscribe(INVALIDATION_CHANNEL):
+                
+                try:
+                    message = json.loads(raw)
+                except ValueError:
+                    continue
+                
+                if message.get("origin") == WORKER_ID:
+                    continue
+                
+                # Общий кеш сбросил источник, но отметка нужна и здесь: см. invalidated_within
+                _mark_invalidated()
+                
+                if cache.shared:
+                    continue
+                
+                await cache.delete_prefix(*message.get("prefixes", ()))
+                
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception("Cache invalidation listener failed: %s", e)
+            await asyncio.sleep(1)
+
+
+_listener: Optional[asyncio.Task] = None
+
+
+async def start_invalidation_listener() -> None:
+    global _listener
+    
+    if _listener is None:
+        _listener = asyncio.create_task(listen_for_invalidations())
+    
+    
+async def stop_invalidation_listener() -> None:
+    global _listener
+    
+    if _listener is not None:
+        _listener.cancel()
+        _listener = None
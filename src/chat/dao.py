@@ -0,0 +1,7 @@
+from ..dao import BaseDAO
+from .models import Messages
+from .schemas import MessagesCreate
+
+
+class MessagesDAO(BaseDAO[Messages, MessagesCreate, MessagesCreate]):
+    model = Messages
@@ -0,0 +1,394 @@
+import asyncio
+import json
+import logging
+import time
+
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+from fastapi import WebSocket
+
+from ..config import (
+    CHAT_HEARTBEAT_INTERVAL,
+    CHAT_IDLE_TIMEOUT,
+    CHAT_MAX_CONNECTIONS,
+    CHAT_QUEUE_SIZE,
+    CHAT_SLOW_CONSUMER_POLICY,
+)
+from ..pubsub import WORKER_ID, Broker, broker
+from .writer import MessageWriter, message_writer
+
+
+logger = logging.getLogger(__name__)
+
+DROP_OLDEST = "drop_oldest"
+DISCONNECT = "disconnect"
+
+DEFAULT_ROOM = "general"
+
+CHAT_CHANNEL = "asqi:chat"
+
+# Кадр проверки живости; клиент отвечает {"action": "pong"} или любым другим кадром
+PING_FRAME = json.dumps({"type": "ping"})
+
+
+class Connection:
+    
+    """ WebSocket-соединение с собственной очередью исходящих сообщений и задачей-писателем """
+    
+    def __init__(self, websocket: WebSocket, queue_size: int, on_sent: Callable[[float], None], on_failed: Callable[["Connection"], None]):
+        self.websocket = websocket
+        self.queue: "asyncio.Queue[Tuple[float, str]]" = asyncio.Queue(maxsize=queue_size)
+        self.writer: Optional[asyncio.Task] = None
+        self.rooms: Set[str] = set()
+        # Комната, в которую уходят сообщения без явного указания комнаты
+        self.active_room: Optional[str] = None
+        # Время последнего входящего кадра
+        self.last_seen = time.monotonic()
+        self._on_sent = on_sent
+        self._on_failed = on_failed
+
+
+    def start(self) -> None:
+        self.writer = asyncio.create_task(self._write_loop())
+        
+        
+    def touch(self) -> None:
+        self.last_seen = time.monotonic()
+        
+        
+    def stop(self) -> None:
+        if self.writer is not None and self.writer is not asyncio.current_task():
+            self.writer.cancel()
+        
+        
+    async def _write_loop(self) -> None:
+        
+        while True:
+            enqueued_at, message = await self.queue.get()
+            
+            try:
+                await self.websocket.send_text(message)
+            except Exception:
+                self._on_failed(self)
+                return
+            
+            self._on_sent(time.monotonic() - enqueued_at)
+
+
+class ConnectionManager:
+    
+    def __init__(
+        self,
+        queue_size: int = CHAT_QUEUE_SIZE,
+        slow_consumer_policy: str = CHAT_SLOW_CONSUMER_POLICY,
+        writer: MessageWriter = message_writer,
+        bus: Broker = broker,
+        max_connections: int = CHAT_MAX_CONNECTIONS,
+        heartbeat_interval: float = CHAT_HEARTBEAT_INTERVAL,
+        idle_timeout: float = CHAT_IDLE_TIMEOUT,
+    ):
+        self.active_connections: Dict[WebSocket, Connection] = {}
+        # Индекс комната -> соединения: рассылка стоит O(размер комнаты)
+        self.rooms: Dict[str, Set[Connection]] = defaultdict(set)
+        self.queue_size = queue_size
+        self.slow_consumer_policy = slow_consumer_policy
+        self.writer = writer
+        self.bus = bus
+        self.max_connections = max_connections
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = idle_timeout
+        
+        # Исходящие в шину сообщения публикует одна задача - так сохраняется порядок
+        self._outbox: "asyncio.Queue[bytes]" = asyncio.Queue()
+        self._publisher: Optional[asyncio.Task] = None
+        self._subscriber: Optional[asyncio.Task] = None
+        self._reaper: Optional[asyncio.Task] = None
+        # Ссылки на фоновые закрытия сокетов, чтобы задачи не собрал GC до завершения
+        self._closing: Set[asyncio.Task] = set()
+        self._next_seq: Dict[str, int] = defaultdict(int)
+        # Последний принятый номер по (воркер, комната), ограниченный LRU
+        self._last_seq: "OrderedDict[Tuple[str, str], int]" = OrderedDict()
+        self.duplicates = 0
+        
+        self.delivered = 0
+        self.dropped = 0
+        self.slow_disconnects = 0
+        self.idle_disconnects = 0
+        self.rejected = 0
+        self.peak_connections = 0
+        self.max_lag = 0.0
+        self.mean_lag = 0.0
+
+
+    async def connect(self, websocket: WebSocket, room: str = DEFAULT_ROOM) -> bool:
+        
+        """ Принимает соединение; при превышении лимита закрывает его с кодом 1013 (Try Again Later) """
+        
+        await websocket.accept()
+        
+        if len(self.active_connections) >= self.max_connections:
+            self.rejected += 1
+            await self._close(websocket, 1013, "Too many connections")
+            return False
+        
+        connection = Connection(websocket, self.queue_size, self._record_delivery, self._drop)
+        self.active_connections[websocket] = connection
+        self.peak_connections = max(self.peak_connections, len(self.active_connections))
+        self.join(websocket, room)
+        connection.start()
+        
+        return True
+    
+    
+    def touch(self, websocket: WebSocket) -> None:
+        connection = self.active_connections.get(websocket)
+        
+        if connection is not None:
+            connection.touch()
+
+
+    def disconnect(self, websocket: WebSocket) -> Set[str]:
+        
+        """ Убирает соединение из всех комнат и возвращает комнаты, в которых оно было """
+        
+        connection = self.active_connections.pop(websocket, None)
+        
+        if connection is None:
+            return set()
+        
+        connection.stop()
+        
+        for room in connection.rooms:
+            self._discard(room, connection)
+            
+        return connection.rooms
+    
+    
+    def join(self, websocket: WebSocket, room: str) -> None:
+        connection = self.active_connections.get(websocket)
+        
+        if connection is not None:
+            self.rooms[room].add(connection)
+            connection.rooms.add(room)
+            connection.active_room = room
+            
+            
+    def leave(self, websocket: WebSocket, room: str) -> None:
+        connection = self.active_connections.get(websocket)
+        
+        if connection is None or room not in connection.rooms:
+            return
+        
+        self._discard(room, connection)
+        connection.rooms.discard(room)
+        
+        if connection.active_room == room:
+            connection.active_room = next(iter(connection.rooms), None)
+            
+            
+    def is_member(self, websocket: WebSocket, room: str) -> bool:
+        connection = self.active_connections.get(websocket)
+        
+        return connection is not None and room in connection.rooms
+    
+    
+    def active_room(self, websocket: WebSocket) -> Optional[str]:
+        connection = self.active_connections.get(websocket)
+        
+        return connection.active_room if connection is not None else None
+            
+            
+    def _discard(self, room: str, connection: Connection) -> None:
+        members = self.rooms.get(room)
+        
+        if members is not None:
+            members.discard(connection)
+            
+            # Пустые комнаты не держим в индексе
+            if not members:
+                del self.rooms[room]
+
+
+    async def send_personal_message(self, message: str, websocket: WebSocket):
+        connection = self.active_connections.get(websocket)
+        
+        if connection is not None:
+            self._enqueue(connection, message)
+
+
+    async def start(self) -> None:
+        if self._subscriber is None:
+            self._subscriber = asyncio.create_task(self._subscribe_loop())
+            self._publisher = asyncio.create_task(self._publish_loop())
+            self._reaper = asyncio.create_task(self._heartbeat_loop())
+            
+            
+    async def stop(self) -> None:
+        for task in (self._subscriber, self._publisher, self._reaper):
+            if task is not None:
+                task.cancel()
+                
+        self._subscriber = self._publisher = self._reaper = None
+        
+        
+    async def _heartbeat_loop(self) -> None:
+        
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            self.reap()
+            
+            
+    def reap(self) -> None:
+        
+        """ Закрывает молчащие дольше idle_timeout соединения и пингует остальных притихших.
+        Пинг идет через очередь соединения, так что мертвый сокет отвалится на отправке """
+        
+        now = time.monotonic()
+        
+        for connection in list(self.active_connections.values()):
+            idle = now - connection.last_seen
+            
+            if idle >= self.idle_timeout:
+                self.idle_disconnects += 1
+                self._drop(connection, code=1001)
+            elif idle >= self.heartbeat_interval:
+                self._enqueue(connection, PING_FRAME)
+
+
+    async def broadcast(self, message: str, add_to_db: bool, room: str = DEFAULT_ROOM, user_id: str = None):
+        # Запись в БД идет в фоне и не задерживает рассылку; пишет только воркер-источник
+        if add_to_db:
+            self.writer.add({"message": message, "room": room, "user_id": user_id})
+        
+        # Без подписки на шину (например, в тестах) доставляем только локально
+        if self._subscriber is None:
+            self._deliver(room, message)
+            return
+        
+        self._next_seq[room] += 1
+        envelope = {"origin": WORKER_ID, "seq": self._next_seq[room], "room": room, "message": message}
+        self._outbox.put_nowait(json.dumps(envelope).encode())
+        
+        
+    def _deliver(self, room: str, message: str) -> None:
+        # Только постановка в очереди: доставкой занимаются писатели соединений
+        for connection in list(self.rooms.get(room, ())):
+            self._enqueue(connection, message)
+            
+            
+    async def _publish_loop(self) -> None:
+        
+        while True:
+            payload = await self._outbox.get()
+            
+            try:
+                await self.bus.publish(CHAT_CHANNEL, payload)
+            except Exception as e:
+                # Шина недоступна: свои клиенты все равно получают сообщение
+                logger.warning("Chat message was not published: %s", e)
+                envelope = json.loads(payload)
+                self._deliver(envelope["room"], envelope["message"])
+                
+                
+    async def _subscribe_loop(self) -> None:
+        
+        while True:
+            try:
+                async for payload in self.bus.subscribe(CHAT_CHANNEL):
+                    self._receive(payload)
+                    
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception("Chat subscription failed: %s", e)
+                await asyncio.sleep(1)
+                
+                
+    def _receive(self, payload: bytes) -> None:
+        
+        try:
+            envelope = json.loads(payload)
+            key = (envelope["origin"], envelope["room"])
+            seq = int(envelope["seq"])
+        except (ValueError, KeyError, TypeError):
+            return
+        
+        # Повторно доставленные сообщения отбрасываем
+        if seq <= self._last_seq.get(key, 0):
+            self.duplicates += 1
+            return
+        
+        self._last_seq[key] = seq
+        self._last_seq.move_to_end(key)
+        
+        if len(self._last_seq) > 10_000:
+            self._last_seq.popitem(last=False)
+        
+        self._deliver(envelope["room"], envelope["message"])
+
+
+    def _enqueue(self, connection: Connection, message: str) -> None:
+        
+        if connection.queue.full():
+            
+            if self.slow_consumer_policy == DISCONNECT:
+                self.slow_disconnects += 1
+                self._drop(connection, code=1008)
+                return
+            
+            connection.queue.get_nowait()
+            self.dropped += 1
+            
+        connection.queue.put_nowait((time.monotonic(), message))
+        
+        
+    def _drop(self, connection: Connection, code: int = 1011) -> None:
+        
+        self.disconnect(connection.websocket)
+        task = asyncio.create_task(self._close(connection.websocket, code))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+        
+        
+    @staticmethod
+    async def _close(websocket: WebSocket, code: int, reason: Optional[str] = None) -> None:
+        try:
+            await websocket.close(code=code, reason=reason)
+        except Exception:
+            pass
+        
+        
+    def _record_delivery(self, lag: float) -> None:
+        self.delivered += 1
+        self.max_lag = max(self.max_lag, lag)
+        # Экспоненциальное скользящее среднее задержки доставки
+        self.mean_lag += (lag - self.mean_lag) * 0.05
+
+
+    def stats(self) -> Dict[str, Any]:
+        
+        depths = [connection.queue.qsize() for connection in self.active_connections.values()]
+        
+        return {
+            "connections": len(depths),
+            "max_connections": self.max_connections,
+            "peak_connections": self.peak_connections,
+            "rejected": self.rejected,
+            "idle_disconnects": self.idle_disconnects,
+            "rooms": len(self.rooms),
+            "queued": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "slow_disconnects": self.slow_disconnects,
+            "mean_lag_ms": round(self.mean_lag * 1000, 3),
+            "max_lag_ms": round(self.max_lag * 1000, 3),
+            "slow_consumer_policy": self.slow_consumer_policy,
+            "bus_outbox": self._outbox.qsize(),
+            "bus_duplicates": self.duplicates,
+            "persistence": self.writer.stats(),
+        }
+
+
+manager = ConnectionManager()
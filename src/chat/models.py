@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import BigInteger, Column, DateTime, Index, String
+from sqlalchemy.sql import func
 
 from ..database import Base
 
@@ -6,6 +7,13 @@ from ..database import Base
 class Messages(Base):
     __tablename__ = "messages"
 
-    user_id = Column(String, primary_key=True)
-    chat_id = Column(Integer, unique=True)
-    message = Column(String)
\ No newline at end of file
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    room = Column(String, nullable=False, default="general", server_default="general")
+    user_id = Column(String, nullable=True, index=True)
+    message = Column(String, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    
+    # История комнаты читается keyset-пагинацией по (room, id)
+    __table_args__ = (
+        Index("ix_messages_room_id", "room", "id"),
+    )
@@ -1,13 +1,18 @@
+import json
+
 from typing import List
 
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect, Depends
 from pydantic import BaseModel
-from sqlalchemy import insert, select
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.chat.dao import MessagesDAO
+from src.chat.manager import DEFAULT_ROOM, manager
 from src.chat.models import Messages
-from src.chat.schemas import MessagesModel
-from ..database import async_session_maker, get_async_session
+from src.chat.schemas import MessagesModel, MessagesPage
+from ..config import PAGE_MAX_LIMIT
+from ..database import get_read_session
 
 router = APIRouter(
     prefix="/chat",
@@ -15,55 +20,106 @@ router = APIRouter(
 )
 
 
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-
-    async def send_personal_message(self, message: str, websocket: WebSocket):
-        await websocket.send_text(message)
-
-    async def broadcast(self, message: str, add_to_db: bool):
-        if add_to_db:
-            await self.add_messages_to_database(message)
-        for connection in self.active_connections:
-            await connection.send_text(message)
-
-    @staticmethod
-    async def add_messages_to_database(message: str):
-        async with async_session_maker() as session:
-            stmt = insert(Messages).values(
-                message=message
-            )
-            await session.execute(stmt)
-            await session.commit()
-
-
-manager = ConnectionManager()
+@router.get("/stats")
+async def get_chat_stats():
+    return manager.stats()
 
 
 @router.get("/last_messages")
 async def get_last_messages(
-        session: AsyncSession = Depends(get_async_session),
+        room: str = DEFAULT_ROOM,
+        session: AsyncSession = Depends(get_read_session),
 ) -> List[MessagesModel]:
-    query = select(Messages).order_by(Messages.chat_id.desc()).limit(5)
+    query = select(Messages).where(Messages.room == room).order_by(Messages.id.desc()).limit(5)
     messages = await session.execute(query)
     return messages.scalars().all()
 
 
+@router.get("/history", response_model=MessagesPage)
+async def get_history(
+        room: str = DEFAULT_ROOM,
+        cursor: str = None,
+        limit: int = Query(50, ge=1, le=PAGE_MAX_LIMIT),
+        session: AsyncSession = Depends(get_read_session),
+) -> MessagesPage:
+    
+    # От новых к старым; курсор указывает на последнее отданное сообщение
+    try:
+        messages, next_cursor = await MessagesDAO.find_page(
+            session,
+            order_by=(Messages.id,),
+            cursor=cursor,
+            limit=limit,
+            descending=True,
+            room=room,
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+    
+    return MessagesPage(items=messages, next_cursor=next_cursor)
+
+
+def parse_command(data: str) -> dict:
+    
+    """ Управляющие кадры - JSON вида {"action": "join" | "leave" | "message", "room": ..., "text": ...}
+    и {"action": "pong"} в ответ на пинг; все остальное считается обычным текстом """
+    
+    if not data.startswith("{"):
+        return {}
+    
+    try:
+        command = json.loads(data)
+    except ValueError:
+        return {}
+    
+    if not isinstance(command, dict):
+        return {}
+    
+    if command.get("action") != "pong" and not isinstance(command.get("room"), str):
+        return {}
+    
+    return command
+
+
 @router.websocket("/ws/{client_id}")
-async def websocket_endpoint(websocket: WebSocket, client_id: int):
-    await manager.connect(websocket)
+async def websocket_endpoint(websocket: WebSocket, client_id: int, room: str = DEFAULT_ROOM):
+    if not await manager.connect(websocket, room=room):
+        return
+    
     try:
         while True:
             data = await websocket.receive_text()
-            await manager.broadcast(f"Client #{client_id} says: {data}", add_to_db=True)
+            # Любой входящий кадр подтверждает, что клиент жив
+            manager.touch(websocket)
+            command = parse_command(data)
+            action = command.get("action")
+            
+            if action == "pong":
+                continue
+            
+            if action == "join":
+                manager.join(websocket, command["room"])
+                continue
+            
+            if action == "leave":
+                manager.leave(websocket, command["room"])
+                continue
+            
+            if action == "message":
+                target, text = command["room"], str(command.get("text", ""))
+            else:
+                target, text = manager.active_room(websocket), data
+                
+            # Писать можно только в комнаты, в которых состоишь
+            if target is None or not manager.is_member(websocket, target):
+                continue
+            
+            await manager.broadcast(
+                f"Client #{client_id} says: {text}",
+                add_to_db=True,
+                room=target,
+                user_id=str(client_id),
+            )
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
-        await manager.broadcast(f"Client #{client_id} left the chat", add_to_db=False)
\ No newline at end of file
+        for left_room in manager.disconnect(websocket):
+            await manager.broadcast(f"Client #{client_id} left the chat", add_to_db=False, room=left_room)
\ No newline at end of file
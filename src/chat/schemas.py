@@ -1,10 +1,23 @@
+from datetime import datetime
+from typing import List, Optional
+
 from pydantic import BaseModel
 
 
-class MessagesModel(BaseModel):
-    user_id: str
-    chat_id: int
+class MessagesCreate(BaseModel):
     message: str
+    room: str = "general"
+    user_id: Optional[str] = None
+
+
+class MessagesModel(MessagesCreate):
+    id: int
+    created_at: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+class MessagesPage(BaseModel):
+    items: List[MessagesModel]
+    next_cursor: Optional[str] = None
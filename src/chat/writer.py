@@ -0,0 +1,189 @@
+import asyncio
+import logging
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import DBAPIError
+
+from .dao import MessagesDAO
+from ..config import CHAT_FLUSH_BATCH_SIZE, CHAT_FLUSH_INTERVAL, CHAT_MAX_PENDING
+from ..database import async_session_maker
+
+
+logger = logging.getLogger(__name__)
+
+
+# Классы SQLSTATE ошибок в самих данных: 22 - некорректное значение (например, NUL-байт), 23 - нарушение ограничения
+ROW_ERROR_CLASSES = ("22", "23")
+
+
+def _is_row_error(e: Exception) -> bool:
+    
+    """ Ошибку вызвали сами строки, а не недоступность БД: повтор такой пачки ничего не даст """
+    
+    sqlstate = getattr(e.orig, "sqlstate", None) if isinstance(e, DBAPIError) else None
+    
+    return sqlstate is not None and sqlstate[:2] in ROW_ERROR_CLASSES
+
+
+class MessageWriter:
+    
+    """ Отложенная запись сообщений чата: буфер сбрасывается многострочным INSERT
+    при наборе batch_size сообщений или раз в interval секунд """
+    
+    def __init__(
+        self,
+        batch_size: int = CHAT_FLUSH_BATCH_SIZE,
+        interval: float = CHAT_FLUSH_INTERVAL,
+        max_pending: int = CHAT_MAX_PENDING,
+        max_retries: int = 3,
+        retry_delay: float = 0.5,
+    ):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        
+        self._pending: List[Dict[str, Any]] = []
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._failures = 0
+        
+        self.written = 0
+        self.failed_flushes = 0
+        self.dropped = 0
+        self.rejected = 0
+
+
+    def add(self, row: Dict[str, Any]) -> None:
+        
+        self._pending.append(row)
+        
+        # Буфер не растет бесконечно, если БД долго недоступна
+        if len(self._pending) > self.max_pending:
+            overflow = len(self._pending) - self.max_pending
+            del self._pending[:overflow]
+            self.dropped += overflow
+        
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+            
+            
+    async def start(self) -> None:
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+            
+            
+    async def stop(self) -> None:
+        
+        """ Останавливает фоновый сброс и дописывает все, что осталось в буфере """
+        
+        # Без отмены: текущий сброс мог уже забрать пачку из буфера, отмена потеряла бы ее.
+        # Фоновая задача доделывает сброс и выходит из цикла сама
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        
+        while self._pending and self._failures <= self.max_retries:
+            await self.flush()
+            
+            # Экспоненциальная пауза между повторами, чтобы не долбить лежащую БД
+            if self._failures:
+                await asyncio.sleep(self.retry_delay * 2 ** (self._failures - 1))
+            
+            
+    async def _run(self) -> None:
+        
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            
+            self._wakeup.clear()
+            
+            if not self._stopping:
+                await self.flush()
+            
+            
+    async def flush(self) -> None:
+        
+        async with self._lock:
+            batch, self._pending = self._pending, []
+            
+            if not batch:
+                return
+            
+            rejected, unwritten = await self._write_splitting(batch)
+            
+            for row, e in rejected:
+                logger.error("Chat message in room %r was dropped: %s", row.get("room"), e)
+                
+            self.rejected += len(rejected)
+            
+            if not unwritten:
+                self._failures = 0
+                return
+            
+            self.failed_flushes += 1
+            self._failures += 1
+            
+            # Повторяем незаписанное при следующем сбросе, пока не исчерпаны попытки
+            if self._failures <= self.max_retries:
+                self._pending = unwritten + self._pending
+            else:
+                self.dropped += len(unwritten)
+                self._failures = 0
+                
+                
+    async def _write_splitting(self, batch: List[Dict[str, Any]]) -> Tuple[List[Tuple[Dict[str, Any], Exception]], List[Dict[str, Any]]]:
+        
+        """ Пишет пачку, деля пополам куски с ошибкой в данных, пока плохие строки не останутся по одной.
+        Возвращает отброшенные строки с ошибками и строки, не записанные из-за недоступности БД """
+        
+        rejected = []
+        chunks = [batch]
+        
+        while chunks:
+            chunk = chunks.pop()
+            
+            try:
+                async with async_session_maker() as session:
+                    await MessagesDAO.add_many(session, chunk)
+                    await session.commit()
+                    
+            except Exception as e:
+                if not _is_row_error(e):
+                    logger.warning("Chat messages were not written: %s", e)
+                    # Текущий кусок и все еще не записанные, в исходном порядке
+                    return rejected, chunk + [row for rest in reversed(chunks) for row in rest]
+                
+                if len(chunk) == 1:
+                    rejected.append((chunk[0], e))
+                else:
+                    middle = len(chunk) // 2
+                    chunks += [chunk[middle:], chunk[:middle]]
+                continue
+            
+            self.written += len(chunk)
+            
+        return rejected, []
+            
+            
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": len(self._pending),
+            "written": self.written,
+            "failed_flushes": self.failed_flushes,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+        }
+
+
+message_writer = MessageWriter()
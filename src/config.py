@@ -15,3 +15,59 @@ TEST_DB_PORT = os.environ.get("TEST_DB_PORT")
 TEST_DB_NAME = os.environ.get("TEST_DB_NAME")
 TEST_DB_USER = os.environ.get("TEST_DB_USER")
 TEST_DB_PASS = os.environ.get("TEST_DB_PASS")
+
+# Пул соединений основного движка; размер подбирается под число воркеров и max_connections Postgres
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# Кеш подготовленных выражений asyncpg; 0 - для pgbouncer в режиме transaction
+DB_STATEMENT_CACHE_SIZE = int(os.environ.get("DB_STATEMENT_CACHE_SIZE", 100))
+
+# Реплики для чтения: "host:port" через запятую, имя БД и учетные данные - как у основной
+DB_REPLICA_HOSTS = [host.strip() for host in os.environ.get("DB_REPLICA_HOSTS", "").split(",") if host.strip()]
+DB_REPLICA_CHECK_INTERVAL = float(os.environ.get("DB_REPLICA_CHECK_INTERVAL", 10))
+DB_REPLICA_MAX_LAG = float(os.environ.get("DB_REPLICA_MAX_LAG", 10))
+# Сколько секунд после записи клиент читает с основной БД, чтобы видеть свои изменения
+DB_READ_YOUR_WRITES_WINDOW = int(os.environ.get("DB_READ_YOUR_WRITES_WINDOW", 5))
+
+
+CATALOG_CACHE_TTL = float(os.environ.get("CATALOG_CACHE_TTL", 60))
+CATALOG_CACHE_MAX_ENTRIES = int(os.environ.get("CATALOG_CACHE_MAX_ENTRIES", 10_000))
+CATALOG_CACHE_MAX_BYTES = int(os.environ.get("CATALOG_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+# Партии массовой загрузки от этого размера пишутся через COPY, меньшие - многострочным INSERT
+BULK_COPY_THRESHOLD = int(os.environ.get("BULK_COPY_THRESHOLD", 1000))
+# Наибольший размер страницы в списочных маршрутах (?limit=)
+PAGE_MAX_LIMIT = int(os.environ.get("PAGE_MAX_LIMIT", 100))
+# Максимум ключей в одном пакетном запросе (/titles/batch, /episodes/batch и склейка одиночных)
+BATCH_MAX_IDS = int(os.environ.get("BATCH_MAX_IDS", 200))
+
+# Заголовок Cache-Control для ответов каталога, отдельно для каждого маршрута
+TITLE_CACHE_CONTROL = os.environ.get("TITLE_CACHE_CONTROL", "public, max-age=60")
+TITLES_CACHE_CONTROL = os.environ.get("TITLES_CACHE_CONTROL", "public, max-age=30")
+
+# Полная перезагрузка индекса автодополнения на случай пропущенных событий шины
+AUTOCOMPLETE_RELOAD_INTERVAL = float(os.environ.get("AUTOCOMPLETE_RELOAD_INTERVAL", 900))
+
+# Бэкенд кеша каталога: "memory" (в каждом воркере свой) или "redis" (общий)
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "memory")
+REDIS_URL = os.environ.get("REDIS_URL")
+
+
+# Очередь исходящих сообщений на одно WebSocket-соединение и политика для медленных клиентов:
+# "drop_oldest" - выбрасывать самые старые сообщения, "disconnect" - закрывать соединение
+CHAT_QUEUE_SIZE = int(os.environ.get("CHAT_QUEUE_SIZE", 100))
+CHAT_SLOW_CONSUMER_POLICY = os.environ.get("CHAT_SLOW_CONSUMER_POLICY", "drop_oldest")
+
+# Отложенная запись сообщений чата: сброс пачкой по размеру или по таймеру
+CHAT_FLUSH_BATCH_SIZE = int(os.environ.get("CHAT_FLUSH_BATCH_SIZE", 100))
+CHAT_FLUSH_INTERVAL = float(os.environ.get("CHAT_FLUSH_INTERVAL", 0.5))
+CHAT_MAX_PENDING = int(os.environ.get("CHAT_MAX_PENDING", 10_000))
+
+# Пинг соединений без входящих кадров и закрытие тех, кто молчит дольше таймаута
+CHAT_HEARTBEAT_INTERVAL = float(os.environ.get("CHAT_HEARTBEAT_INTERVAL", 20))
+CHAT_IDLE_TIMEOUT = float(os.environ.get("CHAT_IDLE_TIMEOUT", 60))
+# Предел WebSocket-соединений на один процесс
+CHAT_MAX_CONNECTIONS = int(os.environ.get("CHAT_MAX_CONNECTIONS", 1000))
@@ -1,8 +1,15 @@
-from typing import Any, Dict, Generic, List, Optional, TypeVar, Union
+import asyncpg
+import base64
+import json
 
-from sqlalchemy import delete, insert, select, update
-from sqlalchemy.exc import SQLAlchemyError
+from functools import lru_cache
+from typing import Any, Dict, Generic, List, Optional, Sequence, Tuple, TypeVar, Union
+
+from sqlalchemy import JSON, Select, any_, bindparam, delete, insert, literal, literal_column, select, tuple_, union_all, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 from pydantic import BaseModel
 
 from .database import Base
@@ -13,6 +20,73 @@ CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 
 
+def encode_cursor(values: Sequence[Any]) -> str:
+    
+    """ Упаковывает значения ключа сортировки в непрозрачный курсор """
+    
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, types: Sequence[type] = None) -> List[Any]:
+    
+    """ Распаковывает курсор, выданный encode_cursor. С types проверяет число значений
+    и их типы: подделанный курсор - ValueError (400), а не ошибка базы при сравнении """
+    
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    
+    if types is not None:
+        if len(values) != len(types):
+            raise ValueError("Invalid cursor")
+        
+        for value, type_ in zip(values, types):
+            # bool - подкласс int, а целое в JSON годится и для float
+            if isinstance(value, bool) or not isinstance(value, (int, float) if type_ is float else type_):
+                raise ValueError("Invalid cursor")
+    
+    return values
+
+
+def _key_params(keys: Dict[str, Any]) -> Dict[str, Any]:
+    return {f"key_{name}": value for name, value in keys.items()}
+
+
+def _rows_by_keys(model: type, predicates: List[Any]) -> Select:
+    
+    if len(predicates) == 1:
+        return select(model).where(predicates[0])
+    
+    # OR по разным колонкам планировщик часто превращает в seq scan, а pk IN (UNION ALL ...)
+    # добавляет обратное соединение по первичному ключу - строки берем прямо из веток
+    # Отложенные колонки (например, search_vector) в ветки не попадают, как и в select(model)
+    columns = [prop.columns[0] for prop in model.__mapper__.column_attrs if not prop.deferred]
+    rows = union_all(*(
+        select(*columns, literal_column(str(rank)).label("key_rank")).where(predicate)
+        for rank, predicate in enumerate(predicates)
+    )).subquery()
+    
+    return select(aliased(model, rows)).order_by(rows.c.key_rank)
+
+
+@lru_cache(maxsize=None)
+def _keys_query(model: type, names: Tuple[str, ...], limit: Optional[int] = None) -> Select:
+    
+    """ Запрос по ключам names с параметрами key_<name>. Строится один раз на модель
+    и набор ключей: сборка UNION ALL из aliased-подзапроса в Python (прокси колонок,
+    ключ кэша) стоит около 1 мс - больше, чем сам поиск в базе """
+    
+    stmt = _rows_by_keys(model, [getattr(model, name) == bindparam(f"key_{name}") for name in names])
+    
+    return stmt if limit is None else stmt.limit(limit)
+
 
 class BaseDAO(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     model = None
@@ -46,6 +120,63 @@ class BaseDAO(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             return None
 
 
+    @classmethod
+    async def add_many(
+        cls,
+        db: AsyncSession,
+        objs_in: Sequence[Union[CreateSchemaType, Dict[str, Any]]],
+        use_copy: bool = False,
+        chunk_size: int = 1000,
+    ) -> int:
+        
+        """ Пакетная вставка: многострочный INSERT кусками или COPY для больших партий """
+        
+        rows = [obj if isinstance(obj, dict) else obj.model_dump() for obj in objs_in]
+        
+        if not rows:
+            return 0
+        
+        if use_copy:
+            try:
+                await cls._copy_rows(db, rows)
+            except asyncpg.IntegrityConstraintViolationError as e:
+                # COPY идет мимо SQLAlchemy: приводим ошибку драйвера к тому же IntegrityError, что и у INSERT
+                raise IntegrityError(f"COPY {cls.model.__tablename__}", None, e) from e
+            
+            return len(rows)
+        
+        # Кусками, чтобы не упереться в лимит параметров запроса
+        for start in range(0, len(rows), chunk_size):
+            await db.execute(insert(cls.model.__table__).values(rows[start:start + chunk_size]))
+            
+        return len(rows)
+    
+    
+    @classmethod
+    async def _copy_rows(cls, db: AsyncSession, rows: List[Dict[str, Any]]) -> None:
+        
+        table = cls.model.__table__
+        columns = [column for column in table.columns if column.key in rows[0]]
+        
+        # COPY через asyncpg принимает JSON только строкой
+        records = [
+            tuple(
+                json.dumps(row[column.key]) if isinstance(column.type, JSON) else row[column.key]
+                for column in columns
+            )
+            for row in rows
+        ]
+        
+        connection = await db.connection()
+        raw_connection = await connection.get_raw_connection()
+        
+        await raw_connection.driver_connection.copy_records_to_table(
+            table.name,
+            records=records,
+            columns=[column.name for column in columns],
+        )
+
+
     @classmethod
     async def find_one_or_none(cls, db: AsyncSession, *filter, **filter_by) -> Optional[ModelType]:
         
@@ -55,6 +186,76 @@ class BaseDAO(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         return result.scalars().one_or_none()
     
     
+    @classmethod
+    def keys_statement(cls, **keys) -> Optional[Select]:
+        
+        """ Запрос строк по любому из переданных уникальных ключей, None-ключи пропускаются.
+        Один ключ - один поиск по индексу; несколько - UNION ALL поисков по индексам,
+        каждый сразу с целой строкой и рангом ключа; строки упорядочены по приоритету
+        ключей (порядку аргументов) """
+        
+        predicates = [getattr(cls.model, name) == value for name, value in keys.items() if value is not None]
+        
+        if not predicates:
+            return None
+        
+        # Значения прямо в запросе - для EXPLAIN и сборки своих запросов; find_*_by_keys
+        # берут тот же запрос из кэша _keys_query и передают значения параметрами
+        return _rows_by_keys(cls.model, predicates)
+    
+    
+    @classmethod
+    async def find_by_keys(cls, db: AsyncSession, **keys) -> List[ModelType]:
+        
+        keys = {name: value for name, value in keys.items() if value is not None}
+        
+        if not keys:
+            return []
+        
+        result = await db.execute(_keys_query(cls.model, tuple(keys)), _key_params(keys))
+        
+        # Строка, найденная по нескольким ключам, остается на месте первого из них
+        return list(dict.fromkeys(result.scalars()))
+    
+    
+    @classmethod
+    async def find_many_by_ids(cls, db: AsyncSession, ids: Sequence[Any]) -> Tuple[List[ModelType], List[Any]]:
+        
+        """ Строки по списку первичных ключей одним запросом pk = ANY(:ids) в порядке ids
+        и список ненайденных ключей. Один параметр-массив вместо IN (...) - текст запроса
+        не зависит от числа ключей, и asyncpg переиспользует подготовленный запрос """
+        
+        ids = list(dict.fromkeys(ids))
+        
+        if not ids:
+            return [], []
+        
+        mapper = cls.model.__mapper__
+        pk = mapper.primary_key[0]
+        
+        stmt = select(cls.model).where(pk == any_(bindparam("ids", ids, type_=ARRAY(pk.type))))
+        result = await db.execute(stmt)
+        
+        found = {mapper.primary_key_from_instance(row)[0]: row for row in result.scalars()}
+        
+        return [found[id] for id in ids if id in found], [id for id in ids if id not in found]
+    
+    
+    @classmethod
+    async def find_one_by_keys(cls, db: AsyncSession, **keys) -> Optional[ModelType]:
+        
+        """ Если ключи указывают на разные строки, возвращается найденная по первому ключу """
+        
+        keys = {name: value for name, value in keys.items() if value is not None}
+        
+        if not keys:
+            return None
+        
+        result = await db.execute(_keys_query(cls.model, tuple(keys), limit=1), _key_params(keys))
+        
+        return result.scalars().first()
+
+
     @classmethod
     async def find_all(
         cls,
@@ -73,6 +274,46 @@ class BaseDAO(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         )
         result = await db.execute(stmt)
         return result.scalars().all()
+    
+    
+    @classmethod
+    async def find_page(
+        cls,
+        db: AsyncSession,
+        *filter,
+        order_by: Sequence[Any],
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        descending: bool = False,
+        **filter_by
+    ) -> Tuple[List[ModelType], Optional[str]]:
+        
+        """ Keyset-пагинация: страница строк после курсора и курсор следующей страницы """
+        
+        stmt = select(cls.model).filter(*filter).filter_by(**filter_by)
+        
+        if cursor:
+            values = decode_cursor(cursor, [col.type.python_type for col in order_by])
+            key = tuple_(*order_by)
+            bound = tuple_(*(literal(value, col.type) for col, value in zip(order_by, values)))
+            stmt = stmt.filter(key < bound if descending else key > bound)
+        
+        stmt = (
+            stmt
+            .order_by(*(col.desc() if descending else col.asc() for col in order_by))
+            .limit(limit + 1)
+        )
+        result = await db.execute(stmt)
+        rows = result.scalars().all()
+        
+        # Лишняя строка означает, что есть следующая страница
+        if len(rows) <= limit:
+            return rows, None
+        
+        rows = rows[:limit]
+        next_cursor = encode_cursor([getattr(rows[-1], col.key) for col in order_by])
+        
+        return rows, next_cursor
         
         
     @classmethod
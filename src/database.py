@@ -1,25 +1,371 @@
-from typing import AsyncGenerator
+import asyncio
+import itertools
+import logging
+import time
 
-from sqlalchemy import MetaData, create_engine
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from functools import lru_cache
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, List, Optional
+
+from fastapi import Depends, Request
+from sqlalchemy import MetaData, create_engine, exc, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.util.queue import AsyncAdaptedQueue, Empty
 
-from .config import DB_HOST, DB_NAME, DB_PASS, DB_PORT, DB_USER
+from .config import (
+    DB_HOST, DB_NAME, DB_PASS, DB_PORT, DB_USER,
+    DB_MAX_OVERFLOW, DB_POOL_PRE_PING, DB_POOL_RECYCLE, DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_STATEMENT_CACHE_SIZE,
+    DB_READ_YOUR_WRITES_WINDOW, DB_REPLICA_CHECK_INTERVAL, DB_REPLICA_HOSTS, DB_REPLICA_MAX_LAG,
+)
 
 print(DB_HOST, DB_NAME, DB_PASS, DB_PORT, DB_USER)
 
+logger = logging.getLogger(__name__)
+
 DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+SYNC_DATABASE_URL = f"postgresql+psycopg2://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 Base = declarative_base()
 metadata = MetaData()
 
-async_engine = create_async_engine(DATABASE_URL)
+
+class TimedQueue(AsyncAdaptedQueue):
+    
+    """ Очередь пула, которая замеряет только настоящее ожидание: когда свободного соединения нет """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waits = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        
+        
+    def get(self, block: bool = True, timeout: Optional[float] = None):
+        # Свободное соединение отдаем сразу: asyncio.wait_for в родительском get уступает цикл
+        # даже при непустой очереди, и такая выдача не должна выглядеть ожиданием
+        try:
+            return self.get_nowait()
+        except Empty:
+            if not block:
+                raise
+            
+        started = time.perf_counter()
+        
+        try:
+            return super().get(block, timeout)
+        finally:
+            wait = time.perf_counter() - started
+            self.waits += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    
+    """ Пул, который раздельно считает ожидание в очереди исчерпанного пула (TimedQueue)
+    и время открытия новых соединений, пока пул не заполнен """
+    
+    _queue_class = TimedQueue
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.total_connect = 0.0
+        self.max_connect = 0.0
+        
+        
+    @property
+    def waits(self) -> int:
+        return self._pool.waits
+    
+    
+    @property
+    def total_wait(self) -> float:
+        return self._pool.total_wait
+    
+    
+    @property
+    def max_wait(self) -> float:
+        return self._pool.max_wait
+        
+        
+    def _do_get(self):
+        self.checkouts += 1
+        
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        
+        
+    def _create_connection(self):
+        started = time.perf_counter()
+        
+        try:
+            return super()._create_connection()
+        finally:
+            elapsed = time.perf_counter() - started
+            self.connects += 1
+            self.total_connect += elapsed
+            self.max_connect = max(self.max_connect, elapsed)
+            
+            
+    def recreate(self):
+        # Счетчики живут в экземпляре пула и его очереди, а не в движке - переносим их при пересоздании
+        pool = super().recreate()
+        
+        for name in ("checkouts", "timeouts", "connects", "total_connect", "max_connect"):
+            setattr(pool, name, getattr(self, name))
+            
+        for name in ("waits", "total_wait", "max_wait"):
+            setattr(pool._pool, name, getattr(self._pool, name))
+            
+        return pool
+
+
+def make_async_engine(url: str) -> AsyncEngine:
+    return create_async_engine(
+        url,
+        poolclass=TimedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        connect_args={
+            # Кеш asyncpg и кеш подготовленных выражений диалекта SQLAlchemy
+            "statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+        },
+    )
+
+
+async_engine = make_async_engine(DATABASE_URL)
 async_session_maker = sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
 
-engine = create_engine(DATABASE_URL)
-session_maker = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Ключ в session.info, которым помечены сессии реплик
+REPLICA = "replica"
+
+# Отставание реплики; 0, если все полученное WAL уже применено (иначе простой основной БД выглядел бы как лаг)
+REPLICA_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class ReplicaSet:
+    
+    """ Движки реплик для чтения с проверкой живости и отставания.
+    Без здоровых реплик чтение уходит на основную БД """
+    
+    def __init__(self, engines: List[AsyncEngine], primary: sessionmaker, max_lag: float = DB_REPLICA_MAX_LAG):
+        self.engines = engines
+        self.session_makers = [
+            sessionmaker(engine, class_=AsyncSession, expire_on_commit=False, info={REPLICA: True}) for engine in engines
+        ]
+        self.primary = primary
+        self.max_lag = max_lag
+        # Пока первая проверка не прошла, реплики считаются здоровыми
+        self.healthy = [True] * len(engines)
+        self.lag: List[Optional[float]] = [None] * len(engines)
+        self.fallbacks = 0
+        self._counter = itertools.count()
+        self._checker: Optional[asyncio.Task] = None
+        
+        
+    def session_maker(self) -> sessionmaker:
+        
+        healthy = [maker for maker, ok in zip(self.session_makers, self.healthy) if ok]
+        
+        if not healthy:
+            if self.session_makers:
+                self.fallbacks += 1
+            return self.primary
+        
+        # Round-robin по здоровым репликам
+        return healthy[next(self._counter) % len(healthy)]
+    
+    
+    async def check(self) -> None:
+        
+        for i, engine in enumerate(self.engines):
+            try:
+                async with engine.connect() as conn:
+                    lag = float((await conn.execute(REPLICA_LAG_QUERY)).scalar() or 0)
+            except Exception as e:
+                logger.warning("Replica %s:%s is unavailable: %s", engine.url.host, engine.url.port, e)
+                self.healthy[i], self.lag[i] = False, None
+                continue
+            
+            self.healthy[i], self.lag[i] = lag <= self.max_lag, lag
+            
+            
+    async def start(self, interval: float = DB_REPLICA_CHECK_INTERVAL) -> None:
+        if self.engines and self._checker is None:
+            self._checker = asyncio.create_task(self._check_loop(interval))
+            
+            
+    async def stop(self) -> None:
+        if self._checker is not None:
+            self._checker.cancel()
+            self._checker = None
+            
+        for engine in self.engines:
+            await engine.dispose()
+            
+            
+    async def _check_loop(self, interval: float) -> None:
+        
+        while True:
+            await self.check()
+            await asyncio.sleep(interval)
+            
+            
+    def stats(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "host": f"{engine.url.host}:{engine.url.port}",
+                "healthy": ok,
+                "lag_seconds": lag,
+                **get_pool_stats(engine),
+            }
+            for engine, ok, lag in zip(self.engines, self.healthy, self.lag)
+        ]
+
+
+replicas = ReplicaSet(
+    [make_async_engine(f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{host}/{DB_NAME}") for host in DB_REPLICA_HOSTS],
+    primary=async_session_maker,
+)
+
+
+# Cookie с временем последней записи клиента; ставится middleware в src/main.py
+LAST_WRITE_COOKIE = "last_write"
+
+
+@lru_cache(maxsize=None)
+def get_sync_engine() -> Engine:
+    
+    """ Синхронный движок для миграций и административных скриптов.
+    Создается при первом обращении: воркерам приложения он не нужен """
+    
+    return create_engine(SYNC_DATABASE_URL, pool_pre_ping=DB_POOL_PRE_PING)
+
+
+@lru_cache(maxsize=None)
+def get_sync_session_maker() -> sessionmaker:
+    return sessionmaker(autocommit=False, autoflush=False, bind=get_sync_engine())
 
 
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
     async with async_session_maker() as session:
-        yield session
\ No newline at end of file
+        yield session
+
+        
+# Ключ в session.info со списком действий, отложенных до коммита
+AFTER_COMMIT = "after_commit"
+
+
+def after_commit(db: AsyncSession, callback: Callable[[], Awaitable[None]]) -> None:
+    
+    """ Откладывает callback (например, сброс кеша) до коммита единицы работы;
+    одинаковые callback за одну транзакцию выполняются один раз """
+    
+    callbacks = db.info.setdefault(AFTER_COMMIT, [])
+    
+    if callback not in callbacks:
+        callbacks.append(callback)
+
+
+class UnitOfWork:
+    
+    """ Один коммит на запрос: CRUD-методы только выполняют запросы,
+    а фиксирует их выход из async with (или явный commit()) """
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        
+        
+    async def __aenter__(self):
+        return self
+    
+    
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        
+        if exc_type is not None:
+            self.db.info.pop(AFTER_COMMIT, None)
+            await self.db.rollback()
+            return
+        
+        await self.commit()
+        
+        
+    async def commit(self) -> None:
+        await self.db.commit()
+        
+        for callback in self.db.info.pop(AFTER_COMMIT, []):
+            await callback()
+        
+        
+def wrote_recently(request: Request) -> bool:
+    
+    try:
+        last_write = float(request.cookies.get(LAST_WRITE_COOKIE, 0))
+    except ValueError:
+        return False
+    
+    return time.time() - last_write < DB_READ_YOUR_WRITES_WINDOW
+
+
+def get_read_session_maker(request: Request) -> sessionmaker:
+    
+    """ Фабрика сессий для чтения: реплика, либо основная БД,
+    если клиент недавно писал и реплика могла еще не догнать его изменения """
+    
+    return async_session_maker if wrote_recently(request) else replicas.session_maker()
+
+
+def reads_from_replica(db: AsyncSession) -> bool:
+    return bool(db.info.get(REPLICA))
+
+
+async def get_read_session(
+    session_maker: sessionmaker = Depends(get_read_session_maker),
+) -> AsyncGenerator[AsyncSession, None]:
+    
+    """ Сессия для маршрутов только на чтение, см. get_read_session_maker. Фабрика - зависимость:
+    FastAPI кеширует ее на запрос, и сессия с title_loader попадают на одну и ту же БД """
+    
+    async with session_maker() as session:
+        yield session
+        
+        
+def get_pool_stats(engine: AsyncEngine = async_engine) -> Dict[str, Any]:
+    pool = engine.pool
+    waits = getattr(pool, "waits", 0)
+    connects = getattr(pool, "connects", 0)
+    
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        # QueuePool считает overflow от -size, пока пул не заполнен
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": DB_MAX_OVERFLOW,
+        "timeout": DB_POOL_TIMEOUT,
+        "checkouts": getattr(pool, "checkouts", 0),
+        # Выдачи, которым пришлось ждать в очереди при исчерпанном пуле
+        "waits": waits,
+        "timeouts": getattr(pool, "timeouts", 0),
+        "mean_wait_ms": round(getattr(pool, "total_wait", 0.0) / waits * 1000, 3) if waits else 0.0,
+        "max_wait_ms": round(getattr(pool, "max_wait", 0.0) * 1000, 3),
+        "connects": connects,
+        "mean_connect_ms": round(getattr(pool, "total_connect", 0.0) / connects * 1000, 3) if connects else 0.0,
+        "max_connect_ms": round(getattr(pool, "max_connect", 0.0) * 1000, 3),
+    }
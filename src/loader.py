@@ -0,0 +1,84 @@
+import asyncio
+
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, List, Optional, Set, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+
+KeyType = TypeVar("KeyType", bound=Hashable)
+ValueType = TypeVar("ValueType")
+
+BatchFn = Callable[[AsyncSession, List[KeyType]], Awaitable[Dict[KeyType, ValueType]]]
+
+
+class BatchLoader(Generic[KeyType, ValueType]):
+    
+    """ Склеивает одиночные загрузки по ключу, пришедшие за один тик цикла событий,
+    в один пакетный запрос (как DataLoader). Пакет выполняется в собственной сессии
+    из переданной фабрики: у параллельных запросов разные сессии, а одной AsyncSession
+    нельзя пользоваться конкурентно. Загрузки через разные фабрики не смешиваются """
+    
+    def __init__(self, batch_fn: BatchFn, max_batch: int):
+        self.batch_fn = batch_fn
+        self.max_batch = max_batch
+        self._pending: Dict[sessionmaker, Dict[KeyType, asyncio.Future]] = {}
+        # Ссылки на выполняющиеся пакеты, чтобы задачи не собрал GC до завершения
+        self._running: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.loads = 0
+        
+        
+    async def load(self, session_maker: sessionmaker, key: KeyType) -> Optional[ValueType]:
+        
+        self.loads += 1
+        loop = asyncio.get_running_loop()
+        
+        if not self._pending:
+            # Диспетчеризация после уже готовых к выполнению корутин этого тика
+            loop.call_soon(self._dispatch)
+            
+        pending = self._pending.setdefault(session_maker, {})
+        future = pending.get(key)
+        
+        if future is None:
+            future = pending[key] = loop.create_future()
+            
+        # Отмена одного ожидающего не должна отменять результат для остальных
+        return await asyncio.shield(future)
+    
+    
+    def _dispatch(self) -> None:
+        
+        pending, self._pending = self._pending, {}
+        
+        for session_maker, futures in pending.items():
+            keys = list(futures)
+            
+            for start in range(0, len(keys), self.max_batch):
+                chunk = {key: futures[key] for key in keys[start:start + self.max_batch]}
+                task = asyncio.create_task(self._run(session_maker, chunk))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+                
+                
+    async def _run(self, session_maker: sessionmaker, futures: Dict[KeyType, asyncio.Future]) -> None:
+        
+        self.batches += 1
+        
+        try:
+            async with session_maker() as session:
+                found = await self.batch_fn(session, list(futures))
+        except Exception as e:
+            for future in futures.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        for key, future in futures.items():
+            if not future.done():
+                future.set_result(found.get(key))
+                
+                
+    def stats(self) -> Dict[str, Any]:
+        return {"loads": self.loads, "batches": self.batches}
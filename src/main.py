@@ -1,7 +1,16 @@
-from fastapi import FastAPI, Depends
+import time
+
+from fastapi import FastAPI, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import HTMLResponse
 
+from src.cache import start_invalidation_listener, stop_invalidation_listener
+from src.config import DB_READ_YOUR_WRITES_WINDOW
+from src.database import LAST_WRITE_COOKIE, async_engine, get_pool_stats, replicas
+from src.chat.manager import manager as chat_manager
+from src.chat.writer import message_writer
+from src.pubsub import broker
+from src.api.autocomplete import start_autocomplete, stop_autocomplete
 from src.api.routers import router as anime_router
 from src.auth.routers import router as auth_router
 from src.chat.routers import router as chat_router
@@ -34,6 +43,49 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def mark_writes(request: Request, call_next):
+    response = await call_next(request)
+    
+    # После успешной записи клиент какое-то время читает с основной БД (read-your-writes)
+    if request.method in ("POST", "PUT", "PATCH", "DELETE") and response.status_code < 400:
+        response.set_cookie(
+            LAST_WRITE_COOKIE,
+            str(time.time()),
+            max_age=DB_READ_YOUR_WRITES_WINDOW,
+            httponly=True,
+            samesite="lax",
+        )
+        
+    return response
+
+
+@app.on_event("startup")
+async def startup():
+    await start_invalidation_listener()
+    await message_writer.start()
+    await chat_manager.start()
+    await replicas.start()
+    await start_autocomplete()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    # Сначала дописываем буфер сообщений чата, затем закрываем шину
+    await chat_manager.stop()
+    await message_writer.stop()
+    await stop_invalidation_listener()
+    await stop_autocomplete()
+    await broker.close()
+    await replicas.stop()
+    await async_engine.dispose()
+
+
+@app.get("/pool_stats")
+async def pool_stats():
+    return {"primary": get_pool_stats(), "replicas": replicas.stats(), "replica_fallbacks": replicas.fallbacks}
+
+
 @app.get("/", response_class=HTMLResponse)
 def home():
     return """
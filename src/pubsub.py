@@ -0,0 +1,108 @@
+import asyncio
+
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import AsyncIterator, Dict, Optional, Set
+from uuid import uuid4
+
+from .config import REDIS_URL
+
+
+# Идентификатор процесса-воркера: по нему подписчики отличают свои сообщения от чужих
+WORKER_ID = uuid4().hex
+
+
+class Broker(ABC):
+    
+    """ Интерфейс pub/sub-шины для обмена сообщениями между воркерами """
+    
+    @abstractmethod
+    async def publish(self, channel: str, message: bytes) -> None:
+        ...
+    
+    
+    @abstractmethod
+    def subscribe(self, channel: str, ready: Optional[asyncio.Event] = None) -> AsyncIterator[bytes]:
+        
+        """ Сообщения канала; ready выставляется, когда подписка уже действует """
+        
+        ...
+    
+    
+    async def close(self) -> None:
+        pass
+
+
+class InProcessBroker(Broker):
+    
+    """ Шина внутри одного процесса: для тестов и запуска в один воркер """
+    
+    def __init__(self):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+
+
+    async def publish(self, channel: str, message: bytes) -> None:
+        for queue in list(self._subscribers.get(channel, ())):
+            queue.put_nowait(message)
+            
+            
+    async def subscribe(self, channel: str, ready: Optional[asyncio.Event] = None) -> AsyncIterator[bytes]:
+        queue = asyncio.Queue()
+        self._subscribers[channel].add(queue)
+        
+        if ready is not None:
+            ready.set()
+        
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._subscribers[channel].discard(queue)
+
+
+class RedisBroker(Broker):
+    
+    """ Шина поверх Redis PUBLISH/SUBSCRIBE """
+    
+    def __init__(self, url: str = None, client=None):
+        if client is None:
+            from redis.asyncio import Redis
+            
+            client = Redis.from_url(url)
+            
+        self.client = client
+
+
+    async def publish(self, channel: str, message: bytes) -> None:
+        await self.client.publish(channel, message)
+
+
+    async def subscribe(self, channel: str, ready: Optional[asyncio.Event] = None) -> AsyncIterator[bytes]:
+        pubsub = self.client.pubsub()
+        await pubsub.subscribe(channel)
+        
+        if ready is not None:
+            ready.set()
+        
+        try:
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    yield message["data"]
+        finally:
+            await pubsub.unsubscribe(channel)
+            await pubsub.aclose()
+            
+            
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+def create_broker() -> Broker:
+    
+    if REDIS_URL:
+        return RedisBroker(REDIS_URL)
+    
+    return InProcessBroker()
+
+
+broker = create_broker()
@@ -1,14 +1,15 @@
 import asyncio
+from contextlib import contextmanager
 from httpx import AsyncClient
 from fastapi.testclient import TestClient
 from typing import AsyncGenerator
 import pytest
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import NullPool
 
-from src.database import get_async_session
-from src import metadata
+from src.database import Base, get_async_session, get_read_session, get_read_session_maker
 from src.config import (TEST_DB_HOST, TEST_DB_PORT, TEST_DB_NAME, TEST_DB_USER, TEST_DB_PASS)
 
 from src.main import app
@@ -19,7 +20,6 @@ DATABASE_URL= f"postgresql+asyncpg://{TEST_DB_USER}:{TEST_DB_PASS}@{TEST_DB_HOST
 
 async_engine = create_async_engine(DATABASE_URL, poolclass=NullPool)
 async_session_maker = sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
-metadata.bind = async_engine
 
 
 async def override_get_async_session() -> AsyncGenerator[AsyncSession, None]:
@@ -27,15 +27,17 @@ async def override_get_async_session() -> AsyncGenerator[AsyncSession, None]:
         yield session
 
 app.dependency_overrides[get_async_session] = override_get_async_session
+app.dependency_overrides[get_read_session] = override_get_async_session
+app.dependency_overrides[get_read_session_maker] = lambda: async_session_maker
 
 
 @pytest.fixture(autouse=True, scope='session')
 async def prepare_database():
     async with async_engine.begin() as conn:
-        await conn.run_sync(metadata.create_all)
+        await conn.run_sync(Base.metadata.create_all)
     yield
     async with async_engine.begin() as conn:
-        await conn.run_sync(metadata.drop_all)
+        await conn.run_sync(Base.metadata.drop_all)
         
         
 # SETUP
@@ -48,6 +50,22 @@ def event_loop(request):
 
 client = TestClient(app)
 
+
+@contextmanager
+def count_statements():
+    """SQL-запросы, выполненные тестовой БД внутри блока"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+
 @pytest.fixture(scope="session")
 async def ac() -> AsyncGenerator[AsyncClient, None]:
     async with AsyncClient(app=app, base_url="http://test") as ac:
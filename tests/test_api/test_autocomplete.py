@@ -0,0 +1,107 @@
+import asyncio
+import json
+
+from src.api.autocomplete import (
+    AUTOCOMPLETE_CHANNEL, TitleIndex, listen_for_title_changes, start_autocomplete, stop_autocomplete,
+)
+from src.pubsub import InProcessBroker
+
+
+def make_index():
+    index = TitleIndex()
+    index.build([
+        ("1", "One Piece", "Ван-Пис"),
+        ("2", "One Punch Man", "Ванпанчмен"),
+        ("3", "Ｏｎｅ　Ｏｕｔｓ", "Уан-аутс"),
+    ])
+    return index
+
+
+def test_lookup_matches_normalized_word_prefixes():
+    index = make_index()
+
+    # Порядок - по нормализованному ключу: "one outs" < "one piece" < "one punch man"
+    assert [t["id"] for t in index.lookup("one")] == ["3", "1", "2"]
+    assert [t["id"] for t in index.lookup("  PUNCH  m")] == ["2"]
+    assert [t["id"] for t in index.lookup("piece")] == ["1"]
+    assert [t["id"] for t in index.lookup("ван")] == ["1", "2"]
+    assert index.lookup("one p", limit=1) == [{"id": "1", "name": "One Piece", "japanese_title": "Ван-Пис"}]
+    assert index.lookup("   ") == []
+
+
+def test_upsert_and_remove_update_index_incrementally():
+    index = make_index()
+
+    index.upsert("1", "Two Piece", "Ван-Пис")
+    index.remove("2")
+    index.remove("missing")
+
+    assert [t["id"] for t in index.lookup("one")] == ["3"]
+    assert [t["id"] for t in index.lookup("two")] == ["1"]
+    assert index.stats()["titles"] == 2
+    assert index.stats()["keys"] == len(index._entries)
+
+
+async def test_changes_from_other_workers_are_applied(monkeypatch):
+    broker = InProcessBroker()
+    monkeypatch.setattr("src.api.autocomplete.broker", broker)
+    index = make_index()
+
+    listener = asyncio.create_task(listen_for_title_changes(index))
+    await asyncio.sleep(0)
+
+    message = {"origin": "other", "upserts": [["4", "Naruto", "Наруто"]], "deletes": ["1"]}
+    await broker.publish(AUTOCOMPLETE_CHANNEL, json.dumps(message).encode())
+    await asyncio.sleep(0.01)
+    listener.cancel()
+
+    assert [t["id"] for t in index.lookup("nar")] == ["4"]
+    assert index.lookup("piece") == []
+
+
+class SlowSession:
+    """Сессия, во время чтения которой приходят изменения с шины"""
+
+    def __init__(self, index, rows, message):
+        self.index, self.rows, self.message = index, rows, message
+
+    async def execute(self, stmt):
+        self.index.apply(self.message)
+        return self
+
+    def all(self):
+        return self.rows
+
+
+async def test_changes_during_load_are_replayed_over_snapshot():
+    index = make_index()
+    # Снимок прочитан до изменения: в нем еще старое название и удаленный тайтл
+    snapshot = [("1", "One Piece", "Ван-Пис"), ("2", "One Punch Man", "Ванпанчмен")]
+    message = {"upserts": [["1", "Two Piece", "Ван-Пис"], ["4", "Naruto", "Наруто"]], "deletes": ["2"]}
+
+    await index.load(SlowSession(index, snapshot, message))
+
+    assert [t["id"] for t in index.lookup("two")] == ["1"]
+    assert [t["id"] for t in index.lookup("nar")] == ["4"]
+    assert index.lookup("one") == []
+    assert index.stats()["titles"] == 2
+
+    # Вне загрузки изменения не копятся
+    index.apply({"deletes": ["4"]})
+    assert index._buffer is None
+
+
+async def test_start_subscribes_before_loading(monkeypatch):
+    broker = InProcessBroker()
+    monkeypatch.setattr("src.api.autocomplete.broker", broker)
+    subscribers_at_load = []
+
+    async def reload_index(index=None):
+        subscribers_at_load.append(len(broker._subscribers[AUTOCOMPLETE_CHANNEL]))
+
+    monkeypatch.setattr("src.api.autocomplete.reload_index", reload_index)
+
+    await start_autocomplete()
+    await stop_autocomplete()
+
+    assert subscribers_at_load == [1]
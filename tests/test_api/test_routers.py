@@ -0,0 +1,426 @@
+import orjson
+import pytest
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from src.api import service
+from src.api.dao import TitleDAO
+from src.api.models import Episode, Title
+from src.api.service import TitleCRUD
+from src.dao import encode_cursor
+from src.database import REPLICA
+
+from ..conftest import async_engine, async_session_maker, client, count_statements
+
+
+def title_payload(name: str, **fields) -> dict:
+    return {
+        "name": name,
+        "trailer_link": f"https://example.com/{name}/trailer",
+        "num_episodes": 0,
+        "synopsis": "synopsis",
+        "japanese_title": f"{name} jp",
+        "country": "Japan",
+        "year": 2020,
+        "genres": {"items": ["drama"]},
+        "rating": "8",
+        "status": "released",
+        "studio": "studio",
+        "MPAA": "PG-13",
+        "duration": "24 min",
+        "type": "TV",
+        "small_img": f"https://example.com/{name}/small.jpg",
+        "big_img": f"https://example.com/{name}/big.jpg",
+        "screens": {"items": [name]},
+        **fields,
+    }
+
+
+def create_title_with_episodes(name: str, episodes: int, **fields) -> str:
+    response = client.post("/create_title/", json=title_payload(name, num_episodes=episodes, **fields))
+    title_id = response.json()["id"]
+
+    client.post("/create_episodes", json=[{
+        "episode_title": f"Episode {number}",
+        "episode_link": f"https://example.com/{name}/{number}",
+        "translations": {},
+        "title_id": title_id,
+        "episode_number": number,
+    } for number in range(1, episodes + 1)])
+
+    return title_id
+
+
+async def test_titles_keyset_page():
+    response = client.get("/titles/", params={"keyset": True, "limit": 5})
+
+    assert response.status_code == 200
+    assert response.json()["next_cursor"] is None
+
+
+async def test_titles_invalid_cursor():
+    response = client.get("/titles/", params={"cursor": "not-a-cursor"})
+
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("params", [
+    {"keyset": True, "limit": 0},
+    {"keyset": True, "limit": -1},
+    {"limit": 101},
+    {"offset": -1},
+])
+async def test_titles_page_bounds(params):
+    response = client.get("/titles/", params=params)
+
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize("cursor", [encode_cursor([123]), encode_cursor(["a", "b"]), encode_cursor([True])])
+async def test_titles_cursor_with_wrong_values(cursor):
+    response = client.get("/titles/", params={"cursor": cursor})
+
+    assert response.status_code == 400
+
+
+async def test_episodes_cursor_with_wrong_values():
+    response = client.get("/get_all_episodes", params={"title_id": "x", "cursor": encode_cursor(["x", "1", "link"])})
+
+    assert response.status_code == 400
+
+
+async def test_search_titles_page():
+    response = client.get("/titles/search", params={"q": "narut"})
+
+    assert response.status_code == 200
+    assert response.json()["items"] == []
+
+
+async def test_search_titles_empty_query():
+    response = client.get("/titles/search", params={"q": "   "})
+
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("values", [["high", "id"], [1.5], [1.5, 7], [True, "id"]])
+async def test_search_titles_rejects_tampered_cursor(values):
+    response = client.get("/titles/search", params={"q": "anything", "cursor": encode_cursor(values)})
+
+    assert response.status_code == 400
+
+
+async def test_search_ranks_name_matches_above_synopsis_matches():
+    in_synopsis = create_title_with_episodes("Quiet harbor", episodes=0, synopsis="a zephyrine storm")
+    in_name = create_title_with_episodes("Zephyrine Skies", episodes=0)
+
+    items = client.get("/titles/search", params={"q": "zephyrine"}).json()["items"]
+
+    assert [item["id"] for item in items] == [in_name, in_synopsis]
+
+
+async def test_search_finds_misspelled_names_by_trigram_similarity():
+    title_id = create_title_with_episodes("Marmalade Cavalcade", episodes=0)
+
+    # Опечатка не дает лексемы для полнотекстового поиска, находит только сходство триграмм
+    items = client.get("/titles/search", params={"q": "marmelade cavalkade"}).json()["items"]
+
+    assert [item["id"] for item in items] == [title_id]
+
+
+async def test_search_keyset_pages_are_stable():
+    ids = {create_title_with_episodes(f"Kestrel saga {i}", episodes=0) for i in range(5)}
+    everything = client.get("/titles/search", params={"q": "kestrel", "limit": 10}).json()["items"]
+
+    paged, cursor = [], None
+    while True:
+        page = client.get("/titles/search", params={"q": "kestrel", "limit": 2, "cursor": cursor}).json()
+        paged += page["items"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert {item["id"] for item in everything} == ids
+    assert [item["id"] for item in paged] == [item["id"] for item in everything]
+
+
+async def test_titles_filtered_by_genres_and_year():
+    response = client.get("/titles/", params={
+        "keyset": True,
+        "genres": ["drama", "comedy"],
+        "genre_match": "all",
+        "year_from": 2000,
+    })
+
+    assert response.status_code == 200
+    assert response.json()["items"] == []
+
+
+async def test_title_facets():
+    response = client.get("/titles/facets", params={"status": "ongoing"})
+
+    assert response.status_code == 200
+    assert response.json()["total"] == 0
+
+
+@pytest.fixture(scope="module")
+def faceted_titles() -> dict:
+    studio = "facet studio"
+    return {
+        "a": create_title_with_episodes("facet a", 0, studio=studio, year=2001, type="TV",
+                                        genres={"items": ["Facet-Action", "facet-drama"]}),
+        "b": create_title_with_episodes("facet b", 0, studio=studio, year=2005, type="Movie",
+                                        genres={"items": ["facet-action"]}),
+        "c": create_title_with_episodes("facet c", 0, studio=studio, year=2010, type="TV",
+                                        genres={"items": ["facet-drama", "facet-comedy"]}),
+    }
+
+
+@pytest.mark.parametrize("genres, genre_match, expected", [
+    (["facet-action", "facet-comedy"], "any", {"a", "b", "c"}),
+    (["facet-action"], "any", {"a", "b"}),
+    (["facet-action", "facet-drama"], "all", {"a"}),
+    (["FACET-DRAMA", "facet-comedy"], "all", {"c"}),
+    (["facet-action", "facet-comedy"], "all", set()),
+])
+async def test_titles_genre_matching(faceted_titles, genres, genre_match, expected):
+    response = client.get("/titles/", params={
+        "keyset": True, "studio": "facet studio", "genres": genres, "genre_match": genre_match,
+    })
+
+    ids = {item["id"] for item in response.json()["items"]}
+    assert ids == {faceted_titles[name] for name in expected}
+
+
+async def test_title_facets_exclude_their_own_dimension(faceted_titles):
+    facets = client.get("/titles/facets", params={
+        "studio": "facet studio", "genres": ["facet-action"], "type": "TV",
+    }).json()
+
+    assert facets["total"] == 1
+    # Каждый фасет считается по всем условиям, кроме своего
+    assert facets["genres"] == {"facet-action": 1, "facet-drama": 2, "facet-comedy": 1}
+    assert facets["type"] == {"TV": 1, "Movie": 1}
+    assert facets["studio"] == {"facet studio": 1}
+    assert facets["year"] == {"2001": 1}
+
+
+async def test_title_with_episodes_statement_count_is_constant():
+    short_id = create_title_with_episodes("short", episodes=1)
+    long_id = create_title_with_episodes("long", episodes=12)
+
+    with count_statements() as short_statements:
+        short = client.get("/get_title_with_episodes", params={"title_id": short_id})
+    with count_statements() as long_statements:
+        long = client.get("/get_title_with_episodes", params={"title_id": long_id})
+
+    assert len(short.json()["episodes"]) == 1
+    assert [e["episode_number"] for e in long.json()["episodes"]] == list(range(1, 13))
+    assert len(short_statements) == len(long_statements) == 2
+
+
+async def test_title_with_episodes_not_found():
+    response = client.get("/get_title_with_episodes", params={"title_id": "missing"})
+
+    assert response.status_code == 404
+
+
+async def test_titles_batch_preserves_order_and_reports_missing():
+    first = create_title_with_episodes("batch first", episodes=1)
+    second = create_title_with_episodes("batch second", episodes=0)
+
+    with count_statements() as statements:
+        response = client.get("/titles/batch", params={"ids": [second, "missing", first, second]})
+
+    assert response.status_code == 200
+    assert [title["id"] for title in response.json()["items"]] == [second, first]
+    assert response.json()["missing"] == ["missing"]
+    assert len(statements) == 1
+
+
+async def test_episodes_batch():
+    title_id = create_title_with_episodes("batch episodes", episodes=2)
+    links = [f"https://example.com/batch episodes/{number}" for number in (2, 1)]
+
+    response = client.get("/episodes/batch", params={"episode_links": links + ["missing"]})
+
+    assert [episode["episode_number"] for episode in response.json()["items"]] == [2, 1]
+    assert response.json()["missing"] == ["missing"]
+    assert all(episode["title_id"] == title_id for episode in response.json()["items"])
+
+
+async def test_titles_batch_too_many_ids():
+    response = client.get("/titles/batch", params={"ids": [str(i) for i in range(201)]})
+
+    assert response.status_code == 400
+
+
+async def test_get_title_prefers_id_over_name():
+    by_id = create_title_with_episodes("priority by id", episodes=0)
+    create_title_with_episodes("priority by name", episodes=0)
+
+    response = client.get("/get_title", params={"title_id": by_id, "title_name": "priority by name"})
+
+    assert response.json()["id"] == by_id
+
+
+async def test_title_cache_is_invalidated_on_update():
+    title_id = create_title_with_episodes("cached title", episodes=0)
+
+    title = client.get("/get_title", params={"title_id": title_id}).json()
+    assert client.get("/get_title", params={"title_id": title_id}).json() == title
+
+    update = {key: value for key, value in title.items() if key not in ("id", "updated_at")}
+    client.put("/update_title", params={"title_id": title_id}, json={**update, "synopsis": "updated"})
+
+    assert client.get("/get_title", params={"title_id": title_id}).json()["synopsis"] == "updated"
+
+
+async def test_get_title_conditional_requests():
+    title_id = create_title_with_episodes("conditional title", episodes=0)
+
+    response = client.get("/get_title", params={"title_id": title_id})
+    etag, last_modified = response.headers["etag"], response.headers["last-modified"]
+
+    assert client.get("/get_title", params={"title_id": title_id}, headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(
+        "/get_title", params={"title_id": title_id}, headers={"If-Modified-Since": last_modified},
+    ).status_code == 304
+    # If-None-Match приоритетнее: несовпавший ETag - полный ответ даже при свежем If-Modified-Since
+    assert client.get("/get_title", params={"title_id": title_id}, headers={
+        "If-None-Match": 'W/"stale"',
+        "If-Modified-Since": last_modified,
+    }).status_code == 200
+
+
+async def test_titles_page_revalidates_by_etag_only():
+    params = {"keyset": True, "studio": "conditional studio"}
+    ids = [create_title_with_episodes(f"conditional page {i}", episodes=0, studio="conditional studio") for i in range(2)]
+
+    response = client.get("/titles/", params=params)
+    etag = response.headers["etag"]
+
+    assert "last-modified" not in response.headers
+    assert client.get("/titles/", params=params, headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/titles/", params=params, headers={
+        "If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT",
+    }).status_code == 200
+
+    client.delete("/delete_title", params={"title_id": ids[0]})
+    response = client.get("/titles/", params=params, headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert [title["id"] for title in response.json()["items"]] == ids[1:]
+
+
+@pytest.mark.parametrize("copy_threshold", [1, 10_000])
+async def test_bulk_create_titles_reports_conflicts(monkeypatch, copy_threshold):
+    monkeypatch.setattr("src.api.service.BULK_COPY_THRESHOLD", copy_threshold)
+    prefix = f"bulk {copy_threshold}"
+    create_title_with_episodes(f"{prefix} existing", episodes=0)
+
+    response = client.post("/create_titles/", json=[
+        title_payload(f"{prefix} new 1"),
+        title_payload(f"{prefix} existing"),
+        title_payload(f"{prefix} new 2"),
+        title_payload(f"{prefix} new 1", trailer_link=f"{prefix} other trailer"),
+    ])
+
+    assert response.status_code == 200
+    assert response.json()["created"] == 2
+    assert response.json()["conflicts"] == [
+        {"index": 1, "reason": "name already exists"},
+        {"index": 3, "reason": "duplicate name in batch"},
+    ]
+    assert client.get("/get_title", params={"title_name": f"{prefix} new 2"}).json()["name"] == f"{prefix} new 2"
+
+
+@pytest.mark.parametrize("copy_threshold", [1, 10_000])
+async def test_bulk_create_racing_insert_is_a_conflict(monkeypatch, copy_threshold):
+    monkeypatch.setattr("src.api.service.BULK_COPY_THRESHOLD", copy_threshold)
+    name = f"racing {copy_threshold}"
+    add_many = TitleDAO.add_many.__func__
+
+    # Параллельный запрос успевает вставить тот же тайтл между проверкой и записью
+    async def racing_add_many(cls, db, objs_in, **kwargs):
+        async with async_session_maker() as session:
+            await TitleDAO.add(session, {**title_payload(name), "id": f"racing-{copy_threshold}"})
+            await session.commit()
+        return await add_many(cls, db, objs_in, **kwargs)
+
+    monkeypatch.setattr(TitleDAO, "add_many", classmethod(racing_add_many))
+
+    response = client.post("/create_titles/", json=[title_payload(name)])
+
+    assert response.status_code == 409
+
+
+async def test_export_titles_streams_ndjson_with_episodes():
+    ids = {create_title_with_episodes(f"export {i}", episodes=i) for i in range(1, 4)}
+
+    async with async_session_maker() as session:
+        with count_statements() as statements:
+            chunks = [chunk async for chunk in TitleCRUD(session).export_titles(include_episodes=True, batch_size=2)]
+
+    records = [orjson.loads(line) for chunk in chunks for line in chunk.splitlines()]
+    exported = {record["id"]: record for record in records if record["id"] in ids}
+
+    assert len(chunks) == -(-len(records) // 2)
+    # На пачку: выборка тайтлов и эпизодов, плюс последний пустой запрос
+    assert len(statements) == 2 * len(chunks) + 1
+    assert {len(record["episodes"]) for record in exported.values()} == {1, 2, 3}
+    assert all("search_vector" not in record for record in records)
+
+    response = client.get("/export_titles", params={"include_episodes": True})
+
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [orjson.loads(line)["id"] for line in response.text.splitlines()] == [record["id"] for record in records]
+
+
+async def test_stale_replica_read_does_not_refill_cache(monkeypatch):
+    title_id = create_title_with_episodes("replica title", episodes=0)
+    title = client.get("/get_title", params={"title_id": title_id}).json()
+
+    # Снимок REPEATABLE READ, снятый до записи, ведет себя как отстающая реплика
+    replica_engine = async_engine.execution_options(isolation_level="REPEATABLE READ")
+    replica_session_maker = sessionmaker(replica_engine, class_=AsyncSession, expire_on_commit=False, info={REPLICA: True})
+
+    async with replica_session_maker() as replica:
+        await replica.execute(select(Title.id).limit(1))
+
+        update = {key: value for key, value in title.items() if key not in ("id", "updated_at")}
+        client.put("/update_title", params={"title_id": title_id}, json={**update, "synopsis": "after write"})
+
+        stale = await TitleCRUD(replica).get_existing_title(title_id=title_id)
+        assert stale.synopsis == title["synopsis"]
+
+        assert client.get("/get_title", params={"title_id": title_id}).json()["synopsis"] == "after write"
+
+        # Когда реплики гарантированно догнали инвалидацию, чтение с них снова кешируется
+        monkeypatch.setattr(service, "DB_REPLICA_MAX_LAG", 0)
+        await service.invalidate_titles()
+        await TitleCRUD(replica).get_existing_title(title_id=title_id)
+
+    assert client.get("/get_title", params={"title_id": title_id}).json()["synopsis"] == title["synopsis"]
+
+
+async def test_export_is_one_snapshot_under_concurrent_writes():
+    first = create_title_with_episodes("snapshot a", episodes=1)
+    second = create_title_with_episodes("snapshot b", episodes=2)
+
+    async with async_session_maker() as session:
+        chunks = TitleCRUD(session).export_titles(include_episodes=True, batch_size=1)
+        exported = [orjson.loads(await chunks.__anext__())]
+
+        # Запись посреди выгрузки: переименование и удаление серии у еще не выгруженного тайтла
+        async with async_session_maker() as writer:
+            await writer.execute(update(Title).where(Title.id.in_([first, second])).values(synopsis="changed"))
+            await writer.execute(delete(Episode).where(Episode.title_id.in_([first, second])))
+            await writer.commit()
+
+        exported += [orjson.loads(chunk) async for chunk in chunks]
+
+    records = {record["id"]: record for record in exported if record["id"] in (first, second)}
+
+    assert {record["synopsis"] for record in records.values()} == {"synopsis"}
+    assert [len(records[first]["episodes"]), len(records[second]["episodes"])] == [1, 2]
@@ -1,4 +1,12 @@
-from ..conftest import client
+from types import SimpleNamespace
+
+from sqlalchemy import update
+
+from src.auth import utils
+from src.auth.models import User
+from src.auth.service import TokenCrud
+
+from ..conftest import async_session_maker, client, count_statements
 
 async def test_add_role():
     response = client.post("/create_role", json={
@@ -20,3 +28,62 @@ async def test_register():
     })
 
     assert response.status_code == 200
+
+async def test_login_attempts_are_limited(monkeypatch):
+    monkeypatch.setattr(utils, "login_attempts", utils.AttemptCounter(limit=2, window=60))
+    credentials = {"username": "nobody", "password": "Wrong_11"}
+
+    assert client.post("/login/", data=credentials).status_code == 400
+    assert client.post("/login/", data=credentials).status_code == 400
+
+    response = client.post("/login/", data=credentials)
+
+    assert response.status_code == 429
+    assert 0 < int(response.headers["Retry-After"]) <= 60
+
+
+async def make_access_token(**claims) -> str:
+    user = SimpleNamespace(**{
+        "id": "claims-only",
+        "username": "claims",
+        "role_id": 1,
+        "is_active": True,
+        "is_superuser": False,
+        "token_version": 0,
+        **claims,
+    })
+    return await TokenCrud(None).create_access_token(user)
+
+
+async def test_guards_authorize_from_claims_without_database():
+    superuser = await make_access_token(is_superuser=True)
+    inactive = await make_access_token(is_active=False)
+    regular = await make_access_token()
+
+    with count_statements() as statements:
+        assert client.get("/hashing_stats", cookies={"access_token": superuser}).status_code == 200
+        assert client.get("/hashing_stats", cookies={"access_token": regular}).status_code == 403
+        assert client.get("/read_user", cookies={"access_token": inactive}).status_code == 403
+
+    assert statements == []
+
+
+async def test_bumped_token_version_revokes_full_user_endpoints():
+    client.post("/registration/", json={
+        "email": "revoked@example.com",
+        "username": "revoked",
+        "is_active": False,
+        "is_superuser": False,
+        "is_verified": False,
+        "password": "String_11",
+    })
+    token = client.post("/login/", data={"username": "revoked", "password": "String_11"}).cookies["access_token"]
+    client.cookies.clear()
+
+    async with async_session_maker() as session:
+        await session.execute(update(User).where(User.username == "revoked").values(token_version=User.token_version + 1))
+        await session.commit()
+
+    # /me сверяет версию токена с записью в БД, claims-only маршрут верит токену до истечения
+    assert client.get("/me", cookies={"access_token": token}).status_code == 401
+    assert client.get("/read_user", params={"username": "revoked"}, cookies={"access_token": token}).status_code == 200
@@ -0,0 +1,96 @@
+import asyncio
+import threading
+
+import pytest
+
+from src.auth import exceptions, utils
+
+
+async def test_hashing_runs_in_pool_without_blocking_loop(monkeypatch):
+    threads = []
+    real_pbkdf2 = utils._pbkdf2
+
+    def pbkdf2(password, salt):
+        threads.append(threading.current_thread().name)
+        return real_pbkdf2(password, salt)
+
+    monkeypatch.setattr(utils, "_pbkdf2", pbkdf2)
+
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.001)
+
+    task = asyncio.create_task(ticker())
+    hashed = await asyncio.gather(*(utils.hash_password("Password_1", f"salt{i}") for i in range(4)))
+    task.cancel()
+
+    assert all(name.startswith("password-hash") for name in threads)
+    assert ticks > 1
+    assert await utils.validate_password("Password_1", f"salt0${hashed[0]}")
+    assert not await utils.validate_password("Password_2", f"salt0${hashed[0]}")
+
+
+async def test_full_hashing_queue_is_rejected(monkeypatch):
+    release = threading.Event()
+
+    def slow_pbkdf2(password, salt):
+        release.wait(5)
+        return "hash"
+
+    monkeypatch.setattr(utils, "_pbkdf2", slow_pbkdf2)
+    monkeypatch.setattr(utils, "hash_semaphore", asyncio.Semaphore(1))
+    monkeypatch.setattr(utils, "PASSWORD_HASH_QUEUE_SIZE", 1)
+    monkeypatch.setattr(utils, "PASSWORD_HASH_QUEUE_TIMEOUT", 0.05)
+    rejected = utils.hashing_stats["rejected"]
+
+    running = asyncio.create_task(utils.run_hashing("p", "s"))
+    await asyncio.sleep(0.01)
+    queued = asyncio.create_task(utils.run_hashing("p", "s"))
+    await asyncio.sleep(0.01)
+
+    # Очередь занята - отказ сразу, без ожидания
+    with pytest.raises(exceptions.AuthServiceOverloaded) as overflow:
+        await utils.run_hashing("p", "s")
+
+    # Ожидавший в очереди не дождался пула за PASSWORD_HASH_QUEUE_TIMEOUT
+    with pytest.raises(exceptions.AuthServiceOverloaded):
+        await queued
+
+    release.set()
+
+    assert await running == "hash"
+    assert overflow.value.status_code == 503
+    assert overflow.value.headers["Retry-After"] == "1"
+    assert utils.hashing_stats["rejected"] == rejected + 2
+
+
+async def test_attempt_counter_blocks_after_limit_until_window_ends():
+    counter = utils.AttemptCounter(limit=2, window=0.05)
+
+    counter.hit("user:a")
+    assert counter.retry_after("user:a") is None
+    counter.hit("user:a")
+    assert counter.retry_after("user:a") == 1
+
+    await asyncio.sleep(0.06)
+
+    assert counter.retry_after("user:a") is None
+
+
+async def test_attempt_counter_evicts_expired_and_oldest_keys():
+    counter = utils.AttemptCounter(limit=1, window=0.05, max_keys=2)
+
+    counter.hit("old")
+    await asyncio.sleep(0.06)
+    counter.hit("a")
+    counter.hit("b")
+
+    assert list(counter._counters) == ["a", "b"]
+
+    counter.hit("c")
+
+    assert list(counter._counters) == ["b", "c"]
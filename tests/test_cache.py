@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+from src.cache import CacheBackend, RedisCache, TTLCache, listen_for_invalidations
+from src.pubsub import Broker, InProcessBroker, RedisBroker
+
+
+async def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(ttl=60, max_entries=2, max_bytes=1024)
+
+    await cache.set("a", b"1")
+    await cache.set("b", b"2")
+    await cache.get("a")
+    await cache.set("c", b"3")
+
+    assert await cache.get("b") is None
+    assert await cache.get("a") == b"1"
+    assert (await cache.stats())["evictions"] == 1
+
+
+async def test_ttl_cache_expires_entries():
+    cache = TTLCache(ttl=0.05, max_entries=10, max_bytes=1024)
+
+    await cache.set("short", b"1")
+    await cache.set("long", b"2", ttl=60)
+    await asyncio.sleep(0.06)
+
+    assert await cache.get("short") is None
+    assert await cache.get("long") == b"2"
+    assert (await cache.stats())["expirations"] == 1
+
+
+async def test_ttl_cache_is_bounded_by_bytes():
+    cache = TTLCache(ttl=60, max_entries=10, max_bytes=9)
+
+    await cache.set("a", b"1234")
+    await cache.set("b", b"1234")
+    await cache.set("huge", b"x" * 100)
+
+    assert await cache.get("huge") is None
+    assert await cache.get("a") is None
+    assert await cache.get("b") == b"1234"
+    assert (await cache.stats())["bytes"] == 5
+
+
+async def test_ttl_cache_delete_prefix():
+    cache = TTLCache(ttl=60, max_entries=10, max_bytes=1024)
+
+    await cache.set("title:1", b"1")
+    await cache.set("titles:page", b"2")
+    await cache.set("episode:1", b"3")
+    await cache.delete_prefix("title:", "titles:")
+
+    assert await cache.get("title:1") is None
+    assert await cache.get("titles:page") is None
+    assert await cache.get("episode:1") == b"3"
+
+
+async def test_redis_cache_against_fake_server():
+    fakeredis = pytest.importorskip("fakeredis")
+    cache = RedisCache(client=fakeredis.aioredis.FakeRedis())
+
+    await cache.set("title:1", b"payload")
+    await cache.set("episode:1", b"payload")
+    await cache.delete_prefix("title:")
+
+    assert await cache.get("title:1") is None
+    assert await cache.get("episode:1") == b"payload"
+
+
+async def test_redis_cache_ttl_namespace_and_stats():
+    fakeredis = pytest.importorskip("fakeredis")
+    client = fakeredis.aioredis.FakeRedis()
+    cache = RedisCache(client=client, ttl=30)
+
+    await client.set("foreign", b"kept")
+    await cache.set("title:1", b"payload")
+    await cache.set("title:2", b"payload", ttl=5)
+
+    assert 29_000 < await client.pttl("asqi:cache:title:1") <= 30_000
+    assert 4_000 < await client.pttl("asqi:cache:title:2") <= 5_000
+
+    assert await cache.get("title:1") == b"payload"
+    assert await cache.get("missing") is None
+    await cache.clear()
+
+    assert await client.get("foreign") == b"kept"
+    assert await cache.get("title:2") is None
+    assert (await cache.stats())["hits"] == 1
+    assert (await cache.stats())["misses"] == 2
+
+
+@pytest.mark.parametrize("make_broker", [
+    InProcessBroker,
+    lambda: RedisBroker(client=pytest.importorskip("fakeredis").aioredis.FakeRedis()),
+])
+async def test_invalidation_reaches_other_workers(make_broker, monkeypatch):
+    broker = make_broker()
+    monkeypatch.setattr("src.cache.broker", broker)
+
+    remote_cache = TTLCache(ttl=60, max_entries=10, max_bytes=1024)
+    await remote_cache.set("title:1", b"payload")
+
+    listener = asyncio.create_task(listen_for_invalidations(remote_cache))
+    await asyncio.sleep(0.05)
+
+    await broker.publish("asqi:cache:invalidate", b'{"origin": "other", "prefixes": ["title:"]}')
+    await asyncio.sleep(0.05)
+    listener.cancel()
+
+    assert await remote_cache.get("title:1") is None
+
+
+def test_backend_interfaces_are_abstract():
+    class Partial(CacheBackend):
+        async def get(self, key):
+            return None
+
+    for cls in (CacheBackend, Broker, Partial):
+        with pytest.raises(TypeError):
+            cls()
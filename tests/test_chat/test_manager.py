@@ -0,0 +1,222 @@
+import asyncio
+import json
+
+import pytest
+
+from src.chat.manager import DISCONNECT, DROP_OLDEST, PING_FRAME, ConnectionManager
+from src.pubsub import InProcessBroker, RedisBroker
+
+
+class FakeWriter:
+    def add(self, row):
+        pass
+
+    def stats(self):
+        return {}
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.received = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message):
+        self.received.append(message)
+
+    async def close(self, code=1000, reason=None):
+        self.close_code = code
+
+
+@pytest.mark.parametrize("make_broker", [
+    InProcessBroker,
+    lambda: RedisBroker(client=pytest.importorskip("fakeredis").aioredis.FakeRedis()),
+])
+async def test_broadcast_reaches_other_workers_in_order(make_broker):
+    bus = make_broker()
+    first = ConnectionManager(writer=FakeWriter(), bus=bus)
+    second = ConnectionManager(writer=FakeWriter(), bus=bus)
+    await first.start()
+    await second.start()
+    await asyncio.sleep(0.05)
+
+    local, remote, other_room = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+    await first.connect(local, room="title:1")
+    await second.connect(remote, room="title:1")
+    await second.connect(other_room, room="title:2")
+
+    for i in range(5):
+        await first.broadcast(f"message {i}", add_to_db=False, room="title:1")
+    await asyncio.sleep(0.1)
+
+    await first.stop()
+    await second.stop()
+    first.disconnect(local)
+    second.disconnect(remote)
+    second.disconnect(other_room)
+
+    expected = [f"message {i}" for i in range(5)]
+    assert local.received == expected
+    assert remote.received == expected
+    assert other_room.received == []
+
+
+async def test_duplicate_envelopes_are_dropped():
+    manager = ConnectionManager(writer=FakeWriter(), bus=InProcessBroker())
+    websocket = FakeWebSocket()
+    await manager.connect(websocket, room="general")
+
+    payload = json.dumps({"origin": "worker", "seq": 1, "room": "general", "message": "hi"}).encode()
+    manager._receive(payload)
+    manager._receive(payload)
+    await asyncio.sleep(0.01)
+    manager.disconnect(websocket)
+
+    assert websocket.received == ["hi"]
+    assert manager.stats()["bus_duplicates"] == 1
+
+
+async def test_connections_over_the_limit_are_rejected():
+    manager = ConnectionManager(writer=FakeWriter(), bus=InProcessBroker(), max_connections=1)
+    first, second = FakeWebSocket(), FakeWebSocket()
+
+    assert await manager.connect(first)
+    assert not await manager.connect(second)
+    manager.disconnect(first)
+
+    assert second.close_code == 1013
+    assert manager.stats()["rejected"] == 1
+    assert manager.stats()["connections"] == 0
+
+
+async def test_reap_pings_quiet_and_closes_idle_connections():
+    manager = ConnectionManager(writer=FakeWriter(), bus=InProcessBroker(), heartbeat_interval=10, idle_timeout=30)
+    quiet, idle, active = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+    for websocket in (quiet, idle, active):
+        await manager.connect(websocket)
+
+    manager.active_connections[quiet].last_seen -= 15
+    manager.active_connections[idle].last_seen -= 45
+    manager.reap()
+    await asyncio.sleep(0.01)
+
+    assert quiet.received == [PING_FRAME]
+    assert idle.close_code == 1001
+    assert active.received == []
+    assert set(manager.active_connections) == {quiet, active}
+    assert manager.stats()["idle_disconnects"] == 1
+
+    manager.disconnect(quiet)
+    manager.disconnect(active)
+
+
+class BlockedWebSocket(FakeWebSocket):
+    """Сокет, который не отдает кадры, пока его не отпустят"""
+
+    def __init__(self):
+        super().__init__()
+        self.released = asyncio.Event()
+
+    async def send_text(self, message):
+        await self.released.wait()
+        await super().send_text(message)
+
+
+async def test_slow_consumer_drops_oldest_messages():
+    manager = ConnectionManager(writer=FakeWriter(), bus=InProcessBroker(), queue_size=2, slow_consumer_policy=DROP_OLDEST)
+    slow, fast = BlockedWebSocket(), FakeWebSocket()
+    await manager.connect(slow)
+    await manager.connect(fast)
+
+    for i in range(5):
+        await manager.broadcast(f"message {i}", add_to_db=False)
+        await asyncio.sleep(0)
+    await asyncio.sleep(0.01)
+
+    stats = manager.stats()
+    slow.released.set()
+    await asyncio.sleep(0.01)
+    manager.disconnect(slow)
+    manager.disconnect(fast)
+
+    # Писатель медленного соединения уже держит первое сообщение, из очереди
+    # вытеснены самые старые из оставшихся
+    assert slow.received == ["message 0", "message 3", "message 4"]
+    assert fast.received == [f"message {i}" for i in range(5)]
+    assert stats["dropped"] == 2
+    assert stats["max_queue_depth"] == 2
+    assert stats["slow_disconnects"] == 0
+
+
+async def test_slow_consumer_is_disconnected():
+    manager = ConnectionManager(writer=FakeWriter(), bus=InProcessBroker(), queue_size=1, slow_consumer_policy=DISCONNECT)
+    slow, fast = BlockedWebSocket(), FakeWebSocket()
+    await manager.connect(slow)
+    await manager.connect(fast)
+
+    for i in range(3):
+        await manager.broadcast(f"message {i}", add_to_db=False)
+        await asyncio.sleep(0)
+    await asyncio.sleep(0.01)
+
+    assert slow.close_code == 1008
+    assert set(manager.active_connections) == {fast}
+    assert fast.received == ["message 0", "message 1", "message 2"]
+    assert manager.stats()["slow_disconnects"] == 1
+    assert not manager._closing
+
+    manager.disconnect(fast)
+
+
+async def test_delivery_lag_metrics():
+    manager = ConnectionManager(writer=FakeWriter(), bus=InProcessBroker())
+    websocket = BlockedWebSocket()
+    await manager.connect(websocket)
+
+    await manager.broadcast("late", add_to_db=False)
+    await asyncio.sleep(0.05)
+    websocket.released.set()
+    await asyncio.sleep(0.01)
+
+    stats = manager.stats()
+    manager.disconnect(websocket)
+
+    assert stats["delivered"] == 1
+    assert stats["max_lag_ms"] >= 50
+    assert 0 < stats["mean_lag_ms"] <= stats["max_lag_ms"]
+
+
+async def test_room_join_leave_and_fan_out():
+    manager = ConnectionManager(writer=FakeWriter(), bus=InProcessBroker())
+    first, second, outsider = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+    await manager.connect(first, room="title:1")
+    await manager.connect(second, room="title:1")
+    await manager.connect(outsider, room="title:2")
+
+    manager.join(first, "title:2")
+    await manager.broadcast("to title:2", add_to_db=False, room="title:2")
+    await manager.broadcast("to title:1", add_to_db=False, room="title:1")
+    await asyncio.sleep(0.01)
+
+    assert first.received == ["to title:2", "to title:1"]
+    assert second.received == ["to title:1"]
+    assert outsider.received == ["to title:2"]
+    # Сообщения без комнаты уходят в последнюю, куда вошел клиент
+    assert manager.active_room(first) == "title:2"
+
+    manager.leave(first, "title:2")
+    await manager.broadcast("after leave", add_to_db=False, room="title:2")
+    await asyncio.sleep(0.01)
+
+    assert not manager.is_member(first, "title:2")
+    assert manager.active_room(first) == "title:1"
+    assert "after leave" not in first.received
+    assert outsider.received[-1] == "after leave"
+
+    # Опустевшие комнаты пропадают из индекса
+    assert manager.disconnect(outsider) == {"title:2"}
+    assert "title:2" not in manager.rooms
+    manager.disconnect(first)
+    manager.disconnect(second)
+    assert manager.stats()["rooms"] == 0
@@ -0,0 +1,54 @@
+import json
+
+from src.chat.routers import parse_command
+from src.dao import encode_cursor
+
+from ..conftest import client
+
+
+async def test_history_limit_bounds():
+    assert client.get("/chat/history", params={"limit": 0}).status_code == 422
+    assert client.get("/chat/history", params={"limit": 1000}).status_code == 422
+
+
+async def test_history_cursor_with_wrong_values():
+    response = client.get("/chat/history", params={"cursor": encode_cursor(["not-an-id"])})
+
+    assert response.status_code == 400
+
+
+async def test_history_page():
+    response = client.get("/chat/history", params={"room": "empty", "limit": 10})
+
+    assert response.status_code == 200
+    assert response.json() == {"items": [], "next_cursor": None}
+
+
+def test_websocket_room_commands():
+    with client.websocket_connect("/chat/ws/1?room=ws:a") as first, client.websocket_connect("/chat/ws/2?room=ws:b") as second:
+        first.send_text(json.dumps({"action": "join", "room": "ws:b"}))
+        first.send_text(json.dumps({"action": "message", "room": "ws:b", "text": "hello b"}))
+
+        assert first.receive_text() == "Client #1 says: hello b"
+        assert second.receive_text() == "Client #1 says: hello b"
+
+        # Писать в комнату, где не состоишь, нельзя: иначе first получил бы "intruder" раньше "to b"
+        second.send_text(json.dumps({"action": "message", "room": "ws:a", "text": "intruder"}))
+        second.send_text("to b")
+
+        assert second.receive_text() == "Client #2 says: to b"
+        assert first.receive_text() == "Client #2 says: to b"
+
+        # Простой текст уходит в активную комнату, после выхода - снова ws:a
+        first.send_text(json.dumps({"action": "leave", "room": "ws:b"}))
+        first.send_text("plain")
+
+        assert first.receive_text() == "Client #1 says: plain"
+
+
+def test_parse_command_ignores_malformed_frames():
+    assert parse_command("hello") == {}
+    assert parse_command("{broken") == {}
+    assert parse_command("[1, 2]") == {}
+    assert parse_command(json.dumps({"action": "join"})) == {}
+    assert parse_command(json.dumps({"action": "pong"})) == {"action": "pong"}
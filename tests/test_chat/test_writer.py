@@ -0,0 +1,122 @@
+import asyncio
+import time
+
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+
+from src.chat.dao import MessagesDAO
+from src.chat.models import Messages
+from src.chat.writer import MessageWriter
+
+from ..conftest import async_session_maker
+
+
+async def stored(room: str) -> list:
+    async with async_session_maker() as session:
+        result = await session.execute(select(Messages.message).where(Messages.room == room).order_by(Messages.id))
+        return result.scalars().all()
+
+
+def failing_add_many(failures: int):
+    """Подменяет вставку: первые failures вызовов падают как при недоступной БД"""
+    original = MessagesDAO.add_many.__func__
+    calls = {"count": 0}
+
+    async def add_many(cls, db, objs_in, **kwargs):
+        calls["count"] += 1
+        if calls["count"] <= failures:
+            raise OperationalError("INSERT INTO messages", None, ConnectionError("connection refused"))
+        return await original(cls, db, objs_in, **kwargs)
+
+    return classmethod(add_many), calls
+
+
+async def test_full_batch_is_flushed_without_waiting_for_interval():
+    writer = MessageWriter(batch_size=3, interval=60)
+    await writer.start()
+
+    for i in range(3):
+        writer.add({"message": f"message {i}", "room": "writer:batch"})
+    await asyncio.sleep(0.2)
+
+    assert await stored("writer:batch") == ["message 0", "message 1", "message 2"]
+    assert writer.stats()["written"] == 3
+
+    await writer.stop()
+
+
+async def test_stop_flushes_pending_messages():
+    writer = MessageWriter(batch_size=100, interval=60)
+    await writer.start()
+
+    writer.add({"message": "late", "room": "writer:stop"})
+    await writer.stop()
+
+    assert await stored("writer:stop") == ["late"]
+    assert writer.stats()["pending"] == 0
+
+
+async def test_bad_rows_are_dropped_alone():
+    writer = MessageWriter()
+    rows = [{"message": f"message {i}", "room": "writer:bad"} for i in range(7)]
+    rows[2]["message"] = "nul \x00 byte"
+    rows[5]["message"] = "another \x00"
+
+    for row in rows:
+        writer.add(row)
+    await writer.flush()
+
+    assert await stored("writer:bad") == ["message 0", "message 1", "message 3", "message 4", "message 6"]
+    assert writer.stats() == {"pending": 0, "written": 5, "failed_flushes": 0, "dropped": 0, "rejected": 2}
+
+
+async def test_outage_is_retried_with_backoff(monkeypatch):
+    add_many, calls = failing_add_many(failures=2)
+    monkeypatch.setattr(MessagesDAO, "add_many", add_many)
+    writer = MessageWriter(max_retries=3, retry_delay=0.05)
+
+    writer.add({"message": "retried", "room": "writer:retry"})
+    started = time.monotonic()
+    await writer.stop()
+
+    assert time.monotonic() - started >= 0.05 + 0.1
+    assert calls["count"] == 3
+    assert await stored("writer:retry") == ["retried"]
+    assert writer.stats() == {"pending": 0, "written": 1, "failed_flushes": 2, "dropped": 0, "rejected": 0}
+
+
+async def test_batch_is_dropped_after_max_retries(monkeypatch):
+    add_many, calls = failing_add_many(failures=10)
+    monkeypatch.setattr(MessagesDAO, "add_many", add_many)
+    writer = MessageWriter(max_retries=2, retry_delay=0)
+
+    for i in range(4):
+        writer.add({"message": f"message {i}", "room": "writer:drop"})
+    await writer.stop()
+
+    # Недоступность БД не делит пачку: одна попытка на сброс
+    assert calls["count"] == 3
+    assert await stored("writer:drop") == []
+    assert writer.stats() == {"pending": 0, "written": 0, "failed_flushes": 3, "dropped": 4, "rejected": 0}
+
+
+async def test_stop_during_flush_loses_nothing(monkeypatch):
+    original = MessagesDAO.add_many.__func__
+
+    async def slow_add_many(cls, db, objs_in, **kwargs):
+        await asyncio.sleep(0.1)
+        return await original(cls, db, objs_in, **kwargs)
+
+    monkeypatch.setattr(MessagesDAO, "add_many", classmethod(slow_add_many))
+    writer = MessageWriter(batch_size=2, interval=60)
+    await writer.start()
+
+    writer.add({"message": "a", "room": "writer:stop-mid-flush"})
+    writer.add({"message": "b", "room": "writer:stop-mid-flush"})
+    await asyncio.sleep(0.02)
+    # Пачка a, b уже забрана из буфера и пишется
+    writer.add({"message": "c", "room": "writer:stop-mid-flush"})
+    await writer.stop()
+
+    assert await stored("writer:stop-mid-flush") == ["a", "b", "c"]
+    assert writer.stats() == {"pending": 0, "written": 3, "failed_flushes": 0, "dropped": 0, "rejected": 0}
@@ -0,0 +1,151 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import exc, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+from starlette.requests import Request
+
+from src import database
+from src.database import (
+    LAST_WRITE_COOKIE, ReplicaSet, TimedQueuePool, UnitOfWork, after_commit, get_pool_stats, make_async_engine, wrote_recently,
+)
+
+from .conftest import DATABASE_URL
+
+
+def make_request(cookie: str = None) -> Request:
+    headers = [(b"cookie", f"{LAST_WRITE_COOKIE}={cookie}".encode())] if cookie is not None else []
+    return Request({"type": "http", "headers": headers})
+
+
+def test_replica_set_skips_unhealthy_replicas_and_falls_back_to_primary():
+    primary = object()
+    replicas = ReplicaSet(
+        [make_async_engine("postgresql+asyncpg://u:p@replica1:5432/db"),
+         make_async_engine("postgresql+asyncpg://u:p@replica2:5432/db")],
+        primary=primary,
+    )
+
+    assert {replicas.session_maker() for _ in range(4)} == set(replicas.session_makers)
+
+    replicas.healthy = [False, True]
+    assert {replicas.session_maker() for _ in range(4)} == {replicas.session_makers[1]}
+
+    replicas.healthy = [False, False]
+    assert replicas.session_maker() is primary
+    assert replicas.fallbacks == 1
+
+
+def test_recent_write_cookie_pins_reads_to_primary():
+    assert wrote_recently(make_request(str(time.time())))
+    assert not wrote_recently(make_request(str(time.time() - 3600)))
+    assert not wrote_recently(make_request("garbage"))
+    assert not wrote_recently(make_request())
+
+
+class FakeSession:
+    def __init__(self):
+        self.info = {}
+        self.calls = []
+
+    async def commit(self):
+        self.calls.append("commit")
+
+    async def rollback(self):
+        self.calls.append("rollback")
+
+
+async def test_unit_of_work_commits_once_then_runs_callbacks():
+    db = FakeSession()
+
+    async def invalidate():
+        db.calls.append("invalidate")
+
+    async with UnitOfWork(db):
+        after_commit(db, invalidate)
+        after_commit(db, invalidate)
+
+    assert db.calls == ["commit", "invalidate"]
+
+
+async def test_unit_of_work_rolls_back_and_drops_callbacks_on_error():
+    db = FakeSession()
+
+    async def invalidate():
+        db.calls.append("invalidate")
+
+    with pytest.raises(ValueError):
+        async with UnitOfWork(db):
+            after_commit(db, invalidate)
+            raise ValueError
+
+    assert db.calls == ["rollback"]
+    assert db.info == {}
+
+
+async def test_pool_separates_queue_waits_from_connects():
+    engine = create_async_engine(DATABASE_URL, poolclass=TimedQueuePool, pool_size=2, max_overflow=0, pool_timeout=0.2)
+
+    async def hold(seconds):
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            await asyncio.sleep(seconds)
+
+    try:
+        # Открытие соединения ниже предела пула - подключение, а не ожидание
+        await hold(0)
+        await hold(0)
+        stats = get_pool_stats(engine)
+
+        assert (stats["checkouts"], stats["connects"], stats["waits"]) == (2, 1, 0)
+        assert stats["mean_connect_ms"] > 0
+        assert stats["max_wait_ms"] == 0
+
+        # Третьему соединению пул исчерпан: оно ждет, пока вернется одно из первых двух
+        await asyncio.gather(hold(0.1), hold(0.1), hold(0))
+        stats = get_pool_stats(engine)
+
+        assert (stats["checkouts"], stats["connects"], stats["waits"]) == (5, 2, 1)
+        assert stats["max_wait_ms"] >= 50
+        assert stats["mean_wait_ms"] == stats["max_wait_ms"]
+
+        results = await asyncio.gather(hold(0.5), hold(0.5), hold(0), return_exceptions=True)
+
+        assert isinstance(results[2], exc.TimeoutError)
+        assert get_pool_stats(engine)["timeouts"] == 1
+        assert get_pool_stats(engine)["waits"] == 2
+        assert get_pool_stats(engine)["max_wait_ms"] >= 200
+
+        recreated = engine.pool.recreate()
+        assert (recreated.checkouts, recreated.connects, recreated.waits, recreated.timeouts) == (8, 2, 2, 1)
+    finally:
+        await engine.dispose()
+
+
+def test_read_session_and_maker_share_one_replica_choice(monkeypatch):
+    replica_set = ReplicaSet(
+        [make_async_engine(f"postgresql+asyncpg://u:p@replica{i}:5432/db") for i in range(2)],
+        primary=database.async_session_maker,
+    )
+    monkeypatch.setattr(database, "replicas", replica_set)
+    app = FastAPI()
+
+    @app.get("/")
+    async def read(
+        db=Depends(database.get_read_session),
+        session_maker: sessionmaker = Depends(database.get_read_session_maker),
+    ):
+        return {"same": db.bind is session_maker.kw["bind"], "replica": database.reads_from_replica(db)}
+
+    with TestClient(app) as client:
+        # Round-robin по двум репликам: при двойном выборе сессия и фабрика расходились бы
+        assert [client.get("/").json() for _ in range(2)] == [{"same": True, "replica": True}] * 2
+
+        replica_set.healthy = [False, False]
+        assert client.get("/").json() == {"same": True, "replica": False}
+
+    assert replica_set.fallbacks == 1
@@ -0,0 +1,81 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+from src.loader import BatchLoader
+
+
+@asynccontextmanager
+async def fake_session():
+    yield "session"
+
+
+async def test_concurrent_loads_are_coalesced():
+    calls = []
+
+    async def batch_fn(session, keys):
+        calls.append(keys)
+        return {key: key.upper() for key in keys if key != "missing"}
+
+    loader = BatchLoader(batch_fn, max_batch=2)
+
+    results = await asyncio.gather(*(
+        loader.load(fake_session, key) for key in ["a", "b", "a", "c", "missing"]
+    ))
+
+    assert results == ["A", "B", "A", "C", None]
+    assert calls == [["a", "b"], ["c", "missing"]]
+    assert loader.stats() == {"loads": 5, "batches": 2}
+
+
+async def test_batch_error_reaches_every_waiter():
+    async def batch_fn(session, keys):
+        raise RuntimeError("db is down")
+
+    loader = BatchLoader(batch_fn, max_batch=10)
+
+    results = await asyncio.gather(
+        loader.load(fake_session, "a"),
+        loader.load(fake_session, "b"),
+        return_exceptions=True,
+    )
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+async def test_cancelled_waiter_does_not_cancel_others():
+    async def batch_fn(session, keys):
+        await asyncio.sleep(0.01)
+        return {key: key for key in keys}
+
+    loader = BatchLoader(batch_fn, max_batch=10)
+
+    cancelled = asyncio.create_task(loader.load(fake_session, "a"))
+    waiting = asyncio.create_task(loader.load(fake_session, "a"))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+
+    assert await waiting == "a"
+    with pytest.raises(asyncio.CancelledError):
+        await cancelled
+
+
+async def test_running_batches_are_referenced_until_done():
+    release = asyncio.Event()
+
+    async def batch_fn(session, keys):
+        await release.wait()
+        return {key: key for key in keys}
+
+    loader = BatchLoader(batch_fn, max_batch=1)
+    waiters = asyncio.gather(loader.load(fake_session, "a"), loader.load(fake_session, "b"))
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+
+    assert len(loader._running) == 2
+
+    release.set()
+    assert await waiters == ["a", "b"]
+    await asyncio.sleep(0)
+    assert not loader._running